@@ -0,0 +1,950 @@
+"""
+Almacenamiento de los datos que el sistema mantiene: empleados, préstamos y su bitácora de
+pagos, y la configuración de turnos de seguridad.
+
+Dos implementaciones de la misma interfaz (`Almacen`):
+- `AlmacenExcel`: los libros de siempre (employees_information.xlsx, prestamos.xlsx,
+  seguridad_horario.xlsx), leídos y escritos completos.
+- `AlmacenSqlite`: una sola base SQLite (datos/nomina.sqlite) con una tabla por entidad e
+  índices por ID de empleado y de préstamo. Agregar, modificar o eliminar un empleado, crear
+  un préstamo, cambiar su estado o registrarle un pago son transacciones de una fila.
+
+El resto del sistema sigue pasando rutas (`employees_file`, `prestamos_file`, ...):
+`almacen_para(ruta)` elige la implementación por la extensión (.sqlite/.db → SQLite, el resto
+→ Excel). Cuál se usa por defecto es configuración: `datos/almacenamiento.json`
+({"tipo": "sqlite", "base": "nomina.sqlite"}) o la variable de entorno NOMINA_ALMACENAMIENTO.
+
+Las nóminas guardadas siguen siendo archivos (Excel/CSV/npz) con cualquiera de los dos: son
+lo que se entrega al banco y a los empleados, y sus filas ya quedan en historial_nomina.sqlite.
+
+Migración de una carpeta datos/ existente:
+    python almacenamiento.py migrar [--datos DIR] [--base datos/nomina.sqlite] [--activar]
+    python almacenamiento.py usar excel|sqlite
+    python almacenamiento.py exportar CARPETA [--base datos/nomina.sqlite]   (de vuelta a Excel)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from datetime import date, datetime, time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from comun import DATA_DIR, normalizar_id, normalizar_ids
+
+
+TIPO_EXCEL = "excel"
+TIPO_SQLITE = "sqlite"
+TIPOS_ALMACENAMIENTO = (TIPO_EXCEL, TIPO_SQLITE)
+VARIABLE_ENTORNO = "NOMINA_ALMACENAMIENTO"
+ARCHIVO_CONFIGURACION = os.path.join(DATA_DIR, "almacenamiento.json")
+EXTENSIONES_SQLITE = (".sqlite", ".sqlite3", ".db")
+
+ARCHIVO_EMPLEADOS = "employees_information.xlsx"
+ARCHIVO_PRESTAMOS = "prestamos.xlsx"
+ARCHIVO_SEGURIDAD_HORARIO = "seguridad_horario.xlsx"
+BASE_SQLITE = "nomina.sqlite"
+
+COLUMNAS_PRESTAMOS = [
+    "loan_id",
+    "employee_id",
+    "employee_name",
+    "fecha_inicio",
+    "monto_original_centavos",
+    "cuota_quincenal_centavos",
+    "saldo_centavos",
+    "estado",  # ACTIVO | PAUSADO | CERRADO
+    "nota",
+    "creado_en",
+]
+COLUMNAS_PAGOS_PRESTAMO = [
+    "payment_id",
+    "loan_id",
+    "employee_id",
+    "tipo_pago",  # NOMINA | MANUAL
+    "fecha_pago_nomina",
+    "quincena_inicio",
+    "quincena_fin",
+    "monto_pagado_centavos",
+    "saldo_antes_centavos",
+    "saldo_despues_centavos",
+    "nota",
+    "creado_en",
+]
+COLUMNAS_SEGURIDAD_CONFIG = [
+    "vigente_desde",                 # fecha desde la cual aplica esta configuración
+    "horas_turno",                   # ej: 12
+    "hora_cambio_turno",             # HH:MM (inicio del turno Día). El turno Noche inicia + horas_turno.
+    "margen_salida_minutos",         # ej: 10 (antes/después de la hora de salida programada)
+    "tolerancia_turno_minutos",      # ej: 30 (tolerancia para duración real vs horas_turno)
+    "empleados_turno_dia",           # informativo
+    "empleados_turno_noche",         # informativo
+    "nota",
+]
+
+
+def configuracion_seguridad_inicial() -> pd.DataFrame:
+    """Configuración con la que se crea la de seguridad cuando no existe."""
+    return pd.DataFrame([{
+        "vigente_desde": datetime.now().date(),
+        "horas_turno": 12,
+        "hora_cambio_turno": "07:00",
+        "margen_salida_minutos": 10,
+        "tolerancia_turno_minutos": 30,
+        "empleados_turno_dia": 0,
+        "empleados_turno_noche": 0,
+        "nota": "Editar este archivo para ajustar turnos de seguridad",
+    }], columns=COLUMNAS_SEGURIDAD_CONFIG)
+
+
+# ---------------------------------------------------------------------------
+# Caché de lecturas
+# ---------------------------------------------------------------------------
+
+# (tipo, ruta) -> (firma, resultado). Se vuelve a leer cuando cambia la firma del archivo
+# (mtime_ns y tamaño) y se invalida al escribir por este módulo.
+CACHE_LECTURAS_MAX = 16
+_cache_lecturas = OrderedDict()
+_cache_lecturas_lock = threading.Lock()
+
+
+def _firma_archivo(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _copiar_lectura(resultado):
+    if isinstance(resultado, tuple):
+        return tuple(_copiar_lectura(r) for r in resultado)
+    return resultado.copy() if isinstance(resultado, pd.DataFrame) else resultado
+
+
+def lectura_cacheada(tipo: str, archivo, lector):
+    """
+    `lector(archivo)` reutilizando el resultado mientras el archivo no cambie. Siempre devuelve
+    copias (quien llama puede modificarlas). Errores y resultados None no se cachean.
+    """
+    clave = (tipo, os.path.abspath(archivo))
+    firma = _firma_archivo(archivo)
+    with _cache_lecturas_lock:
+        cached = _cache_lecturas.get(clave)
+        if cached is not None and firma is not None and cached[0] == firma:
+            _cache_lecturas.move_to_end(clave)
+            return _copiar_lectura(cached[1])
+
+    resultado = lector(archivo)
+    if firma is not None and resultado is not None and _firma_archivo(archivo) == firma:
+        with _cache_lecturas_lock:
+            _cache_lecturas[clave] = (firma, resultado)
+            _cache_lecturas.move_to_end(clave)
+            while len(_cache_lecturas) > CACHE_LECTURAS_MAX:
+                _cache_lecturas.popitem(last=False)
+    return _copiar_lectura(resultado)
+
+
+def invalidar_lecturas(archivo) -> None:
+    """Descarta las lecturas cacheadas de `archivo` (llamar después de escribirlo)."""
+    ruta = os.path.abspath(archivo)
+    with _cache_lecturas_lock:
+        for clave in [c for c in _cache_lecturas if c[1] == ruta]:
+            del _cache_lecturas[clave]
+
+
+# ---------------------------------------------------------------------------
+# Normalización
+# ---------------------------------------------------------------------------
+
+def normalizar_prestamos(prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame):
+    """
+    Columnas y tipos de préstamos y pagos como los usa el sistema: textos sin espacios, fechas
+    como datetime, montos en centavos (int), estado ACTIVO y tipo de pago NOMINA por defecto.
+
+    Returns:
+        (prestamos_df, pagos_df) con exactamente COLUMNAS_PRESTAMOS / COLUMNAS_PAGOS_PRESTAMO
+    """
+    # Asegurar columnas mínimas
+    for col in COLUMNAS_PRESTAMOS:
+        if col not in prestamos_df.columns:
+            prestamos_df[col] = None
+
+    for col in COLUMNAS_PAGOS_PRESTAMO:
+        if col not in pagos_df.columns:
+            pagos_df[col] = None
+
+    # IDs de empleado con la misma clave que la nómina (126756397.0 de Excel → "126756397"). Las
+    # versiones anteriores guardaban esos float como texto "126756397.0": también se corrigen.
+    for df in (prestamos_df, pagos_df):
+        df["employee_id"] = (
+            normalizar_ids(df["employee_id"]).fillna("").str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+        )
+
+    # Normalizar tipos
+    for col in ["loan_id", "employee_id", "employee_name", "estado", "nota"]:
+        prestamos_df[col] = prestamos_df[col].astype(str).where(prestamos_df[col].notna(), "")
+        prestamos_df[col] = prestamos_df[col].astype(str).str.strip()
+
+    prestamos_df["fecha_inicio"] = pd.to_datetime(prestamos_df["fecha_inicio"], errors="coerce")
+    prestamos_df["creado_en"] = pd.to_datetime(prestamos_df["creado_en"], errors="coerce")
+
+    for cent_col in ["monto_original_centavos", "cuota_quincenal_centavos", "saldo_centavos"]:
+        prestamos_df[cent_col] = (
+            pd.to_numeric(prestamos_df[cent_col], errors="coerce")
+            .fillna(0)
+            .astype(int)
+        )
+
+    prestamos_df["estado"] = prestamos_df["estado"].replace({"": "ACTIVO"}).fillna("ACTIVO")
+    prestamos_df["estado"] = prestamos_df["estado"].astype(str).str.upper().str.strip()
+
+    for col in ["payment_id", "loan_id", "employee_id", "tipo_pago", "nota"]:
+        pagos_df[col] = pagos_df[col].astype(str).where(pagos_df[col].notna(), "")
+        pagos_df[col] = pagos_df[col].astype(str).str.strip()
+
+    pagos_df["tipo_pago"] = pagos_df["tipo_pago"].replace({"": "NOMINA"}).fillna("NOMINA")
+    pagos_df["tipo_pago"] = pagos_df["tipo_pago"].astype(str).str.upper().str.strip()
+
+    for date_col in ["fecha_pago_nomina", "quincena_inicio", "quincena_fin", "creado_en"]:
+        pagos_df[date_col] = pd.to_datetime(pagos_df[date_col], errors="coerce")
+
+    for cent_col in ["monto_pagado_centavos", "saldo_antes_centavos", "saldo_despues_centavos"]:
+        pagos_df[cent_col] = (
+            pd.to_numeric(pagos_df[cent_col], errors="coerce")
+            .fillna(0)
+            .astype(int)
+        )
+
+    return prestamos_df[COLUMNAS_PRESTAMOS], pagos_df[COLUMNAS_PAGOS_PRESTAMO]
+
+
+# ---------------------------------------------------------------------------
+# Interfaz
+# ---------------------------------------------------------------------------
+
+class Almacen(ABC):
+    """
+    Lectura y escritura de las entidades persistentes. Los DataFrames tienen las mismas
+    columnas que las hojas de Excel de siempre; los préstamos se devuelven normalizados
+    (`normalizar_prestamos`), los empleados tal como están guardados.
+
+    Las lecturas completas pasan por la caché de lecturas. Las operaciones sobre una fila
+    (agregar/actualizar/eliminar un empleado, crear un préstamo, cambiarlo o registrarle un
+    pago) tienen aquí una versión que lee y reescribe todo; SQLite las hace fila por fila.
+    """
+
+    tipo = None
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.ruta!r})"
+
+    # --- Lecturas y escrituras completas ---------------------------------
+
+    def leer_empleados(self) -> pd.DataFrame:
+        return lectura_cacheada("empleados", self.ruta, lambda _: self._leer_empleados())
+
+    def guardar_empleados(self, df: pd.DataFrame) -> None:
+        self._guardar_empleados(df)
+        invalidar_lecturas(self.ruta)
+
+    def leer_prestamos(self):
+        """Returns: (prestamos_df, pagos_df) normalizados."""
+        return lectura_cacheada("prestamos", self.ruta, lambda _: normalizar_prestamos(*self._leer_prestamos()))
+
+    def guardar_prestamos(self, prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame) -> None:
+        self._guardar_prestamos(prestamos_df, pagos_df)
+        invalidar_lecturas(self.ruta)
+
+    def leer_seguridad_config(self) -> pd.DataFrame:
+        return lectura_cacheada("seguridad", self.ruta, lambda _: self._leer_seguridad_config())
+
+    def guardar_seguridad_config(self, df: pd.DataFrame) -> None:
+        self._guardar_seguridad_config(df)
+        invalidar_lecturas(self.ruta)
+
+    # --- Propias de cada implementación ----------------------------------
+
+    @abstractmethod
+    def tiene_empleados(self) -> bool:
+        """True si ya hay empleados guardados (aunque sea la tabla vacía)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _leer_empleados(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _guardar_empleados(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def asegurar_prestamos(self) -> None:
+        """Crea el almacenamiento de préstamos (vacío) si no existe."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _leer_prestamos(self):
+        """Returns: (prestamos_df, pagos_df) sin normalizar."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _guardar_prestamos(self, prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def asegurar_seguridad_config(self) -> None:
+        """Crea la configuración de seguridad con `configuracion_seguridad_inicial` si no existe."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _leer_seguridad_config(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _guardar_seguridad_config(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    # --- Operaciones sobre una fila --------------------------------------
+
+    def agregar_empleados(self, nuevos: pd.DataFrame) -> None:
+        """Agrega filas al final (las columnas que no existan se crean)."""
+        actual = self.leer_empleados() if self.tiene_empleados() else pd.DataFrame()
+        self.guardar_empleados(pd.concat([actual, nuevos], ignore_index=True))
+
+    def actualizar_empleado(self, employee_id, cambios: dict) -> int:
+        """Cambia las columnas de `cambios` del empleado con ese ID. Returns: filas cambiadas."""
+        df = self.leer_empleados()
+        mask = normalizar_ids(df["ID"]) == normalizar_id(employee_id)
+        if mask.any():
+            for col, valor in cambios.items():
+                df.loc[mask, col] = valor
+            self.guardar_empleados(df)
+        return int(mask.sum())
+
+    def eliminar_empleado(self, employee_id) -> int:
+        """Returns: filas eliminadas."""
+        df = self.leer_empleados()
+        mask = normalizar_ids(df["ID"]) == normalizar_id(employee_id)
+        if mask.any():
+            self.guardar_empleados(df[~mask])
+        return int(mask.sum())
+
+    def leer_prestamo(self, loan_id) -> Optional[dict]:
+        """Un préstamo (normalizado) o None si no existe."""
+        prestamos_df, _ = self.leer_prestamos()
+        filas = prestamos_df[prestamos_df["loan_id"] == str(loan_id).strip()]
+        return None if filas.empty else filas.iloc[0].to_dict()
+
+    def agregar_prestamo(self, prestamo: dict) -> None:
+        prestamos_df, pagos_df = self.leer_prestamos()
+        prestamos_df = pd.concat([prestamos_df, pd.DataFrame([prestamo])], ignore_index=True)
+        self.guardar_prestamos(prestamos_df, pagos_df)
+
+    def actualizar_prestamo(self, loan_id, cambios: dict) -> Optional[dict]:
+        """Aplica `cambios` al préstamo. Returns: el préstamo antes del cambio, o None si no existe."""
+        prestamos_df, pagos_df = self.leer_prestamos()
+        mask = prestamos_df["loan_id"] == str(loan_id).strip()
+        if not mask.any():
+            return None
+        antes = prestamos_df[mask].iloc[0].to_dict()
+        for col, valor in cambios.items():
+            prestamos_df.loc[mask, col] = valor
+        self.guardar_prestamos(prestamos_df, pagos_df)
+        return antes
+
+    def registrar_pago_prestamo(self, loan_id, calcular) -> Optional[dict]:
+        """
+        Registra un pago en la bitácora y actualiza el préstamo en una sola escritura.
+        `calcular(prestamo)` recibe el préstamo actual y devuelve (cambios, pago); si lanza una
+        excepción no se guarda nada.
+
+        Returns:
+            el pago registrado, o None si el préstamo no existe
+        """
+        prestamos_df, pagos_df = self.leer_prestamos()
+        mask = prestamos_df["loan_id"] == str(loan_id).strip()
+        if not mask.any():
+            return None
+        cambios, pago = calcular(prestamos_df[mask].iloc[0].to_dict())
+        for col, valor in cambios.items():
+            prestamos_df.loc[mask, col] = valor
+        pagos_df = pd.concat([pagos_df, pd.DataFrame([pago])], ignore_index=True)
+        self.guardar_prestamos(prestamos_df, pagos_df)
+        return pago
+
+
+def _crear_carpeta(ruta: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+
+
+class AlmacenExcel(Almacen):
+    """Un libro de Excel por entidad; cada escritura reescribe el libro completo."""
+
+    tipo = TIPO_EXCEL
+
+    def tiene_empleados(self) -> bool:
+        return os.path.exists(self.ruta)
+
+    def _leer_empleados(self) -> pd.DataFrame:
+        return pd.read_excel(self.ruta)
+
+    def _guardar_empleados(self, df: pd.DataFrame) -> None:
+        df.to_excel(self.ruta, index=False, engine='openpyxl')
+
+    def asegurar_prestamos(self) -> None:
+        if os.path.exists(self.ruta):
+            return
+        _crear_carpeta(self.ruta)
+        self.guardar_prestamos(pd.DataFrame(columns=COLUMNAS_PRESTAMOS), pd.DataFrame(columns=COLUMNAS_PAGOS_PRESTAMO))
+
+    def _leer_prestamos(self):
+        xls = pd.ExcelFile(self.ruta)
+        prestamos_df = (
+            pd.read_excel(xls, sheet_name="Prestamos")
+            if "Prestamos" in xls.sheet_names
+            else pd.DataFrame()
+        )
+        pagos_df = (
+            pd.read_excel(xls, sheet_name="PagosPrestamo")
+            if "PagosPrestamo" in xls.sheet_names
+            else pd.DataFrame()
+        )
+        return prestamos_df, pagos_df
+
+    def _guardar_prestamos(self, prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame) -> None:
+        with pd.ExcelWriter(self.ruta, engine="openpyxl") as writer:
+            prestamos_df.to_excel(writer, sheet_name="Prestamos", index=False)
+            pagos_df.to_excel(writer, sheet_name="PagosPrestamo", index=False)
+
+    def asegurar_seguridad_config(self) -> None:
+        if os.path.exists(self.ruta):
+            return
+        _crear_carpeta(self.ruta)
+        self.guardar_seguridad_config(configuracion_seguridad_inicial())
+
+    def _leer_seguridad_config(self) -> pd.DataFrame:
+        return pd.read_excel(self.ruta, sheet_name="Config")
+
+    def _guardar_seguridad_config(self, df: pd.DataFrame) -> None:
+        with pd.ExcelWriter(self.ruta, engine="openpyxl") as writer:
+            df.to_excel(writer, sheet_name="Config", index=False)
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+_ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS prestamos (
+    fila INTEGER PRIMARY KEY,
+    loan_id TEXT NOT NULL,
+    employee_id TEXT,
+    employee_name TEXT,
+    fecha_inicio TEXT,
+    monto_original_centavos INTEGER,
+    cuota_quincenal_centavos INTEGER,
+    saldo_centavos INTEGER,
+    estado TEXT,
+    nota TEXT,
+    creado_en TEXT
+);
+CREATE TABLE IF NOT EXISTS pagos_prestamo (
+    fila INTEGER PRIMARY KEY,
+    payment_id TEXT,
+    loan_id TEXT,
+    employee_id TEXT,
+    tipo_pago TEXT,
+    fecha_pago_nomina TEXT,
+    quincena_inicio TEXT,
+    quincena_fin TEXT,
+    monto_pagado_centavos INTEGER,
+    saldo_antes_centavos INTEGER,
+    saldo_despues_centavos INTEGER,
+    nota TEXT,
+    creado_en TEXT
+);
+CREATE TABLE IF NOT EXISTS seguridad_config (
+    fila INTEGER PRIMARY KEY,
+    vigente_desde TEXT,
+    horas_turno INTEGER,
+    hora_cambio_turno TEXT,
+    margen_salida_minutos INTEGER,
+    tolerancia_turno_minutos INTEGER,
+    empleados_turno_dia INTEGER,
+    empleados_turno_noche INTEGER,
+    nota TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_prestamos_loan ON prestamos (loan_id);
+CREATE INDEX IF NOT EXISTS idx_prestamos_empleado ON prestamos (employee_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_loan ON pagos_prestamo (loan_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_empleado ON pagos_prestamo (employee_id);
+"""
+
+# Fechas de las tablas fijas (texto ISO en la base, datetime al leer como en Excel)
+COLUMNAS_FECHA = {
+    "prestamos": ("fecha_inicio", "creado_en"),
+    "pagos_prestamo": ("fecha_pago_nomina", "quincena_inicio", "quincena_fin", "creado_en"),
+    "seguridad_config": ("vigente_desde",),
+}
+
+# Empleados: las columnas son las del archivo de cada empresa (se crean al guardar), más el orden
+TABLA_EMPLEADOS = "empleados"
+COLUMNA_FILA = "_fila"
+
+
+def _identificador(nombre) -> str:
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def _valor_sql(valor):
+    """Valor de una celda como tipo que SQLite guarda tal cual (fechas como texto ISO)."""
+    if valor is None or (not isinstance(valor, (str, bytes)) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (pd.Timestamp, datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, time):
+        return str(valor)
+    if isinstance(valor, (bool, np.bool_)):
+        return int(valor)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return float(valor)
+    return valor
+
+
+def _filas_sql(df: pd.DataFrame, columnas) -> list:
+    datos = df.reindex(columns=columnas).astype(object)
+    return [tuple(_valor_sql(v) for v in fila) for fila in datos.itertuples(index=False, name=None)]
+
+
+def _dataframe_sql(cursor, fechas=(), quitar=("fila", COLUMNA_FILA)) -> pd.DataFrame:
+    """Resultado de una consulta como lo daría read_excel (celdas vacías como NaN, tipos inferidos)."""
+    columnas = [d[0] for d in cursor.description]
+    df = pd.DataFrame.from_records(cursor.fetchall(), columns=columnas)
+    df = df.drop(columns=[c for c in quitar if c in df.columns])
+    for columna in df.columns:
+        if columna in fechas:
+            df[columna] = pd.to_datetime(df[columna], format="ISO8601", errors="coerce")
+        elif df[columna].dtype == object:
+            df[columna] = df[columna].where(df[columna].notna(), np.nan)
+    return df.infer_objects()
+
+
+def _valores_id(employee_id) -> list:
+    """
+    Valores con los que puede estar guardado un ID en la tabla de empleados: los IDs numéricos
+    del Excel quedan como INTEGER y los demás como TEXT, y SQLite no compara uno con otro.
+    """
+    clave = normalizar_id(employee_id)
+    valores = [clave]
+    if clave is not None and clave.isdigit() and str(int(clave)) == clave:
+        valores.append(int(clave))
+    return valores
+
+
+def _asignaciones_sql(cambios: dict):
+    """SET de un UPDATE y sus parámetros."""
+    return (
+        ", ".join(f"{_identificador(col)} = ?" for col in cambios),
+        [_valor_sql(valor) for valor in cambios.values()],
+    )
+
+
+class AlmacenSqlite(Almacen):
+    """
+    Todas las entidades en una base SQLite; cada escritura es una transacción. Las operaciones
+    sobre una fila usan los índices por ID de empleado y de préstamo y no leen ni reescriben
+    las tablas completas.
+    """
+
+    tipo = TIPO_SQLITE
+
+    def _conectar(self):
+        _crear_carpeta(self.ruta)
+        conn = sqlite3.connect(self.ruta, timeout=30)
+        conn.executescript(_ESQUEMA_SQLITE)
+        return conn
+
+    def _reemplazar(self, conn, tabla: str, df: pd.DataFrame, columnas) -> None:
+        conn.execute(f"DELETE FROM {tabla}")
+        self._insertar(conn, tabla, df, columnas)
+
+    def _insertar(self, conn, tabla: str, df: pd.DataFrame, columnas) -> None:
+        marcas = ", ".join("?" for _ in columnas)
+        conn.executemany(
+            f"INSERT INTO {tabla} ({', '.join(_identificador(c) for c in columnas)}) VALUES ({marcas})",
+            _filas_sql(df, columnas),
+        )
+
+    def existe_tabla(self, tabla: str) -> bool:
+        if not os.path.exists(self.ruta):
+            return False
+        with closing(sqlite3.connect(self.ruta, timeout=30)) as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+            ).fetchone() is not None
+
+    # --- Empleados -------------------------------------------------------
+
+    def tiene_empleados(self) -> bool:
+        return self.existe_tabla(TABLA_EMPLEADOS)
+
+    def _leer_empleados(self) -> pd.DataFrame:
+        if not self.tiene_empleados():
+            raise FileNotFoundError(f"La base '{self.ruta}' no tiene empleados (use 'almacenamiento.py migrar')")
+        with closing(self._conectar()) as conn:
+            return _dataframe_sql(conn.execute(f"SELECT * FROM {TABLA_EMPLEADOS} ORDER BY {COLUMNA_FILA}"))
+
+    @staticmethod
+    def _datos_empleados(df: pd.DataFrame) -> pd.DataFrame:
+        return df.set_axis([str(c) for c in df.columns], axis=1).drop(columns=[COLUMNA_FILA], errors="ignore")
+
+    @staticmethod
+    def _crear_tabla_empleados(conn, columnas) -> None:
+        definicion = ", ".join([f"{COLUMNA_FILA} INTEGER PRIMARY KEY"] + [_identificador(c) for c in columnas])
+        conn.execute(f"CREATE TABLE {TABLA_EMPLEADOS} ({definicion})")
+        if "ID" in columnas:
+            conn.execute(f'CREATE INDEX idx_empleados_id ON {TABLA_EMPLEADOS} ("ID")')
+
+    @staticmethod
+    def _asegurar_columnas_empleados(conn, columnas) -> None:
+        """Agrega a la tabla de empleados las columnas que todavía no tiene."""
+        existentes = {fila[1] for fila in conn.execute(f"PRAGMA table_info({TABLA_EMPLEADOS})")}
+        for columna in columnas:
+            if columna not in existentes:
+                conn.execute(f"ALTER TABLE {TABLA_EMPLEADOS} ADD COLUMN {_identificador(columna)}")
+
+    def _guardar_empleados(self, df: pd.DataFrame) -> None:
+        datos = self._datos_empleados(df)
+        with closing(self._conectar()) as conn, conn:
+            # Reemplazo completo: la tabla toma exactamente las columnas de `df`
+            conn.execute(f"DROP TABLE IF EXISTS {TABLA_EMPLEADOS}")
+            self._crear_tabla_empleados(conn, list(datos.columns))
+            self._insertar(conn, TABLA_EMPLEADOS, datos, list(datos.columns))
+
+    def agregar_empleados(self, nuevos: pd.DataFrame) -> None:
+        datos = self._datos_empleados(nuevos)
+        columnas = list(datos.columns)
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLA_EMPLEADOS,)).fetchone():
+                self._asegurar_columnas_empleados(conn, columnas)
+            else:
+                self._crear_tabla_empleados(conn, columnas)
+            self._insertar(conn, TABLA_EMPLEADOS, datos, columnas)
+        invalidar_lecturas(self.ruta)
+
+    def actualizar_empleado(self, employee_id, cambios: dict) -> int:
+        if not self.tiene_empleados():
+            return 0
+        cambios = {str(col): valor for col, valor in cambios.items()}
+        asignaciones, parametros = _asignaciones_sql(cambios)
+        valores = _valores_id(employee_id)
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._asegurar_columnas_empleados(conn, list(cambios))
+            cambiadas = conn.execute(
+                f'UPDATE {TABLA_EMPLEADOS} SET {asignaciones} WHERE "ID" IN ({", ".join("?" for _ in valores)})',
+                parametros + valores,
+            ).rowcount
+        invalidar_lecturas(self.ruta)
+        return cambiadas
+
+    def eliminar_empleado(self, employee_id) -> int:
+        if not self.tiene_empleados():
+            return 0
+        valores = _valores_id(employee_id)
+        with closing(self._conectar()) as conn, conn:
+            eliminadas = conn.execute(
+                f'DELETE FROM {TABLA_EMPLEADOS} WHERE "ID" IN ({", ".join("?" for _ in valores)})', valores
+            ).rowcount
+        invalidar_lecturas(self.ruta)
+        return eliminadas
+
+    # --- Préstamos -------------------------------------------------------
+
+    def asegurar_prestamos(self) -> None:
+        with closing(self._conectar()):
+            pass
+
+    def _leer_prestamos(self):
+        with closing(self._conectar()) as conn:
+            prestamos_df = _dataframe_sql(conn.execute("SELECT * FROM prestamos ORDER BY fila"), COLUMNAS_FECHA["prestamos"])
+            pagos_df = _dataframe_sql(conn.execute("SELECT * FROM pagos_prestamo ORDER BY fila"), COLUMNAS_FECHA["pagos_prestamo"])
+        return prestamos_df, pagos_df
+
+    def _guardar_prestamos(self, prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame) -> None:
+        with closing(self._conectar()) as conn, conn:
+            self._reemplazar(conn, "prestamos", prestamos_df, COLUMNAS_PRESTAMOS)
+            self._reemplazar(conn, "pagos_prestamo", pagos_df, COLUMNAS_PAGOS_PRESTAMO)
+
+    @staticmethod
+    def _prestamo(conn, loan_id) -> Optional[dict]:
+        df = _dataframe_sql(
+            conn.execute("SELECT * FROM prestamos WHERE loan_id = ?", (str(loan_id).strip(),)),
+            COLUMNAS_FECHA["prestamos"],
+        )
+        if df.empty:
+            return None
+        prestamos_df, _ = normalizar_prestamos(df, pd.DataFrame())
+        return prestamos_df.iloc[0].to_dict()
+
+    @staticmethod
+    def _cambiar_prestamo(conn, loan_id, cambios: dict) -> None:
+        if cambios:
+            asignaciones, parametros = _asignaciones_sql(cambios)
+            conn.execute(f"UPDATE prestamos SET {asignaciones} WHERE loan_id = ?", parametros + [str(loan_id).strip()])
+
+    def leer_prestamo(self, loan_id) -> Optional[dict]:
+        with closing(self._conectar()) as conn:
+            return self._prestamo(conn, loan_id)
+
+    def agregar_prestamo(self, prestamo: dict) -> None:
+        with closing(self._conectar()) as conn, conn:
+            self._insertar(conn, "prestamos", pd.DataFrame([prestamo]), COLUMNAS_PRESTAMOS)
+        invalidar_lecturas(self.ruta)
+
+    def actualizar_prestamo(self, loan_id, cambios: dict) -> Optional[dict]:
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            antes = self._prestamo(conn, loan_id)
+            if antes is not None:
+                self._cambiar_prestamo(conn, loan_id, cambios)
+        invalidar_lecturas(self.ruta)
+        return antes
+
+    def registrar_pago_prestamo(self, loan_id, calcular) -> Optional[dict]:
+        # BEGIN IMMEDIATE: nadie más escribe entre leer el saldo y guardar el pago
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            prestamo = self._prestamo(conn, loan_id)
+            if prestamo is None:
+                return None
+            cambios, pago = calcular(prestamo)
+            self._cambiar_prestamo(conn, loan_id, cambios)
+            self._insertar(conn, "pagos_prestamo", pd.DataFrame([pago]), COLUMNAS_PAGOS_PRESTAMO)
+        invalidar_lecturas(self.ruta)
+        return pago
+
+    # --- Seguridad -------------------------------------------------------
+
+    def asegurar_seguridad_config(self) -> None:
+        with closing(self._conectar()) as conn, conn:
+            if conn.execute("SELECT COUNT(*) FROM seguridad_config").fetchone()[0] == 0:
+                self._reemplazar(conn, "seguridad_config", configuracion_seguridad_inicial(), COLUMNAS_SEGURIDAD_CONFIG)
+        invalidar_lecturas(self.ruta)
+
+    def _leer_seguridad_config(self) -> pd.DataFrame:
+        with closing(self._conectar()) as conn:
+            return _dataframe_sql(conn.execute("SELECT * FROM seguridad_config ORDER BY fila"), COLUMNAS_FECHA["seguridad_config"])
+
+    def _guardar_seguridad_config(self, df: pd.DataFrame) -> None:
+        with closing(self._conectar()) as conn, conn:
+            self._reemplazar(conn, "seguridad_config", df, COLUMNAS_SEGURIDAD_CONFIG)
+
+
+def es_sqlite(ruta) -> bool:
+    return str(ruta).lower().endswith(EXTENSIONES_SQLITE)
+
+
+def almacen_para(ruta) -> Almacen:
+    """Implementación que corresponde a `ruta` (.sqlite/.db → SQLite, cualquier otra → Excel)."""
+    return AlmacenSqlite(ruta) if es_sqlite(ruta) else AlmacenExcel(ruta)
+
+
+# ---------------------------------------------------------------------------
+# Configuración
+# ---------------------------------------------------------------------------
+
+def leer_configuracion() -> dict:
+    """
+    Tipo de almacenamiento y base SQLite en uso: `datos/almacenamiento.json` si existe; la
+    variable de entorno NOMINA_ALMACENAMIENTO (excel|sqlite) tiene prioridad sobre el tipo.
+    """
+    configuracion = {"tipo": TIPO_EXCEL, "base": os.path.join(DATA_DIR, BASE_SQLITE)}
+    if os.path.exists(ARCHIVO_CONFIGURACION):
+        try:
+            with open(ARCHIVO_CONFIGURACION, encoding="utf-8") as f:
+                configuracion.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"[ADVERTENCIA] No se pudo leer '{ARCHIVO_CONFIGURACION}', se usa Excel: {e}")
+    tipo = os.environ.get(VARIABLE_ENTORNO, "").strip().lower()
+    if tipo:
+        configuracion["tipo"] = tipo
+    if configuracion["tipo"] not in TIPOS_ALMACENAMIENTO:
+        print(f"[ADVERTENCIA] Almacenamiento desconocido '{configuracion['tipo']}', se usa Excel")
+        configuracion["tipo"] = TIPO_EXCEL
+    if not os.path.isabs(configuracion["base"]):
+        configuracion["base"] = os.path.join(DATA_DIR, configuracion["base"])
+    return configuracion
+
+
+def guardar_configuracion(tipo: str, base=None) -> None:
+    if tipo not in TIPOS_ALMACENAMIENTO:
+        raise ValueError(f"Tipo de almacenamiento desconocido: {tipo} (use {', '.join(TIPOS_ALMACENAMIENTO)})")
+    configuracion = {"tipo": tipo}
+    if base:
+        configuracion["base"] = os.path.abspath(base)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(ARCHIVO_CONFIGURACION, "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, ensure_ascii=False, indent=2)
+
+
+def rutas_por_defecto() -> dict:
+    """Rutas de empleados, préstamos y configuración de seguridad según la configuración."""
+    configuracion = leer_configuracion()
+    if configuracion["tipo"] == TIPO_SQLITE:
+        base = configuracion["base"]
+        return {"empleados": base, "prestamos": base, "seguridad_horario": base}
+    return {
+        "empleados": os.path.join(DATA_DIR, ARCHIVO_EMPLEADOS),
+        "prestamos": os.path.join(DATA_DIR, ARCHIVO_PRESTAMOS),
+        "seguridad_horario": os.path.join(DATA_DIR, ARCHIVO_SEGURIDAD_HORARIO),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Migración
+# ---------------------------------------------------------------------------
+
+def migrar(origen: Almacen, destino: Almacen, empleados=True, prestamos=True, seguridad=True) -> dict:
+    """
+    Copia las entidades de `origen` a `destino` (reemplazando lo que haya) y verifica que
+    queden las mismas filas.
+
+    Returns:
+        dict entidad -> filas copiadas
+    """
+    copiadas = {}
+    if empleados:
+        df = origen.leer_empleados()
+        destino.guardar_empleados(df)
+        copiadas["empleados"] = len(df)
+    if prestamos:
+        prestamos_df, pagos_df = origen.leer_prestamos()
+        destino.guardar_prestamos(prestamos_df, pagos_df)
+        copiadas["prestamos"], copiadas["pagos_prestamo"] = len(prestamos_df), len(pagos_df)
+    if seguridad:
+        df = origen.leer_seguridad_config()
+        destino.guardar_seguridad_config(df)
+        copiadas["seguridad_config"] = len(df)
+
+    leidas = {}
+    if empleados:
+        leidas["empleados"] = len(destino.leer_empleados())
+    if prestamos:
+        prestamos_df, pagos_df = destino.leer_prestamos()
+        leidas["prestamos"], leidas["pagos_prestamo"] = len(prestamos_df), len(pagos_df)
+    if seguridad:
+        leidas["seguridad_config"] = len(destino.leer_seguridad_config())
+    if leidas != copiadas:
+        raise ValueError(f"La migración no coincide: copiadas {copiadas}, leídas {leidas}")
+    return copiadas
+
+
+def migrar_carpeta_a_sqlite(carpeta=None, base=None, activar: bool = False) -> dict:
+    """
+    Convierte los Excel de una carpeta datos/ (empleados, préstamos, seguridad) a una base SQLite.
+    Los Excel no se modifican. Con activar=True la base queda como almacenamiento por defecto.
+    """
+    carpeta = carpeta or DATA_DIR
+    base = base or os.path.join(carpeta, BASE_SQLITE)
+    destino = AlmacenSqlite(base)
+    copiadas = {}
+    for archivo, entidad in (
+        (ARCHIVO_EMPLEADOS, "empleados"),
+        (ARCHIVO_PRESTAMOS, "prestamos"),
+        (ARCHIVO_SEGURIDAD_HORARIO, "seguridad"),
+    ):
+        ruta = os.path.join(carpeta, archivo)
+        if not os.path.exists(ruta):
+            print(f"[ADVERTENCIA] No existe '{ruta}', se omite")
+            continue
+        entidades = {"empleados": False, "prestamos": False, "seguridad": False, entidad: True}
+        copiadas.update(migrar(AlmacenExcel(ruta), destino, **entidades))
+    if activar:
+        guardar_configuracion(TIPO_SQLITE, base)
+    return copiadas
+
+
+def exportar_sqlite_a_carpeta(carpeta, base=None) -> dict:
+    """
+    Escribe el contenido de una base SQLite como los Excel de siempre (employees_information.xlsx,
+    prestamos.xlsx, seguridad_horario.xlsx) en `carpeta`, reemplazando los que haya.
+    """
+    origen = AlmacenSqlite(base or leer_configuracion()["base"])
+    if not os.path.exists(origen.ruta):
+        raise FileNotFoundError(f"No existe la base '{origen.ruta}'")
+    os.makedirs(carpeta, exist_ok=True)
+    copiadas = {}
+    if origen.tiene_empleados():
+        copiadas.update(migrar(origen, AlmacenExcel(os.path.join(carpeta, ARCHIVO_EMPLEADOS)),
+                               prestamos=False, seguridad=False))
+    else:
+        print(f"[ADVERTENCIA] La base '{origen.ruta}' no tiene empleados, se omiten")
+    copiadas.update(migrar(origen, AlmacenExcel(os.path.join(carpeta, ARCHIVO_PRESTAMOS)),
+                           empleados=False, seguridad=False))
+    copiadas.update(migrar(origen, AlmacenExcel(os.path.join(carpeta, ARCHIVO_SEGURIDAD_HORARIO)),
+                           empleados=False, prestamos=False))
+    return copiadas
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Almacenamiento de empleados, préstamos y configuración de seguridad.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("migrar", help="Convertir los Excel de una carpeta datos/ a SQLite")
+    p.add_argument("--datos", default=DATA_DIR, help="Carpeta con los Excel (por defecto datos/)")
+    p.add_argument("--base", default=None, help="Base SQLite de destino (por defecto <datos>/nomina.sqlite)")
+    p.add_argument("--activar", action="store_true", help="Usar la base como almacenamiento por defecto")
+    p = sub.add_parser("exportar", help="Escribir una base SQLite como los Excel de siempre")
+    p.add_argument("carpeta", help="Carpeta de destino (se reemplazan los Excel que haya)")
+    p.add_argument("--base", default=None, help="Base SQLite de origen (por defecto la configurada)")
+    p = sub.add_parser("usar", help="Elegir el almacenamiento por defecto")
+    p.add_argument("tipo", choices=TIPOS_ALMACENAMIENTO)
+    p.add_argument("--base", default=None, help="Base SQLite (solo para sqlite)")
+    sub.add_parser("ver", help="Mostrar el almacenamiento en uso")
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        try:
+            copiadas = migrar_carpeta_a_sqlite(args.datos, args.base, args.activar)
+        except Exception as e:
+            print(f"[ERROR] No se pudo migrar: {e}")
+            sys.exit(1)
+        for entidad, filas in copiadas.items():
+            print(f"[OK] {entidad}: {filas} filas")
+        if args.activar:
+            print("[OK] La base SQLite queda como almacenamiento por defecto")
+    elif args.comando == "exportar":
+        try:
+            copiadas = exportar_sqlite_a_carpeta(args.carpeta, args.base)
+        except Exception as e:
+            print(f"[ERROR] No se pudo exportar: {e}")
+            sys.exit(1)
+        for entidad, filas in copiadas.items():
+            print(f"[OK] {entidad}: {filas} filas")
+    elif args.comando == "usar":
+        guardar_configuracion(args.tipo, args.base)
+        print(f"[OK] Almacenamiento por defecto: {args.tipo}")
+    configuracion = leer_configuracion()
+    print(f"Almacenamiento: {configuracion['tipo']}" + (
+        f" ({configuracion['base']})" if configuracion["tipo"] == TIPO_SQLITE else ""
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark de punta a punta de la nómina quincenal con datos sintéticos.
+
+Genera (o reutiliza) un juego de datos por escenario con `datos_sinteticos.py`, mide la corrida
+completa (vista previa + guardar) con el tiempo de cada etapa según `PayrollRun.metricas`, y
+agrega el resultado a un historial JSON (datos/benchmarks/historial_benchmarks.json) para
+comparar entre versiones.
+
+Uso:
+    python benchmark_nomina.py --empleados 100 1000 --meses 1 --repeticiones 3
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import main
+from datos_sinteticos import generar_datos_sinteticos
+
+CARPETA_BENCHMARKS = os.path.join(main.DATA_DIR, "benchmarks")
+DEFAULT_HISTORIAL_BENCHMARKS = os.path.join(CARPETA_BENCHMARKS, "historial_benchmarks.json")
+
+
+def preparar_datos(empleados: int, meses: int, semilla: int = 1, carpeta=None) -> dict:
+    """Datos sintéticos del escenario; se generan una sola vez y se reutilizan."""
+    if carpeta is None:
+        carpeta = os.path.join(CARPETA_BENCHMARKS, f"datos_{empleados}e_{meses}m_s{semilla}")
+    rutas_json = os.path.join(carpeta, "rutas.json")
+    if os.path.exists(rutas_json):
+        with open(rutas_json, encoding="utf-8") as f:
+            return json.load(f)
+    rutas = generar_datos_sinteticos(carpeta, empleados=empleados, meses=meses, semilla=semilla)
+    with open(rutas_json, "w", encoding="utf-8") as f:
+        json.dump(rutas, f, ensure_ascii=False, indent=2)
+    return rutas
+
+
+def _corrida_completa(rutas: dict, carpeta_tmp: str) -> dict:
+    """
+    Vista previa + guardar (como `calculate_payroll_quincenal`), sin caché y sobre copias.
+    Devuelve los segundos de cada etapa (`run.metricas`) y de la corrida completa.
+    """
+    prestamos = os.path.join(carpeta_tmp, "prestamos.xlsx")
+    shutil.copy(rutas["prestamos"], prestamos)
+    main.limpiar_cache_nominas()
+    inicio = time.perf_counter()
+    run = main.calcular_vista_previa_nomina(
+        rutas["empleados"], rutas["asistencia"], rutas["quincena_fecha"], prestamos,
+        rutas["seguridad_horario"], usar_cache=False,
+    )
+    resultado = main.guardar_nomina_quincenal(
+        run, os.path.join(carpeta_tmp, "nomina.xlsx"), historial_db=os.path.join(carpeta_tmp, "historial.sqlite")
+    )
+    transcurrido = time.perf_counter() - inicio
+    if resultado is None:
+        raise RuntimeError(f"La corrida completa falló: {run.errores}")
+    tiempos = {etapa: datos["segundos"] for etapa, datos in run.metricas.etapas.items()}
+    tiempos["corrida_completa"] = transcurrido
+    return tiempos
+
+
+def ejecutar_benchmark(empleados: int, meses: int, repeticiones: int = 3, semilla: int = 1) -> dict:
+    """
+    Mide un escenario. Cada etapa y la corrida completa se repiten `repeticiones` veces;
+    se informa la mediana y el mínimo en segundos.
+    """
+    rutas = preparar_datos(empleados, meses, semilla)
+    muestras = {}
+    with tempfile.TemporaryDirectory() as carpeta_tmp:
+        for _ in range(repeticiones):
+            with contextlib.redirect_stdout(io.StringIO()):
+                tiempos = _corrida_completa(rutas, carpeta_tmp)
+            for etapa, segundos in tiempos.items():
+                muestras.setdefault(etapa, []).append(segundos)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "escenario": {"empleados": empleados, "meses": meses, "semilla": semilla, "marcaciones": rutas.get("marcaciones")},
+        "repeticiones": repeticiones,
+        "version_codigo": main._obtener_version_codigo(),
+        "version_reglas": main.VERSION_REGLAS,
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "etapas": {
+            etapa: {"mediana": float(np.median(valores)), "minimo": float(np.min(valores))}
+            for etapa, valores in muestras.items()
+        },
+    }
+
+
+def guardar_resultado(resultado: dict, archivo=None) -> None:
+    """Agrega el resultado al historial JSON de benchmarks."""
+    if archivo is None:
+        archivo = DEFAULT_HISTORIAL_BENCHMARKS
+    historial = []
+    if os.path.exists(archivo):
+        with open(archivo, encoding="utf-8") as f:
+            historial = json.load(f)
+    historial.append(resultado)
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(historial, f, ensure_ascii=False, indent=2)
+
+
+def resultado_anterior(resultado: dict, archivo=None):
+    """Último resultado guardado del mismo escenario (o None)."""
+    if archivo is None:
+        archivo = DEFAULT_HISTORIAL_BENCHMARKS
+    if not os.path.exists(archivo):
+        return None
+    with open(archivo, encoding="utf-8") as f:
+        historial = json.load(f)
+    iguales = [r for r in historial if r.get("escenario", {}).get("empleados") == resultado["escenario"]["empleados"]
+               and r.get("escenario", {}).get("meses") == resultado["escenario"]["meses"]]
+    return iguales[-1] if iguales else None
+
+
+def imprimir_resultado(resultado: dict, anterior=None) -> None:
+    esc = resultado["escenario"]
+    print(f"\nEscenario: {esc['empleados']} empleados, {esc['meses']} mes(es), {esc['marcaciones']} marcaciones")
+    print(f"{'Etapa':<22}{'Mediana (s)':>14}{'Mínimo (s)':>14}{'vs anterior':>14}")
+    for etapa, t in resultado["etapas"].items():
+        cambio = ""
+        if anterior and etapa in anterior.get("etapas", {}) and anterior["etapas"][etapa]["mediana"] > 0:
+            cambio = f"{(t['mediana'] / anterior['etapas'][etapa]['mediana'] - 1) * 100:+.1f}%"
+        print(f"{etapa:<22}{t['mediana']:>14.4f}{t['minimo']:>14.4f}{cambio:>14}")
+
+
+def main_cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark de la nómina quincenal con datos sintéticos.")
+    parser.add_argument("--empleados", type=int, nargs="+", default=[100], help="Escalas a medir (ej. 100 1000 10000)")
+    parser.add_argument("--meses", type=int, nargs="+", default=[1], help="Meses de asistencia (1 a 12)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--historial", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--no-guardar", action="store_true", help="No agregar al historial")
+    args = parser.parse_args()
+
+    for empleados in args.empleados:
+        for meses in args.meses:
+            try:
+                resultado = ejecutar_benchmark(empleados, meses, args.repeticiones, args.semilla)
+            except Exception as e:
+                print(f"[ERROR] Escenario {empleados} empleados / {meses} mes(es): {e}")
+                continue
+            imprimir_resultado(resultado, resultado_anterior(resultado, args.historial))
+            if not args.no_guardar:
+                guardar_resultado(resultado, args.historial)
+    if not args.no_guardar:
+        print(f"\n[OK] Resultados agregados a {args.historial or DEFAULT_HISTORIAL_BENCHMARKS}")
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
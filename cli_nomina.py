@@ -0,0 +1,324 @@
+"""
+Línea de comandos sin interfaz gráfica ni preguntas, para correr la nómina desde tareas
+programadas (cron, Programador de tareas de Windows) o scripts.
+
+Ejemplos:
+    python cli_nomina.py calcular --fecha 31/01/2026 --formatos csv npz
+    python cli_nomina.py calcular --empleados sede2/empleados.xlsx --asistencia sede2/asistencia.xlsx --simular --json
+    python cli_nomina.py recibos datos/nomina_quincenal_pago_20260131.xlsx --seguridad
+    python cli_nomina.py prestamos crear --empleado 8-123-456 --nombre "JUAN PEREZ" --monto 500 --cuota 50
+    python cli_nomina.py empleados importar nuevos.csv --actualizar
+    python cli_nomina.py servir --puerto 8765
+
+Con --json el resultado se imprime como JSON en stdout y los mensajes del sistema van a stderr.
+Códigos de salida: ver SALIDA_*.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+
+import main
+from diagnostico import activar_desde_argumentos
+from generador_recibos import generar_recibos
+import servicio_nomina
+
+SALIDA_OK = 0
+SALIDA_ERROR = 1  # errores de datos o validación (nómina con errores, préstamo inexistente, etc.)
+SALIDA_USO = 2  # argumentos inválidos (mismo código que argparse)
+SALIDA_ARCHIVO = 3  # archivo no encontrado o no se pudo leer/escribir
+SALIDA_ERROR_INTERNO = 4  # error inesperado
+
+
+class ErrorCli(Exception):
+    """Error que termina el comando con `codigo`; `resultado` (parcial) se imprime igual."""
+
+    def __init__(self, mensaje, codigo=SALIDA_ERROR, resultado=None):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.resultado = resultado
+
+
+def _fecha(texto):
+    """Fecha DD/MM/YYYY de la línea de comandos (argparse muestra el error si no es válida)."""
+    try:
+        return datetime.strptime(texto, "%d/%m/%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}' (use DD/MM/YYYY, ej. 15/01/2026)")
+
+
+def _monto(texto):
+    """Monto en dólares de la línea de comandos, con punto decimal (ej. 500 o 12.50)."""
+    try:
+        monto = Decimal(texto.strip())
+    except InvalidOperation:
+        monto = None
+    if monto is None or not monto.is_finite():
+        raise argparse.ArgumentTypeError(f"monto inválido '{texto}' (use solo números con punto decimal, ej. 500 o 12.50)")
+    return monto
+
+
+def _archivo_existente(ruta, descripcion):
+    if ruta and not os.path.exists(ruta):
+        raise ErrorCli(f"No existe el archivo de {descripcion}: {ruta}", SALIDA_ARCHIVO)
+
+
+def _registros(df: pd.DataFrame) -> list:
+    return json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))
+
+
+# ---------------------------------------------------------------------------
+# Comandos
+# ---------------------------------------------------------------------------
+
+def comando_calcular(args) -> dict:
+    _archivo_existente(args.empleados, "empleados")
+    _archivo_existente(args.asistencia, "asistencia")
+    if args.salida and not args.simular:
+        # Antes de calcular: si la carpeta no se puede crear, no se registran los descuentos de préstamos
+        carpeta_salida = os.path.dirname(os.path.abspath(args.salida))
+        try:
+            os.makedirs(carpeta_salida, exist_ok=True)
+        except OSError as e:
+            raise ErrorCli(f"No se pudo crear la carpeta de salida '{carpeta_salida}': {e}", SALIDA_ARCHIVO)
+    quincena_fecha = args.fecha.strftime("%d/%m/%Y") if args.fecha else None
+    run = main.calcular_vista_previa_nomina(
+        employees_file=args.empleados,
+        hours_file=args.asistencia,
+        quincena_fecha=quincena_fecha,
+        prestamos_file=args.prestamos,
+        seguridad_horario_file=args.seguridad_horario,
+        usar_cache=False,
+    )
+    if run.ok and not args.simular:
+        guardado = main.guardar_nomina_quincenal(
+            run, args.salida, historial_db=args.historial_db,
+            metricas_log=main.DEFAULT_METRICAS_LOG if args.metricas else None,
+            salidas_extra=args.formatos,
+        )
+        if guardado is None and not run.errores:
+            run._error("No se pudo guardar la nómina")
+
+    partes = [df for df in (run.nomina, run.nomina_seguridad) if df is not None and not df.empty]
+    total = float(sum(df["Total Pago a Empleados"].sum() for df in partes)) if partes else 0.0
+    resultado = {
+        "ok": run.ok,
+        "simulacion": args.simular,
+        "fecha_pago": run.fecha_pago.strftime("%Y-%m-%d") if run.fecha_pago is not None else None,
+        "quincena_inicio": run.quincena_inicio.strftime("%Y-%m-%d") if run.quincena_inicio is not None else None,
+        "quincena_fin": run.quincena_fin.strftime("%Y-%m-%d") if run.quincena_fin is not None else None,
+        "empleados": 0 if run.nomina is None else len(run.nomina),
+        "empleados_seguridad": 0 if run.nomina_seguridad is None else len(run.nomina_seguridad),
+        "total_pago": round(total, 2),
+        "archivos": {
+            nombre: ruta for nombre, ruta in (
+                ("nomina", run.archivo_nomina), ("nomina_seguridad", run.archivo_seguridad), *run.archivos_extra.items()
+            ) if ruta
+        },
+        "advertencias": run.advertencias,
+        "errores": run.errores,
+        "errores_asistencia": run.errores_asistencia,
+        "cambios_vs_anterior": run.diferencia_anterior.resumen() if run.diferencia_anterior is not None else None,
+        "metricas": run.metricas.como_dict(),
+    }
+    if not run.ok:
+        raise ErrorCli("La nómina tiene errores", resultado=resultado)
+    return resultado
+
+
+def comando_recibos(args) -> dict:
+    _archivo_existente(args.nomina, "nómina")
+    carpeta, cantidad = generar_recibos(
+        args.nomina, plantilla=args.plantilla, carpeta_salida=args.carpeta, incluir_seguridad=args.seguridad
+    )
+    if carpeta is None:
+        raise ErrorCli("No se pudieron generar los recibos")
+    return {"carpeta": carpeta, "recibos": cantidad}
+
+
+def comando_prestamos(args) -> dict:
+    archivo = args.prestamos
+    if args.accion == "listar":
+        df = main.obtener_prestamos(archivo)
+        if args.estado:
+            df = df[df["estado"].astype(str).str.upper() == args.estado.upper()]
+        if args.empleado:
+            df = df[main.normalizar_ids(df["employee_id"]) == main.normalizar_id(args.empleado)]
+        return {"prestamos": _registros(df)}
+    if args.accion == "pagos":
+        df = main.obtener_pagos_prestamo(archivo, loan_id=args.loan, employee_id=args.empleado)
+        return {"pagos": _registros(df)}
+    # Las validaciones de main (ValueError) terminan con SALIDA_ERROR
+    if args.accion == "crear":
+        loan_id = main.crear_prestamo(
+            args.empleado, args.nombre, args.monto, args.cuota,
+            fecha_inicio=pd.Timestamp(args.fecha_inicio) if args.fecha_inicio else None,
+            nota=args.nota, prestamos_file=archivo,
+        )
+        return {"loan_id": loan_id}
+    if args.accion == "estado":
+        main.actualizar_estado_prestamo(args.loan, args.estado, archivo)
+    elif args.accion == "cerrar":
+        main.cerrar_prestamo(args.loan, condonar=args.condonar, prestamos_file=archivo)
+    elif args.accion == "pago":
+        main.registrar_pago_manual_prestamo(
+            args.loan, args.monto,
+            fecha_pago=pd.Timestamp(args.fecha) if args.fecha else None,
+            nota=args.nota, prestamos_file=archivo,
+        )
+    return {"loan_id": args.loan, "accion": args.accion}
+
+
+def comando_empleados(args) -> dict:
+    if args.accion == "exportar":
+        return {"archivo": args.destino, "empleados": main.exportar_empleados(args.destino, args.archivo)}
+    if args.accion == "listar":
+        df = main.leer_empleados_normalizado(args.archivo)
+        if df is None:
+            raise ErrorCli("No se pudo leer el archivo de empleados", SALIDA_ARCHIVO)
+        return {"empleados": _registros(df)}
+    _archivo_existente(args.origen, "importación")
+    resumen = main.importar_empleados(args.origen, args.archivo, actualizar=args.actualizar, simular=args.simular)
+    if resumen["errores"]:
+        raise ErrorCli(f"{len(resumen['errores'])} fila(s) con errores; no se importó nada", resultado=resumen)
+    return resumen
+
+
+def comando_servir(args) -> dict:
+    servicio_nomina.servir(servicio_nomina.servicio_desde_argumentos(args), args.host, args.puerto)
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Argumentos
+# ---------------------------------------------------------------------------
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Sistema de nómina ABCOPA sin interfaz gráfica.")
+    parser.add_argument("--json", action="store_true", help="Imprimir el resultado como JSON (mensajes a stderr)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("calcular", help="Calcular y guardar la nómina quincenal")
+    p.add_argument("--empleados", default=main.DEFAULT_EMPLOYEES_FILE, help="Archivo de empleados")
+    p.add_argument("--asistencia", default=main.DEFAULT_HOURS_FILE, help="Reporte de asistencia del biométrico")
+    p.add_argument("--fecha", type=_fecha, default=None, help="Fecha de referencia de la quincena (DD/MM/YYYY)")
+    p.add_argument("--prestamos", default=main.DEFAULT_PRESTAMOS_FILE, help="Archivo de préstamos")
+    p.add_argument("--seguridad-horario", default=main.DEFAULT_SEGURIDAD_HORARIO_FILE, help="Configuración de turnos")
+    p.add_argument("--salida", default=None, help="Excel de nómina (por defecto datos/nomina_quincenal_pago_YYYYMMDD.xlsx)")
+    p.add_argument("--formatos", nargs="+", choices=main.FORMATOS_SALIDA, default=None,
+                   help="Salidas adicionales junto al Excel")
+    p.add_argument("--simular", action="store_true", help="Calcular sin guardar nada (ni préstamos ni historial)")
+    p.add_argument("--historial-db", default=None, help="Base del historial de nóminas")
+    p.add_argument("--metricas", action="store_true", help="Agregar los tiempos de la corrida a datos/metricas_nomina.jsonl")
+    p.set_defaults(funcion=comando_calcular)
+
+    p = sub.add_parser("recibos", help="Generar recibos de pago de una nómina guardada")
+    p.add_argument("nomina", help="Excel de nómina (o su .npz/.csv)")
+    p.add_argument("--plantilla", default=None)
+    p.add_argument("--carpeta", default=None, help="Carpeta de salida")
+    p.add_argument("--seguridad", action="store_true", help="Incluir la nómina de seguridad")
+    p.set_defaults(funcion=comando_recibos)
+
+    p = sub.add_parser("prestamos", help="Consultar y modificar préstamos")
+    p.add_argument("--prestamos", default=main.DEFAULT_PRESTAMOS_FILE, help="Archivo de préstamos")
+    acciones = p.add_subparsers(dest="accion", required=True)
+    a = acciones.add_parser("listar")
+    a.add_argument("--estado", choices=["ACTIVO", "PAUSADO", "CERRADO"], default=None)
+    a.add_argument("--empleado", default=None, help="ID del empleado")
+    a = acciones.add_parser("pagos", help="Pagos registrados")
+    a.add_argument("--loan", default=None)
+    a.add_argument("--empleado", default=None)
+    a = acciones.add_parser("crear")
+    a.add_argument("--empleado", required=True, help="ID del empleado")
+    a.add_argument("--nombre", default="")
+    a.add_argument("--monto", type=_monto, required=True, help="Monto del préstamo en dólares")
+    a.add_argument("--cuota", type=_monto, required=True, help="Cuota quincenal en dólares")
+    a.add_argument("--fecha-inicio", type=_fecha, default=None, help="DD/MM/YYYY (por defecto hoy)")
+    a.add_argument("--nota", default="")
+    a = acciones.add_parser("estado")
+    a.add_argument("loan")
+    a.add_argument("estado", choices=["ACTIVO", "PAUSADO", "CERRADO"])
+    a = acciones.add_parser("cerrar")
+    a.add_argument("loan")
+    a.add_argument("--condonar", action="store_true", help="Poner el saldo en 0")
+    a = acciones.add_parser("pago", help="Registrar un pago manual")
+    a.add_argument("loan")
+    a.add_argument("monto", type=_monto, help="Monto en dólares")
+    a.add_argument("--fecha", type=_fecha, default=None, help="DD/MM/YYYY (por defecto hoy)")
+    a.add_argument("--nota", default="")
+    p.set_defaults(funcion=comando_prestamos)
+
+    p = sub.add_parser("empleados", help="Importar, exportar o listar empleados")
+    p.add_argument("--archivo", default=main.DEFAULT_EMPLOYEES_FILE, help="Archivo de empleados")
+    acciones = p.add_subparsers(dest="accion", required=True)
+    acciones.add_parser("listar")
+    a = acciones.add_parser("exportar")
+    a.add_argument("destino", help="Archivo .xlsx, .csv o .json")
+    a = acciones.add_parser("importar")
+    a.add_argument("origen", help="Archivo .xlsx o .csv con las columnas del archivo de empleados")
+    a.add_argument("--actualizar", action="store_true", help="Reemplazar empleados con ID existente")
+    a.add_argument("--simular", action="store_true", help="Solo validar")
+    p.set_defaults(funcion=comando_empleados)
+
+    p = sub.add_parser("servir", help="Servicio HTTP local (JSON) de consultas, ver servicio_nomina.py")
+    servicio_nomina.agregar_argumentos(p)
+    p.set_defaults(funcion=comando_servir)
+    return parser
+
+
+def _imprimir(resultado: dict) -> None:
+    """Salida legible del resultado (sin --json)."""
+    for clave, valor in resultado.items():
+        if isinstance(valor, list) and valor and isinstance(valor[0], dict):
+            print(f"{clave}:")
+            print(pd.DataFrame(valor).to_string(index=False))
+        elif isinstance(valor, dict) and clave != "metricas":
+            print(f"{clave}:")
+            for k, v in valor.items():
+                print(f"  {k}: {v}")
+        elif clave != "metricas":
+            print(f"{clave}: {valor}")
+
+
+def main_cli(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    activar_desde_argumentos(argv)
+    args = crear_parser().parse_args(argv)
+
+    # Con --json, stdout queda solo para el resultado
+    salida_mensajes = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    resultado, codigo, mensaje = None, SALIDA_OK, None
+    try:
+        with salida_mensajes:
+            resultado = args.funcion(args)
+    except ErrorCli as e:
+        resultado, codigo, mensaje = e.resultado, e.codigo, str(e)
+    except OSError as e:
+        codigo, mensaje = SALIDA_ARCHIVO, str(e)
+    except (ValueError, InvalidOperation) as e:
+        codigo, mensaje = SALIDA_ERROR, str(e)
+    except Exception as e:
+        codigo, mensaje = SALIDA_ERROR_INTERNO, f"{type(e).__name__}: {e}"
+
+    if args.json:
+        salida = dict(resultado or {})
+        salida["codigo_salida"] = codigo
+        if mensaje:
+            salida["mensaje_error"] = mensaje
+        print(json.dumps(salida, ensure_ascii=False, indent=2, default=str))
+    else:
+        if resultado:
+            _imprimir(resultado)
+        if mensaje:
+            print(f"[ERROR] {mensaje}", file=sys.stderr)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
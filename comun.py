@@ -0,0 +1,45 @@
+"""
+Definiciones que comparten los módulos del sistema: la carpeta de datos y la clave canónica
+de los IDs de empleado. No importa ningún otro módulo del sistema, así main, historial,
+almacenamiento, diagnostico y generador_recibos pueden importarlo sin ciclos.
+"""
+
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Carpeta donde se guardan y leen los archivos de datos (Excel, logo, etc.): junto al
+# ejecutable cuando corre empaquetado, junto a los .py si no
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "datos")
+
+
+def mapear_por_valor(serie, funcion) -> np.ndarray:
+    """Aplica `funcion` una vez por valor distinto de la columna (los nulos reciben funcion(nan))."""
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    tabla = np.array([funcion(v) for v in unicos] + [funcion(np.nan)], dtype=object)
+    return tabla[codigos]
+
+
+def normalizar_id(valor) -> Optional[str]:
+    """
+    ID canónico: texto sin espacios; los float enteros (ej: 170660927.0, como los deja Excel
+    en columnas con celdas vacías) pierden el '.0'. Devuelve None si no hay ID (vacío incluido).
+    """
+    if valor is None or pd.isna(valor):
+        return None
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor))
+    texto = str(valor).strip()
+    return texto or None
+
+
+def normalizar_ids(serie) -> pd.Series:
+    """`normalizar_id` sobre una columna completa: la clave con la que se cruzan empleados, horas y préstamos."""
+    return pd.Series(mapear_por_valor(serie, normalizar_id), index=serie.index, dtype=object)
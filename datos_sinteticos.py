@@ -0,0 +1,196 @@
+"""
+Generador de datos sintéticos para pruebas de rendimiento de la nómina.
+
+Escribe en una carpeta los mismos archivos que usa el sistema, con el formato real:
+empleados (salario fijo, empleado fijo, por horas y seguridad), reporte de asistencia del
+biométrico (First Name / Last Name / ID / Date / Time), préstamos y configuración de turnos
+de seguridad. Todo es determinista para una misma semilla y no requiere conexión.
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Límite de filas de una hoja de Excel (sin contar encabezados)
+MAX_FILAS_EXCEL = 1_048_576 - 10
+
+# Proporción de cada tipo de empleado
+MEZCLA_EMPLEADOS = {
+    "por_horas": 0.50,
+    "salario_fijo": 0.15,
+    "empleado_fijo": 0.15,
+    "seguridad": 0.20,
+}
+
+_NOMBRES = ["JOSE", "MARIA", "LUIS", "ANA", "CARLOS", "ROSA", "JUAN", "ELENA", "PEDRO", "LUZ"]
+_APELLIDOS = ["GONZALEZ", "RODRIGUEZ", "PEREZ", "CASTILLO", "VEGA", "MOLINA", "BARRIOS", "FRIAS"]
+_CARGOS = ["AYUDANTE", "OPERADOR", "SOLDADOR", "CONDUCTOR", "ALBAÑIL"]
+
+
+def _generar_empleados(n: int, rng) -> pd.DataFrame:
+    tipos = rng.choice(list(MEZCLA_EMPLEADOS), size=n, p=list(MEZCLA_EMPLEADOS.values()))
+    i = np.arange(n)
+    # IDs mezclados como en el archivo real: cédulas con guiones y números
+    ids = np.where(i % 2 == 0, (100000 + i).astype(str), [f"8-{100 + k % 900}-{1000 + k}" for k in i])
+    salario_fijo = tipos == "salario_fijo"
+    empleado_fijo = tipos == "empleado_fijo"
+    salario = np.where(salario_fijo, np.round(rng.uniform(700, 1500, n), 2), np.round(rng.uniform(3.5, 9.0, n), 2))
+    return pd.DataFrame({
+        "ID": ids,
+        "nombre": [f"{_NOMBRES[k % len(_NOMBRES)]} {_APELLIDOS[(k // len(_NOMBRES)) % len(_APELLIDOS)]} {k}" for k in i],
+        "salario_fijo": salario_fijo.astype(int),
+        "cargo": rng.choice(_CARGOS, size=n),
+        "salario": salario,
+        "n_de_cuenta": [f"04-{k:06d}" for k in i],
+        "banco": "BANCO GENERAL",
+        "tipo_de_cuenta": "AHORROS",
+        "empleado_fijo": empleado_fijo.astype(int),
+        "salario_minimo": np.where(empleado_fijo, 700.0, 0.0),
+        "seguridad": np.where(tipos == "seguridad", "Sí", "No"),
+        "Empleado por contrato": np.where((tipos == "por_horas") & (rng.random(n) < 0.3), "Sí", "No"),
+        "ISLR": np.where(salario_fijo & (rng.random(n) < 0.4), np.round(rng.uniform(5, 60, n), 2), 0.0),
+    })
+
+
+def _generar_asistencia(empleados: pd.DataFrame, inicio, fin, rng) -> pd.DataFrame:
+    """Dos marcaciones por día trabajado; seguridad en turnos de 12 h día/noche (día por medio)."""
+    dias = pd.date_range(inicio, fin, freq="D")
+    seguridad = (empleados["seguridad"] == "Sí").to_numpy()
+    partes = []
+
+    # Empleados regulares: lunes a sábado y algún domingo; ~8% de ausencias
+    reg = np.flatnonzero(~seguridad)
+    if len(reg):
+        emp = np.repeat(reg, len(dias))
+        dia = np.tile(dias.to_numpy(), len(reg))
+        domingo = pd.DatetimeIndex(dia).dayofweek == 6
+        trabaja = rng.random(len(emp)) < np.where(domingo, 0.10, 0.92)
+        emp, dia = emp[trabaja], dia[trabaja]
+        entrada = (
+            dia
+            + pd.to_timedelta(rng.choice([6, 7, 7, 7, 8], size=len(emp)), unit="h").to_numpy()
+            + pd.to_timedelta(rng.integers(0, 40, size=len(emp)), unit="m").to_numpy()
+        )
+        salida = (
+            dia
+            + pd.to_timedelta(rng.choice([15, 15, 16, 17, 18], size=len(emp)), unit="h").to_numpy()
+            + pd.to_timedelta(rng.integers(0, 50, size=len(emp)), unit="m").to_numpy()
+        )
+        partes.append((np.concatenate([emp, emp]), np.concatenate([entrada, salida])))
+
+    # Seguridad: turno día (07:00) o noche (19:00) según el empleado, día por medio
+    seg = np.flatnonzero(seguridad)
+    if len(seg):
+        dias_turno = dias[::2].to_numpy()
+        emp = np.repeat(seg, len(dias_turno))
+        dia = np.tile(dias_turno, len(seg))
+        hora = np.where(emp % 2 == 0, 7, 19)
+        entrada = (
+            dia
+            + pd.to_timedelta(hora, unit="h").to_numpy()
+            + pd.to_timedelta(rng.integers(-5, 10, size=len(emp)), unit="m").to_numpy()
+        )
+        salida = entrada + pd.to_timedelta(12 * 60 + rng.integers(-5, 30, size=len(emp)), unit="m").to_numpy()
+        partes.append((np.concatenate([emp, emp]), np.concatenate([entrada, salida])))
+
+    emp = np.concatenate([p[0] for p in partes])
+    marcas = pd.DatetimeIndex(np.concatenate([p[1] for p in partes]))
+    orden = np.lexsort((marcas.to_numpy(), emp))
+    emp, marcas = emp[orden], marcas[orden]
+    nombres = empleados["nombre"].str.split(" ", n=1)
+    return pd.DataFrame({
+        "First Name": nombres.str[0].to_numpy()[emp],
+        "Last Name": nombres.str[1].to_numpy()[emp],
+        "ID": empleados["ID"].to_numpy()[emp],
+        "Date": marcas.normalize(),
+        "Time": marcas.strftime("%H:%M:%S"),
+    })
+
+
+def _generar_prestamos(empleados: pd.DataFrame, inicio, rng) -> pd.DataFrame:
+    """Préstamos ACTIVO para ~20% de los empleados (algunos con dos préstamos)."""
+    con_prestamo = np.flatnonzero(rng.random(len(empleados)) < 0.20)
+    filas = []
+    for k, i in enumerate(con_prestamo):
+        for j in range(1 + (k % 4 == 0)):
+            monto = int(rng.integers(100, 1500)) * 100
+            filas.append({
+                "loan_id": f"LN-SIM-{i}-{j}",
+                "employee_id": str(empleados["ID"].iat[i]),
+                "employee_name": empleados["nombre"].iat[i],
+                "fecha_inicio": pd.Timestamp(inicio) + pd.Timedelta(days=j),
+                "monto_original_centavos": monto,
+                "cuota_quincenal_centavos": max(1000, monto // 10),
+                "saldo_centavos": monto,
+                "estado": "ACTIVO",
+                "nota": "",
+                "creado_en": pd.Timestamp(inicio) + pd.Timedelta(minutes=j),
+            })
+    return pd.DataFrame(filas)
+
+
+def generar_datos_sinteticos(carpeta, empleados: int = 100, meses: int = 1, inicio="2026-01-01", semilla: int = 1) -> dict:
+    """
+    Genera un juego de datos completo en `carpeta` (se crea si no existe).
+
+    Args:
+        empleados: cantidad de empleados (ej. 100, 1000, 10000)
+        meses: meses de asistencia desde `inicio` (1 a 12)
+        semilla: misma semilla = mismos archivos
+
+    Returns:
+        dict con las rutas: empleados, asistencia, prestamos, seguridad_horario
+        y `quincena_fecha` (última quincena con datos, para calcular la nómina)
+    """
+    rng = np.random.default_rng(semilla)
+    inicio = pd.Timestamp(inicio).normalize()
+    fin = inicio + pd.DateOffset(months=meses) - pd.Timedelta(days=1)
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = {
+        "empleados": os.path.join(carpeta, "employees_information.xlsx"),
+        "asistencia": os.path.join(carpeta, "Reporte de Asistencia.xlsx"),
+        "prestamos": os.path.join(carpeta, "prestamos.xlsx"),
+        "seguridad_horario": os.path.join(carpeta, "seguridad_horario.xlsx"),
+    }
+
+    empleados_df = _generar_empleados(empleados, rng)
+    asistencia_df = _generar_asistencia(empleados_df, inicio, fin, rng)
+    if len(asistencia_df) > MAX_FILAS_EXCEL:
+        raise ValueError(
+            f"{len(asistencia_df)} marcaciones no caben en una hoja de Excel ({MAX_FILAS_EXCEL}); "
+            "reduzca empleados o meses"
+        )
+    prestamos_df = _generar_prestamos(empleados_df, inicio, rng)
+
+    empleados_df.to_excel(rutas["empleados"], index=False)
+    # Mismo formato que exporta el biométrico: título arriba y encabezados en la fila 4
+    with pd.ExcelWriter(rutas["asistencia"], engine="openpyxl") as writer:
+        pd.DataFrame([["Transaction Report"], [f"Export Time: {datetime.now():%Y-%m-%d %H:%M}"]]).to_excel(
+            writer, header=False, index=False, startrow=1
+        )
+        asistencia_df.to_excel(writer, index=False, startrow=3)
+    with pd.ExcelWriter(rutas["prestamos"], engine="openpyxl") as writer:
+        prestamos_df.to_excel(writer, sheet_name="Prestamos", index=False)
+        pd.DataFrame(columns=[
+            "payment_id", "loan_id", "employee_id", "tipo_pago", "fecha_pago_nomina", "quincena_inicio",
+            "quincena_fin", "monto_pagado_centavos", "saldo_antes_centavos", "saldo_despues_centavos",
+            "nota", "creado_en",
+        ]).to_excel(writer, sheet_name="PagosPrestamo", index=False)
+    with pd.ExcelWriter(rutas["seguridad_horario"], engine="openpyxl") as writer:
+        pd.DataFrame([{
+            "vigente_desde": inicio,
+            "horas_turno": 12,
+            "hora_cambio_turno": "07:00",
+            "margen_salida_minutos": 10,
+            "tolerancia_turno_minutos": 30,
+            "empleados_turno_dia": int(((empleados_df["seguridad"] == "Sí") & (np.arange(empleados) % 2 == 0)).sum()),
+            "empleados_turno_noche": int(((empleados_df["seguridad"] == "Sí") & (np.arange(empleados) % 2 == 1)).sum()),
+            "nota": "Datos sintéticos",
+        }]).to_excel(writer, sheet_name="Config", index=False)
+
+    rutas["quincena_fecha"] = fin.strftime("%d/%m/%Y")
+    rutas["marcaciones"] = len(asistencia_df)
+    print(f"[OK] Datos sintéticos en {carpeta}: {empleados} empleados, {len(asistencia_df)} marcaciones, {len(prestamos_df)} préstamos")
+    return rutas
@@ -0,0 +1,158 @@
+"""
+Perfilado opcional (cProfile + tracemalloc) de las operaciones largas del sistema.
+
+Se activa con la variable de entorno NOMINA_PERFILAR=1 o con la opción --perfilar de
+gui.py / main.py / generador_recibos.py (también en el ejecutable). Cada llamada perfilada
+deja en datos/diagnostico/ un archivo .prof (pstats), un resumen de tiempos legible y un
+reporte de las mayores asignaciones de memoria, con fecha y hora en el nombre.
+Desactivado, solo cuesta leer la variable de entorno en cada llamada.
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from comun import DATA_DIR
+
+DIAGNOSTICO_DIR = os.path.join(DATA_DIR, "diagnostico")
+
+VARIABLE_ENTORNO = "NOMINA_PERFILAR"
+OPCION_CLI = "--perfilar"
+TOP_FUNCIONES = 40
+TOP_ASIGNACIONES = 30
+
+# Solo una llamada perfilada a la vez (tracemalloc es global); las anidadas o simultáneas corren normal
+_candado = threading.Lock()
+# Hilo que está dentro de una llamada perfilada (cProfile solo mide ese hilo)
+_hilo = threading.local()
+
+
+def perfilado_activo() -> bool:
+    return os.environ.get(VARIABLE_ENTORNO, "").strip().lower() in ("1", "si", "sí", "true", "yes")
+
+
+def perfilando() -> bool:
+    """True si este hilo está ejecutando una llamada perfilada."""
+    return getattr(_hilo, "perfilando", False)
+
+
+class _EjecutorEnLinea:
+    """Misma interfaz que ThreadPoolExecutor, pero cada tarea corre al enviarla, en el hilo que la envía."""
+
+    def submit(self, funcion, *args, **kwargs) -> Future:
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args, **kwargs))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def shutdown(self, wait=True) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion) -> bool:
+        return False
+
+
+def ejecutor_hilos(max_workers):
+    """
+    ThreadPoolExecutor para las tareas en paralelo de una operación perfilable. Dentro de una
+    llamada perfilada las tareas corren en línea, para que su tiempo aparezca en el perfil.
+    """
+    if perfilando():
+        return _EjecutorEnLinea()
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def activar_desde_argumentos(argv=None) -> bool:
+    """
+    Activa el perfilado si `argv` (por defecto sys.argv) trae --perfilar y quita la opción,
+    para que no la vean argparse ni Qt. Devuelve True si quedó activo.
+    """
+    if argv is None:
+        argv = sys.argv
+    if OPCION_CLI in argv:
+        while OPCION_CLI in argv:
+            argv.remove(OPCION_CLI)
+        os.environ[VARIABLE_ENTORNO] = "1"
+        print(f"[OK] Perfilado activo: los reportes se guardan en {DIAGNOSTICO_DIR}")
+    return perfilado_activo()
+
+
+def _escribir_reportes(nombre, perfil, snapshot, memoria_actual, memoria_pico, segundos, error) -> str:
+    os.makedirs(DIAGNOSTICO_DIR, exist_ok=True)
+    base = os.path.join(DIAGNOSTICO_DIR, f"{nombre}_{datetime.now():%Y%m%d_%H%M%S_%f}")
+    perfil.dump_stats(base + ".prof")
+
+    texto = io.StringIO()
+    texto.write(f"{nombre}: {segundos:.3f} s{'  (terminó con error: ' + error + ')' if error else ''}\n\n")
+    pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(TOP_FUNCIONES)
+    with open(base + "_tiempos.txt", "w", encoding="utf-8") as f:
+        f.write(texto.getvalue())
+
+    with open(base + "_memoria.txt", "w", encoding="utf-8") as f:
+        f.write(f"{nombre}: memoria al terminar {memoria_actual / 1e6:.1f} MB, pico {memoria_pico / 1e6:.1f} MB\n\n")
+        f.write(f"Top {TOP_ASIGNACIONES} asignaciones (por línea):\n")
+        for estadistica in snapshot.statistics("lineno")[:TOP_ASIGNACIONES]:
+            f.write(f"{estadistica}\n")
+    return base
+
+
+def perfilable(nombre=None):
+    """
+    Decorador: si el perfilado está activo, ejecuta la función bajo cProfile y tracemalloc y
+    escribe los reportes en DIAGNOSTICO_DIR. No cambia el resultado ni las excepciones.
+    """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not perfilado_activo() or not _candado.acquire(blocking=False):
+                return funcion(*args, **kwargs)
+            try:
+                memoria_previa = tracemalloc.is_tracing()
+                if not memoria_previa:
+                    tracemalloc.start(10)
+                tracemalloc.reset_peak()
+                perfil = cProfile.Profile()
+                error = None
+                inicio = datetime.now()
+                _hilo.perfilando = True
+                perfil.enable()
+                try:
+                    return funcion(*args, **kwargs)
+                except BaseException as e:
+                    error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    perfil.disable()
+                    _hilo.perfilando = False
+                    segundos = (datetime.now() - inicio).total_seconds()
+                    snapshot = tracemalloc.take_snapshot()
+                    memoria_actual, memoria_pico = tracemalloc.get_traced_memory()
+                    if not memoria_previa:
+                        tracemalloc.stop()
+                    try:
+                        base = _escribir_reportes(
+                            etiqueta, perfil, snapshot, memoria_actual, memoria_pico, segundos, error
+                        )
+                        print(f"[OK] Perfil de {etiqueta} guardado en {base}.*")
+                    except Exception as e:
+                        print(f"[ADVERTENCIA] No se pudo guardar el perfil de {etiqueta}: {e}")
+            finally:
+                _candado.release()
+
+        return envoltura
+
+    return decorador
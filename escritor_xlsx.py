@@ -0,0 +1,216 @@
+"""
+Escritura rápida de DataFrames a .xlsx para las salidas de nómina.
+
+`DataFrame.to_excel(engine='openpyxl')` crea un objeto por celda y lo serializa elemento por
+elemento; para la nómina eso es el mayor costo fijo de una corrida. Aquí cada columna se
+convierte a texto XML una sola vez (con su formato numérico) y las filas se escriben en bloques
+directo al zip, sin modelo de celdas y con memoria constante. El archivo resultante se lee igual
+con `pd.read_excel` y con Excel: inline strings, números, booleanos y fechas como serial.
+"""
+
+import math
+import re
+import zipfile
+from datetime import date, datetime, time
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+FORMATO_MONTO = "#,##0.00"
+FORMATO_HORAS = "0.00"
+FORMATO_FECHA_HORA = "yyyy-mm-dd hh:mm:ss"
+FORMATO_FECHA = "yyyy-mm-dd"
+
+FILAS_POR_BLOQUE = 5000
+
+# Formatos incorporados de Excel (no hace falta declararlos en styles.xml)
+_FORMATOS_INCORPORADOS = {"0.00": 2, "#,##0.00": 4}
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+# Caracteres de control que no se permiten en XML (openpyxl los rechaza)
+_CARACTERES_ILEGALES = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+
+def _letra_columna(indice: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _texto(valor: str) -> str:
+    valor = _CARACTERES_ILEGALES.sub("", valor)
+    espacio = ' xml:space="preserve"' if valor[:1].isspace() or valor[-1:].isspace() else ""
+    return f'<is><t{espacio}>{escape(valor)}</t></is>'
+
+
+def _serial_excel(valor) -> float:
+    if isinstance(valor, datetime):
+        return (valor.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+    return float((datetime.combine(valor, time()) - _EPOCA_EXCEL).days)
+
+
+def _celda_objeto(valor, estilo: str, estilo_fecha: str):
+    """Atributos de tipo/estilo y contenido de una celda de una columna `object` (o None si va vacía)."""
+    if valor is None or valor is pd.NaT:
+        return None
+    if isinstance(valor, str):
+        return f' t="inlineStr"{estilo}>{_texto(valor)}'
+    if isinstance(valor, (bool, np.bool_)):
+        return f' t="b"{estilo}><v>{int(valor)}</v>'
+    if isinstance(valor, (int, np.integer)):
+        return f'{estilo}><v>{int(valor)}</v>'
+    if isinstance(valor, (float, np.floating)):
+        if not math.isfinite(valor):
+            return None
+        return f'{estilo}><v>{float(valor)!r}</v>'
+    if isinstance(valor, (datetime, date)):
+        return f'{estilo_fecha}><v>{_serial_excel(valor)!r}</v>'
+    return f' t="inlineStr"{estilo}>{_texto(str(valor))}'
+
+
+def _contenido_columna(serie: pd.Series, estilo: str, estilo_fecha: str) -> list:
+    """
+    Convierte una columna completa (de un bloque de filas) a la parte de cada celda que va después
+    de la coordenada: tipo, estilo y valor. None = celda vacía.
+    """
+    if pd.api.types.is_bool_dtype(serie):
+        return [f' t="b"{estilo}><v>{int(v)}</v>' for v in serie.to_numpy()]
+    if pd.api.types.is_integer_dtype(serie) and not isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+        return [f'{estilo}><v>{v}</v>' for v in serie.to_numpy().tolist()]
+    if pd.api.types.is_float_dtype(serie) and not isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+        return [
+            f'{estilo}><v>{v!r}</v>' if math.isfinite(v) else None
+            for v in serie.to_numpy(dtype=float).tolist()
+        ]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serial = (serie.dt.tz_localize(None) if serie.dt.tz is not None else serie) - pd.Timestamp(_EPOCA_EXCEL)
+        dias = serial / pd.Timedelta(days=1)
+        return [None if pd.isna(v) else f'{estilo_fecha}><v>{v!r}</v>' for v in dias.tolist()]
+    return [
+        None if (isinstance(v, float) and math.isnan(v)) else _celda_objeto(v, estilo, estilo_fecha)
+        for v in serie.astype(object).tolist()
+    ]
+
+
+def _estilos_xml(formatos_numericos: list) -> str:
+    """styles.xml: 0 = normal, 1 = encabezado (negrita, borde, centrado), 2.. = un estilo por formato."""
+    propios = [f for f in formatos_numericos if f not in _FORMATOS_INCORPORADOS]
+    ids = {**_FORMATOS_INCORPORADOS, **{f: 164 + i for i, f in enumerate(propios)}}
+    num_fmts = "".join(f'<numFmt numFmtId="{ids[f]}" formatCode="{escape(f, {chr(34): "&quot;"})}"/>' for f in propios)
+    xfs = "".join(f'<xf numFmtId="{ids[f]}" fontId="0" fillId="0" borderId="0" applyNumberFormat="1"/>' for f in formatos_numericos)
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        + (f'<numFmts count="{len(propios)}">{num_fmts}</numFmts>' if propios else "")
+        + '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+        '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        f'<cellXfs count="{2 + len(formatos_numericos)}">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+        '<alignment horizontal="center" vertical="top"/></xf>'
+        f'{xfs}</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+
+
+def escribir_xlsx(df: pd.DataFrame, archivo: str, hoja: str = "Sheet1", formatos=None) -> None:
+    """
+    Escribe `df` (sin índice, con encabezado) en `archivo`, como `df.to_excel(archivo, index=False)`.
+
+    Args:
+        hoja: nombre de la hoja (por defecto el mismo de pandas)
+        formatos: dict columna -> formato numérico de Excel (ej. FORMATO_MONTO); se aplica a toda la columna.
+            Las fechas sin formato indicado usan FORMATO_FECHA_HORA.
+    """
+    formatos = dict(formatos or {})
+    columnas = list(df.columns)
+    usados = list(dict.fromkeys([formatos[c] for c in columnas if c in formatos] + [FORMATO_FECHA_HORA]))
+    indice_estilo = {f: 2 + i for i, f in enumerate(usados)}
+    estilos = [f' s="{indice_estilo[formatos[c]]}"' if c in formatos else "" for c in columnas]
+    estilos_fecha = [
+        f' s="{indice_estilo[formatos.get(c, FORMATO_FECHA_HORA)]}"' for c in columnas
+    ]
+    letras = [_letra_columna(i) for i in range(len(columnas))]
+    ultima = f"{letras[-1]}{len(df) + 1}" if columnas else "A1"
+
+    with zipfile.ZipFile(archivo, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(hoja, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _estilos_xml(usados))
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja_xml:
+            hoja_xml.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<dimension ref="A1:{ultima}"/><sheetData>'
+            ).encode("utf-8"))
+            encabezado = "".join(
+                f'<c r="{letra}1" t="inlineStr" s="1">{_texto(str(c))}</c>' for letra, c in zip(letras, columnas)
+            )
+            hoja_xml.write(f'<row r="1">{encabezado}</row>'.encode("utf-8"))
+
+            for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+                bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+                contenido = [
+                    _contenido_columna(bloque.iloc[:, i], estilos[i], estilos_fecha[i]) for i in range(len(columnas))
+                ]
+                filas = []
+                for n, celdas in enumerate(zip(*contenido), start=inicio + 2):
+                    fila = "".join(
+                        f'<c r="{letra}{n}"{celda}</c>' for letra, celda in zip(letras, celdas) if celda is not None
+                    )
+                    filas.append(f'<row r="{n}">{fila}</row>')
+                hoja_xml.write("".join(filas).encode("utf-8"))
+
+            hoja_xml.write(b"</sheetData></worksheet>")
@@ -6,7 +6,6 @@ por cada empleado en una carpeta (ej: datos/recibos_quincena_YYYYMMDD).
 
 import os
 import re
-import sys
 from copy import copy
 from datetime import datetime
 
@@ -15,12 +14,10 @@ import openpyxl
 from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
 
-# Usar la misma carpeta de datos que el sistema principal
-if getattr(sys, "frozen", False):
-    _BASE_DIR = os.path.dirname(sys.executable)
-else:
-    _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(_BASE_DIR, "datos")
+from diagnostico import perfilable, activar_desde_argumentos
+from comun import DATA_DIR
+from salidas_nomina import leer_nomina
+
 DEFAULT_PLANTILLA = os.path.join(DATA_DIR, "Plantilla recibos de pago.xlsx")
 
 
@@ -69,6 +66,12 @@ def _nombre_archivo_seguro(nombre, id_emp):
     return s[:80]
 
 
+def ruta_recibo(carpeta_salida, nombre, id_emp):
+    """Ruta del recibo de un empleado dentro de la carpeta de recibos."""
+    return os.path.join(carpeta_salida, _nombre_archivo_seguro(nombre, id_emp) + ".xlsx")
+
+
+@perfilable()
 def generar_recibos(
     archivo_nomina,
     plantilla=None,
@@ -79,7 +82,9 @@ def generar_recibos(
     Genera un recibo de pago (Excel) por cada empleado de la nómina, usando la plantilla.
 
     Args:
-        archivo_nomina: Ruta al Excel de nómina quincenal (ej: nomina_quincenal_pago_YYYYMMDD.xlsx).
+        archivo_nomina: Ruta al Excel de nómina quincenal (ej: nomina_quincenal_pago_YYYYMMDD.xlsx; si al lado
+            está el .npz de salidas_nomina.py se lee ese), a su .csv/.npz,
+            o directamente el resultado en memoria (`PayrollRun` de main.py o un DataFrame de nómina).
         plantilla: Ruta a la plantilla Excel. Si es None, usa datos/Plantilla recibos de pago.xlsx.
         carpeta_salida: Carpeta donde guardar los recibos. Si es None, se crea datos/recibos_quincena_YYYYMMDD.
         incluir_seguridad: Si True, incluye también empleados de nómina de seguridad (*_seguridad.xlsx).
@@ -92,15 +97,22 @@ def generar_recibos(
     if not os.path.exists(plantilla):
         print(f"[ERROR] No se encontró la plantilla: {plantilla}")
         return None, 0
-    if not os.path.exists(archivo_nomina):
-        print(f"[ERROR] No se encontró el archivo de nómina: {archivo_nomina}")
-        return None, 0
 
-    try:
-        df = pd.read_excel(archivo_nomina)
-    except Exception as e:
-        print(f"[ERROR] No se pudo leer la nómina: {e}")
-        return None, 0
+    # Resultado en memoria (PayrollRun): sin releer el Excel
+    corrida = archivo_nomina if hasattr(archivo_nomina, "nomina_seguridad") else None
+    if corrida is not None:
+        df = corrida.nomina if corrida.nomina is not None else pd.DataFrame()
+    elif isinstance(archivo_nomina, pd.DataFrame):
+        df = archivo_nomina
+    else:
+        if not os.path.exists(archivo_nomina):
+            print(f"[ERROR] No se encontró el archivo de nómina: {archivo_nomina}")
+            return None, 0
+        try:
+            df = leer_nomina(archivo_nomina)
+        except Exception as e:
+            print(f"[ERROR] No se pudo leer la nómina: {e}")
+            return None, 0
 
     if df.empty:
         print("[ERROR] El archivo de nómina no tiene filas.")
@@ -108,14 +120,24 @@ def generar_recibos(
 
     # Resolver carpeta de salida
     if carpeta_salida is None:
-        # Extraer fecha del nombre del archivo (nomina_quincenal_pago_20260131.xlsx) o de la primera fila
-        base = os.path.splitext(os.path.basename(archivo_nomina))[0]
-        if "202" in base:
-            import re as re2
-            m = re2.search(r"(\d{8})", base)
-            fecha_str = m.group(1) if m else datetime.now().strftime("%Y%m%d")
+        if corrida is not None and corrida.fecha_pago is not None:
+            fecha_str = corrida.fecha_pago.strftime("%Y%m%d")
+        elif isinstance(archivo_nomina, pd.DataFrame):
+            # Fecha de pago de la primera fila (dd/mm/YYYY)
+            fecha = None
+            col_fecha = _find_column(df, "Fecha de Pago")
+            if col_fecha:
+                fecha = pd.to_datetime(df[col_fecha].iloc[0], format="%d/%m/%Y", errors="coerce")
+            fecha_str = fecha.strftime("%Y%m%d") if fecha is not None and pd.notna(fecha) else datetime.now().strftime("%Y%m%d")
         else:
-            fecha_str = datetime.now().strftime("%Y%m%d")
+            # Extraer fecha del nombre del archivo (nomina_quincenal_pago_20260131.xlsx) o de la primera fila
+            base = os.path.splitext(os.path.basename(archivo_nomina))[0]
+            if "202" in base:
+                import re as re2
+                m = re2.search(r"(\d{8})", base)
+                fecha_str = m.group(1) if m else datetime.now().strftime("%Y%m%d")
+            else:
+                fecha_str = datetime.now().strftime("%Y%m%d")
         carpeta_salida = os.path.join(DATA_DIR, f"recibos_quincena_{fecha_str}")
     os.makedirs(carpeta_salida, exist_ok=True)
 
@@ -305,15 +327,23 @@ def generar_recibos(
         sh.row_dimensions[22].height = _altura_firma
         sh.row_dimensions[48].height = _altura_firma
 
-        nombre_archivo = _nombre_archivo_seguro(nombre, id_emp) + ".xlsx"
-        ruta_recibo = os.path.join(carpeta_salida, nombre_archivo)
         try:
-            wb.save(ruta_recibo)
+            wb.save(ruta_recibo(carpeta_salida, nombre, id_emp))
             cantidad += 1
         except Exception as e:
             print(f"[ADVERTENCIA] No se pudo guardar recibo para {nombre}: {e}")
 
-    if incluir_seguridad:
+    if incluir_seguridad and corrida is not None:
+        if corrida.nomina_seguridad is not None and not corrida.nomina_seguridad.empty:
+            c2, n2 = generar_recibos(
+                corrida.nomina_seguridad,
+                plantilla=plantilla,
+                carpeta_salida=carpeta_salida,
+                incluir_seguridad=False,
+            )
+            if c2:
+                cantidad += n2
+    elif incluir_seguridad and isinstance(archivo_nomina, str):
         base_nomina = archivo_nomina.rsplit(".", 1)[0] if "." in archivo_nomina else archivo_nomina
         archivo_seguridad = base_nomina + "_seguridad.xlsx"
         if os.path.exists(archivo_seguridad):
@@ -332,6 +362,7 @@ def generar_recibos(
 def main():
     """Ejemplo de uso por línea de comandos."""
     import argparse
+    activar_desde_argumentos()
     parser = argparse.ArgumentParser(description="Generar recibos de pago a partir de la nómina.")
     parser.add_argument("nomina", nargs="?", default=None, help="Archivo Excel de nómina quincenal")
     parser.add_argument("--plantilla", default=None, help="Ruta a la plantilla Excel")
@@ -24,8 +24,14 @@ from main import (
     obtener_pagos_prestamo,
     registrar_pago_manual_prestamo,
     DATA_DIR,
+    DEFAULT_EMPLOYEES_FILE,
+    PROGRESO_ETAPA_INICIO,
+    PROGRESO_ETAPA_FIN,
 )
 from generador_recibos import generar_recibos
+from diagnostico import activar_desde_argumentos
+from salidas_nomina import leer_nomina
+from almacenamiento import almacen_para
 
 # Paleta de colores Gruvbox (versión suave)
 class GruvboxColors:
@@ -505,14 +511,14 @@ class NominaApp(QMainWindow):
             self,
             "Seleccionar archivo de nómina",
             os.getcwd(),
-            "Archivos Excel (*.xlsx);;Todos los archivos (*.*)"
+            "Archivos de nómina (*.xlsx *.npz *.csv);;Archivos Excel (*.xlsx);;Todos los archivos (*.*)"
         )
         
         if not file_path:
             return
         
         try:
-            df = pd.read_excel(file_path)
+            df = leer_nomina(file_path)
             
             if df.empty:
                 QMessageBox.information(self, "Información", "El archivo de nómina está vacío.")
@@ -565,6 +571,7 @@ ARCHIVOS REQUERIDOS:
 • datos/Reporte de Asistencia.xlsx - Reporte del escáner biométrico
 • datos/prestamos.xlsx - Préstamos y bitácora (se crea si no existe)
 • datos/seguridad_horario.xlsx - Turnos de seguridad (se crea si no existe)
+• Opcional: empleados, préstamos y turnos en una base SQLite (datos/nomina.sqlite), ver almacenamiento.py
 
 TIPOS DE EMPLEADOS:
 • Salario Fijo: Cobran lo mismo sin importar las horas
@@ -787,8 +794,9 @@ class ViewPayrollWindow(QDialog):
 
 
 class CalculatePayrollThread(QThread):
-    finished = pyqtSignal(object, str)
+    finished = pyqtSignal(object)
     error = pyqtSignal(str)
+    progreso = pyqtSignal(object)  # EventoProgreso, se muestra en vivo
     
     def __init__(self, employees_file, hours_file, quincena_fecha):
         super().__init__()
@@ -798,23 +806,14 @@ class CalculatePayrollThread(QThread):
     
     def run(self):
         try:
-            import sys
-            from io import StringIO
-            
-            old_stdout = sys.stdout
-            sys.stdout = output = StringIO()
-            
             result = calculate_payroll_quincenal(
                 employees_file=self.employees_file,
                 hours_file=self.hours_file,
                 output_file=None,
-                quincena_fecha=self.quincena_fecha
+                quincena_fecha=self.quincena_fecha,
+                progreso=self.progreso.emit,
             )
-            
-            sys.stdout = old_stdout
-            output_text = output.getvalue()
-            
-            self.finished.emit(result, output_text)
+            self.finished.emit(result)
         except Exception as e:
             self.error.emit(str(e))
 
@@ -846,8 +845,9 @@ class GenerarRecibosThread(QThread):
 
 class CalculatePayrollManualThread(QThread):
     """Hilo para calcular nómina usando horas ingresadas manualmente (sin reporte biométrico)."""
-    finished = pyqtSignal(object, str)
+    finished = pyqtSignal(object)
     error = pyqtSignal(str)
+    progreso = pyqtSignal(object)  # EventoProgreso, se muestra en vivo
 
     def __init__(self, employees_file, manual_hours_df, quincena_fecha):
         super().__init__()
@@ -857,20 +857,15 @@ class CalculatePayrollManualThread(QThread):
 
     def run(self):
         try:
-            import sys
-            from io import StringIO
-            old_stdout = sys.stdout
-            sys.stdout = output = StringIO()
             result = calculate_payroll_quincenal(
                 employees_file=self.employees_file,
                 hours_file="",
                 output_file=None,
                 quincena_fecha=self.quincena_fecha,
                 manual_hours_df=self.manual_hours_df,
+                progreso=self.progreso.emit,
             )
-            sys.stdout = old_stdout
-            output_text = output.getvalue()
-            self.finished.emit(result, output_text)
+            self.finished.emit(result)
         except Exception as e:
             self.error.emit(str(e))
 
@@ -962,7 +957,7 @@ class ManualHoursDialog(QDialog):
             QMessageBox.warning(self, "Archivo no encontrado", "No se encontró el archivo de empleados.")
             return
         try:
-            df = pd.read_excel(self.employees_file)
+            df = almacen_para(self.employees_file).leer_empleados()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo leer el archivo de empleados: {e}")
             return
@@ -1168,7 +1163,7 @@ class CalculatePayrollWindow(QDialog):
         emp_label = QLabel("Archivo de Empleados:")
         emp_layout.addWidget(emp_label)
         
-        self.emp_file_edit = QLineEdit(os.path.join(DATA_DIR, "employees_information.xlsx"))
+        self.emp_file_edit = QLineEdit(DEFAULT_EMPLOYEES_FILE)
         emp_layout.addWidget(self.emp_file_edit)
         
         emp_browse_btn = QPushButton("Buscar")
@@ -1241,7 +1236,7 @@ class CalculatePayrollWindow(QDialog):
             self,
             "Seleccionar archivo",
             os.getcwd(),
-            "Excel files (*.xlsx *.xls);;All files (*.*)"
+            "Excel files (*.xlsx *.xls);;Base SQLite (*.sqlite *.db);;All files (*.*)"
         )
         if filename:
             line_edit.setText(filename)
@@ -1278,6 +1273,7 @@ class CalculatePayrollWindow(QDialog):
         self.message_text.append(f"Fecha de referencia quincena: {quincena_str}")
         self.message_text.append("-" * 60)
         self.calc_thread = CalculatePayrollManualThread(employees_file, manual_df, quincena_str)
+        self.calc_thread.progreso.connect(self.show_progress)
         self.calc_thread.finished.connect(self.update_result)
         self.calc_thread.error.connect(self.show_error)
         self.calc_thread.start()
@@ -1332,14 +1328,23 @@ class CalculatePayrollWindow(QDialog):
         
         # Ejecutar cálculo en hilo separado
         self.calc_thread = CalculatePayrollThread(employees_file, hours_file, quincena_fecha)
+        self.calc_thread.progreso.connect(self.show_progress)
         self.calc_thread.finished.connect(self.update_result)
         self.calc_thread.error.connect(self.show_error)
         self.calc_thread.start()
     
-    def update_result(self, result, output_text):
+    def show_progress(self, evento):
+        """Muestra en vivo los mensajes y la etapa en curso del cálculo"""
+        if evento.tipo == PROGRESO_ETAPA_INICIO:
+            return
+        if evento.tipo == PROGRESO_ETAPA_FIN:
+            if evento.porcentaje is not None:
+                self.status_label.setText(f"⏳ Calculando nómina... {evento.porcentaje:.0f}% ({evento.etapa})")
+            return
+        self.message_text.append(evento.mensaje)
+
+    def update_result(self, result):
         """Actualiza la interfaz con el resultado del cálculo"""
-        self.message_text.append(output_text)
-        
         if result is not None:
             self.message_text.append("\n" + "=" * 60)
             self.message_text.append("✓ NÓMINA CALCULADA EXITOSAMENTE")
@@ -3006,6 +3011,7 @@ class ManualPaymentDialog(QDialog):
 
 
 def main():
+    activar_desde_argumentos()
     app = QApplication(sys.argv)
     GruvboxStyle.apply_style(app, CURRENT_THEME)
 
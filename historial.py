@@ -0,0 +1,576 @@
+"""
+Historial de nóminas en SQLite (datos/historial_nomina.sqlite).
+
+Cada nómina guardada se agrega a la tabla `nomina_historial`, particionada por año y número
+de quincena (1 a 24) e indexada por empleado y fecha de pago, para poder consultar el historial
+de un empleado, totales por período o sumas de columnas sin abrir los Excel de cada quincena.
+Los montos se guardan en centavos (INTEGER) y se devuelven en dólares.
+
+En la misma transacción se actualiza `acumulado_anual`: una fila por empleado y año con los
+acumulados del año (bruto, seguros, ISLR, neto) y el bruto de cada tercio del décimo tercer mes.
+"""
+
+import glob
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from comun import DATA_DIR, normalizar_id
+
+DEFAULT_HISTORIAL_DB = os.path.join(DATA_DIR, "historial_nomina.sqlite")
+
+# Columna de la nómina (Excel) -> columna del historial
+COLUMNAS_TEXTO = {
+    "ID": "employee_id",
+    "Nombre": "nombre",
+    "Cargo": "cargo",
+    "Tipo": "tipo_pago",
+}
+COLUMNAS_HORAS = {
+    "Salario Base": "salario_base",
+    "Total Horas Trabajadas": "horas_trabajadas",
+    "Horas Extra (después 3 PM)": "horas_extra",
+    "Horas Feriado/Domingo": "horas_feriado_domingo",
+}
+COLUMNAS_MONTO = {
+    "Pago Extra (25% adicional)": "pago_extra",
+    "Bono Horas Extra": "bono_horas_extra",
+    "Pago Feriado/Domingo (50% adicional)": "pago_feriado_domingo",
+    "Seguro Social (9.75%)": "seguro_social",
+    "Seguro Educativo (1.25%)": "seguro_educativo",
+    "ISLR": "islr",
+    "Descuento Préstamo": "descuento_prestamo",
+    "Total Descuentos": "total_descuentos",
+    "Total Saldo Préstamo": "saldo_prestamo",
+    "Total Pago a Empleados": "total_pago",
+}
+# Derivada: pago bruto = neto + descuentos
+COLUMNA_PAGO_BRUTO = "pago_quincenal"
+
+# Montos que se acumulan por empleado y año (acumulado_anual)
+COLUMNAS_ACUMULADAS = [
+    COLUMNA_PAGO_BRUTO, "seguro_social", "seguro_educativo", "islr",
+    "descuento_prestamo", "total_descuentos", "total_pago",
+]
+
+# Una corrida es una nómina guardada: fecha de pago y archivo (cada sede, o una simulación con
+# --salida, guarda su propio archivo para la misma fecha y no reemplaza las filas de las demás).
+# archivo_nomina es '' cuando no se indicó archivo.
+_TABLA_CORRIDAS = """
+CREATE TABLE IF NOT EXISTS corridas (
+    fecha_pago TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    quincena INTEGER NOT NULL,
+    quincena_inicio TEXT,
+    quincena_fin TEXT,
+    archivo_nomina TEXT NOT NULL DEFAULT '',
+    manifiesto_clave TEXT,
+    guardado_en TEXT,
+    PRIMARY KEY (fecha_pago, archivo_nomina)
+)"""
+
+_ESQUEMA = f"""
+{_TABLA_CORRIDAS};
+CREATE TABLE IF NOT EXISTS nomina_historial (
+    anio INTEGER NOT NULL,
+    quincena INTEGER NOT NULL,
+    fecha_pago TEXT NOT NULL,
+    quincena_inicio TEXT,
+    quincena_fin TEXT,
+    nomina TEXT NOT NULL,
+    archivo_nomina TEXT NOT NULL DEFAULT '',
+    {", ".join(f"{c} TEXT" for c in COLUMNAS_TEXTO.values())},
+    {", ".join(f"{c} REAL" for c in COLUMNAS_HORAS.values())},
+    {", ".join(f"{c}_centavos INTEGER" for c in COLUMNAS_MONTO.values())},
+    {COLUMNA_PAGO_BRUTO}_centavos INTEGER
+);
+CREATE TABLE IF NOT EXISTS acumulado_anual (
+    employee_id TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    nombre TEXT,
+    quincenas INTEGER,
+    horas_trabajadas REAL,
+    {", ".join(f"{c}_centavos INTEGER" for c in COLUMNAS_ACUMULADAS)},
+    bruto_tercio_1_centavos INTEGER,
+    bruto_tercio_2_centavos INTEGER,
+    bruto_tercio_3_centavos INTEGER,
+    PRIMARY KEY (employee_id, anio)
+);
+CREATE INDEX IF NOT EXISTS idx_historial_particion ON nomina_historial (anio, quincena);
+CREATE INDEX IF NOT EXISTS idx_historial_empleado ON nomina_historial (employee_id, fecha_pago);
+CREATE INDEX IF NOT EXISTS idx_historial_fecha ON nomina_historial (fecha_pago);
+"""
+
+# Después de _migrar_esquema (las bases anteriores no tienen archivo_nomina en el historial).
+# `nomina_vigente`: el historial contando una sola vez a cada empleado por fecha de pago. Si
+# aparece en más de un archivo de la misma fecha (una simulación guardada con --salida, la
+# misma nómina guardada en otra carpeta) vale la corrida guardada más recientemente. Los
+# totales y el acumulado anual se calculan sobre esta vista.
+_ESQUEMA_CORRIDAS = """
+CREATE INDEX IF NOT EXISTS idx_historial_corrida ON nomina_historial (fecha_pago, archivo_nomina);
+CREATE VIEW IF NOT EXISTS nomina_vigente AS
+SELECT h.* FROM nomina_historial h
+JOIN corridas c ON c.fecha_pago = h.fecha_pago AND c.archivo_nomina = h.archivo_nomina
+WHERE NOT EXISTS (
+    SELECT 1 FROM nomina_historial h2
+    JOIN corridas c2 ON c2.fecha_pago = h2.fecha_pago AND c2.archivo_nomina = h2.archivo_nomina
+    WHERE h2.employee_id = h.employee_id AND h2.fecha_pago = h.fecha_pago
+      AND h2.archivo_nomina <> h.archivo_nomina
+      AND (c2.guardado_en > c.guardado_en
+           OR (c2.guardado_en = c.guardado_en AND h2.archivo_nomina > h.archivo_nomina))
+);
+"""
+
+COLUMNAS_SUMABLES = list(COLUMNAS_HORAS.values())[1:] + list(COLUMNAS_MONTO.values()) + [COLUMNA_PAGO_BRUTO]
+
+
+def _conectar(db_path=None):
+    if db_path is None:
+        db_path = DEFAULT_HISTORIAL_DB
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_ESQUEMA)
+    _migrar_esquema(conn)
+    conn.executescript(_ESQUEMA_CORRIDAS)
+    return conn
+
+
+def _migrar_esquema(conn) -> None:
+    """
+    Bases creadas cuando las corridas eran una por fecha de pago: `corridas` pasa a tener clave
+    (fecha_pago, archivo_nomina) y cada fila del historial toma el archivo de su corrida.
+    """
+    if "archivo_nomina" in {fila[1] for fila in conn.execute("PRAGMA table_info(nomina_historial)")}:
+        return
+    with conn:
+        conn.execute("ALTER TABLE corridas RENAME TO _corridas_anterior")
+        conn.execute(_TABLA_CORRIDAS)
+        conn.execute(
+            """
+            INSERT INTO corridas (fecha_pago, anio, quincena, quincena_inicio, quincena_fin,
+                                  archivo_nomina, manifiesto_clave, guardado_en)
+            SELECT fecha_pago, anio, quincena, quincena_inicio, quincena_fin,
+                   COALESCE(archivo_nomina, ''), manifiesto_clave, guardado_en
+            FROM _corridas_anterior
+            """
+        )
+        conn.execute("DROP TABLE _corridas_anterior")
+        conn.execute("ALTER TABLE nomina_historial ADD COLUMN archivo_nomina TEXT NOT NULL DEFAULT ''")
+        conn.execute(
+            """
+            UPDATE nomina_historial SET archivo_nomina = COALESCE(
+                (SELECT c.archivo_nomina FROM corridas c WHERE c.fecha_pago = nomina_historial.fecha_pago), '')
+            """
+        )
+
+
+def _fecha_iso(valor):
+    """Fecha (Timestamp, datetime o texto dd/mm/YYYY) a texto YYYY-MM-DD; None si no es válida."""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        fecha = pd.to_datetime(valor, format="%d/%m/%Y", errors="coerce")
+        if pd.isna(fecha):
+            fecha = pd.to_datetime(valor, errors="coerce")
+    else:
+        fecha = pd.to_datetime(valor, errors="coerce")
+    return None if pd.isna(fecha) else fecha.strftime("%Y-%m-%d")
+
+
+def particion_quincena(fecha_pago):
+    """(año, número de quincena 1..24) de una fecha de pago."""
+    fecha = pd.to_datetime(_fecha_iso(fecha_pago))
+    return fecha.year, (fecha.month - 1) * 2 + (1 if fecha.day <= 15 else 2)
+
+
+def _filas_historial(nomina_df: pd.DataFrame, nomina: str, fecha_pago: str) -> pd.DataFrame:
+    """Convierte una nómina (columnas del Excel) a filas del historial."""
+    n = len(nomina_df)
+    anio, quincena = particion_quincena(fecha_pago)
+    filas = pd.DataFrame({
+        "anio": np.full(n, anio),
+        "quincena": np.full(n, quincena),
+        "fecha_pago": fecha_pago,
+        "quincena_inicio": [_fecha_iso(x) for x in nomina_df.get("Quincena Inicio", [None] * n)],
+        "quincena_fin": [_fecha_iso(x) for x in nomina_df.get("Quincena Fin", [None] * n)],
+        "nomina": nomina,
+    })
+    for origen, destino in COLUMNAS_TEXTO.items():
+        valores = nomina_df[origen] if origen in nomina_df.columns else pd.Series([None] * n)
+        if destino == "employee_id":
+            filas[destino] = [normalizar_id(x) for x in valores]
+        else:
+            filas[destino] = [None if pd.isna(x) else str(x) for x in valores]
+    for origen, destino in COLUMNAS_HORAS.items():
+        if origen in nomina_df.columns:
+            filas[destino] = pd.to_numeric(nomina_df[origen], errors="coerce").to_numpy(dtype=float)
+        else:
+            filas[destino] = np.nan
+    for origen, destino in COLUMNAS_MONTO.items():
+        if origen in nomina_df.columns:
+            # Montos de la nómina con 2 decimales: x*100 está a menos de 1e-6 del entero
+            montos = pd.to_numeric(nomina_df[origen], errors="coerce").to_numpy(dtype=float)
+            filas[f"{destino}_centavos"] = pd.array(np.rint(montos * 100), dtype="Int64")
+        else:
+            filas[f"{destino}_centavos"] = pd.array([None] * n, dtype="Int64")
+    filas[f"{COLUMNA_PAGO_BRUTO}_centavos"] = filas["total_pago_centavos"] + filas["total_descuentos_centavos"]
+    return filas
+
+
+def registrar_nomina(
+    nomina_df,
+    nomina_seguridad_df,
+    fecha_pago,
+    db_path=None,
+    ids=None,
+    archivo_nomina=None,
+    manifiesto_clave=None,
+) -> int:
+    """
+    Agrega al historial la nómina guardada de una fecha de pago (normal y de seguridad).
+    Volver a registrar la misma fecha con el mismo `archivo_nomina` reemplaza sus filas; con
+    `ids` solo se reemplazan las de esos empleados (recálculo parcial). Las nóminas de otros
+    archivos con la misma fecha (otra sede, una simulación con --salida) no se tocan. El
+    acumulado anual de los empleados afectados se actualiza en la misma transacción.
+
+    Returns:
+        Cantidad de filas escritas
+    """
+    fecha = _fecha_iso(fecha_pago)
+    if fecha is None:
+        raise ValueError(f"Fecha de pago inválida: {fecha_pago}")
+    partes = []
+    for df, nomina in ((nomina_df, "normal"), (nomina_seguridad_df, "seguridad")):
+        if df is not None and not df.empty:
+            partes.append(_filas_historial(df, nomina, fecha))
+    filas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    archivo = "" if archivo_nomina is None else os.path.abspath(archivo_nomina)
+    if not filas.empty:
+        filas["archivo_nomina"] = archivo
+    if ids is not None:
+        ids = sorted({normalizar_id(x) for x in ids} - {None})
+        if not filas.empty:
+            filas = filas[filas["employee_id"].isin(ids)]
+
+    anio, quincena = particion_quincena(fecha)
+    with closing(_conectar(db_path)) as conn, conn:
+        # Empleados antes y después del cambio: sus acumulados se recalculan en esta transacción
+        pares = _pares_acumulado(conn, fecha, ids, archivo)
+        if ids is None:
+            conn.execute(
+                "DELETE FROM nomina_historial WHERE fecha_pago = ? AND archivo_nomina = ?", (fecha, archivo)
+            )
+        else:
+            conn.executemany(
+                "DELETE FROM nomina_historial WHERE fecha_pago = ? AND archivo_nomina = ? AND employee_id = ?",
+                [(fecha, archivo, x) for x in ids],
+            )
+        if not filas.empty:
+            columnas = list(filas.columns)
+            conn.executemany(
+                f"INSERT INTO nomina_historial ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                (
+                    tuple(None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in fila)
+                    for fila in filas.itertuples(index=False, name=None)
+                ),
+            )
+        pares |= _pares_acumulado(conn, fecha, filas["employee_id"].dropna().unique() if not filas.empty else [])
+        # La corrida (y su guardado_en) antes del acumulado: nomina_vigente depende de ella
+        quincena_inicio = filas["quincena_inicio"].dropna().min() if not filas.empty else None
+        quincena_fin = filas["quincena_fin"].dropna().max() if not filas.empty else None
+        conn.execute(
+            """
+            INSERT INTO corridas (fecha_pago, anio, quincena, quincena_inicio, quincena_fin,
+                                  archivo_nomina, manifiesto_clave, guardado_en)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fecha_pago, archivo_nomina) DO UPDATE SET
+                quincena_inicio = COALESCE(excluded.quincena_inicio, quincena_inicio),
+                quincena_fin = COALESCE(excluded.quincena_fin, quincena_fin),
+                manifiesto_clave = excluded.manifiesto_clave,
+                guardado_en = excluded.guardado_en
+            """,
+            (
+                fecha, anio, quincena,
+                None if pd.isna(quincena_inicio) else quincena_inicio,
+                None if pd.isna(quincena_fin) else quincena_fin,
+                archivo,
+                manifiesto_clave,
+                datetime.now().isoformat(timespec="microseconds"),
+            ),
+        )
+        _actualizar_acumulados(conn, pares)
+    return len(filas)
+
+
+def importar_nominas_excel(carpeta=None, db_path=None) -> int:
+    """
+    Carga en el historial las nóminas ya guardadas en Excel (nomina_quincenal_pago_YYYYMMDD.xlsx
+    y su *_seguridad.xlsx) de la carpeta de datos. Sirve para llenar el historial la primera vez.
+
+    Returns:
+        Cantidad de quincenas importadas
+    """
+    if carpeta is None:
+        carpeta = DATA_DIR
+    importadas = 0
+    for archivo in sorted(glob.glob(os.path.join(carpeta, "nomina_quincenal_pago_*.xlsx"))):
+        m = re.search(r"nomina_quincenal_pago_(\d{8})\.xlsx$", os.path.basename(archivo))
+        if not m:
+            continue
+        fecha_pago = pd.to_datetime(m.group(1), format="%Y%m%d")
+        archivo_seguridad = archivo[: -len(".xlsx")] + "_seguridad.xlsx"
+        try:
+            nomina_df = pd.read_excel(archivo)
+            seguridad_df = pd.read_excel(archivo_seguridad) if os.path.exists(archivo_seguridad) else None
+            registrar_nomina(nomina_df, seguridad_df, fecha_pago, db_path, archivo_nomina=archivo)
+            importadas += 1
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo importar {archivo} al historial: {e}")
+    print(f"[OK] {importadas} quincena(s) importada(s) al historial")
+    return importadas
+
+
+def _filtro_fechas(desde=None, hasta=None, employee_id=None):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("fecha_pago >= ?")
+        parametros.append(_fecha_iso(desde))
+    if hasta is not None:
+        condiciones.append("fecha_pago <= ?")
+        parametros.append(_fecha_iso(hasta))
+    if employee_id is not None:
+        condiciones.append("employee_id = ?")
+        parametros.append(normalizar_id(employee_id))
+    return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+
+def _a_dolares(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas *_centavos -> dólares (mismo nombre sin el sufijo)."""
+    renombrar = {}
+    for col in [c for c in df.columns if c.endswith("_centavos")]:
+        df[col] = pd.to_numeric(df[col], errors="coerce") / 100
+        renombrar[col] = col[: -len("_centavos")]
+    return df.rename(columns=renombrar)
+
+
+def _columnas_sql(columnas):
+    desconocidas = [c for c in columnas if c not in COLUMNAS_SUMABLES]
+    if desconocidas:
+        raise ValueError(f"Columnas no sumables: {desconocidas} (use {COLUMNAS_SUMABLES})")
+    return [c if c in COLUMNAS_HORAS.values() else f"{c}_centavos" for c in columnas]
+
+
+def historial_empleado(employee_id, desde=None, hasta=None, db_path=None) -> pd.DataFrame:
+    """Filas del historial de un empleado (una por quincena), ordenadas por fecha de pago."""
+    where, parametros = _filtro_fechas(desde, hasta, employee_id)
+    with closing(_conectar(db_path)) as conn:
+        df = pd.read_sql_query(
+            f"SELECT * FROM nomina_historial{where} ORDER BY fecha_pago, nomina", conn, params=parametros
+        )
+    return _a_dolares(df)
+
+
+def totales_periodo(desde=None, hasta=None, por="quincena", db_path=None) -> pd.DataFrame:
+    """
+    Totales de la nómina por período (por="quincena" o "anio") entre dos fechas de pago.
+    Incluye cantidad de empleados pagados y la suma de todas las columnas de horas y montos.
+    """
+    if por not in ("quincena", "anio"):
+        raise ValueError("por debe ser 'quincena' o 'anio'")
+    grupo = ["anio", "quincena", "fecha_pago"] if por == "quincena" else ["anio"]
+    where, parametros = _filtro_fechas(desde, hasta)
+    sumas = ", ".join(f"SUM({c}) AS {c}" for c in _columnas_sql(COLUMNAS_SUMABLES))
+    with closing(_conectar(db_path)) as conn:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(grupo)}, COUNT(DISTINCT employee_id) AS empleados, {sumas} "
+            f"FROM nomina_vigente{where} GROUP BY {', '.join(grupo)} ORDER BY {', '.join(grupo)}",
+            conn,
+            params=parametros,
+        )
+    return _a_dolares(df)
+
+
+def sumar_columnas(columnas, desde=None, hasta=None, employee_id=None, por_empleado=False, db_path=None):
+    """
+    Suma columnas del historial (ej. ["total_pago", "seguro_social"]) en un rango de fechas de pago.
+
+    Returns:
+        dict {columna: total} o, con por_empleado=True, un DataFrame con una fila por empleado
+    """
+    if isinstance(columnas, str):
+        columnas = [columnas]
+    columnas_sql = _columnas_sql(columnas)
+    where, parametros = _filtro_fechas(desde, hasta, employee_id)
+    sumas = ", ".join(f"SUM({c}) AS {c}" for c in columnas_sql)
+    with closing(_conectar(db_path)) as conn:
+        if por_empleado:
+            df = pd.read_sql_query(
+                f"SELECT employee_id, MAX(nombre) AS nombre, {sumas} FROM nomina_vigente{where} "
+                f"GROUP BY employee_id ORDER BY nombre",
+                conn,
+                params=parametros,
+            )
+            return _a_dolares(df)
+        fila = conn.execute(f"SELECT {sumas} FROM nomina_vigente{where}", parametros).fetchone()
+    return {
+        col: (0.0 if valor is None else (valor / 100 if col_sql.endswith("_centavos") else float(valor)))
+        for col, col_sql, valor in zip(columnas, columnas_sql, fila)
+    }
+
+
+def listar_corridas(db_path=None) -> pd.DataFrame:
+    """Quincenas registradas en el historial."""
+    with closing(_conectar(db_path)) as conn:
+        return pd.read_sql_query("SELECT * FROM corridas ORDER BY fecha_pago, archivo_nomina", conn)
+
+
+# Décimo tercer mes: tercios del 16/dic al 15/abr, 16/abr al 15/ago y 16/ago al 15/dic.
+# La quincena 24 (16-31/dic) cuenta para el primer tercio del año siguiente.
+_ANIO_DECIMO = "(CASE WHEN h.quincena = 24 THEN h.anio + 1 ELSE h.anio END)"
+_TERCIO = "(CASE WHEN h.quincena = 24 OR h.quincena <= 7 THEN 1 WHEN h.quincena <= 15 THEN 2 ELSE 3 END)"
+
+
+def _pares_acumulado(conn, fecha_pago, ids=None, archivo_nomina="") -> set:
+    """(employee_id, año) del acumulado que dependen de las filas de esa corrida."""
+    anio, quincena = particion_quincena(fecha_pago)
+    anios = (anio, anio + 1) if quincena == 24 else (anio,)
+    if ids is None:
+        ids = [r[0] for r in conn.execute(
+            "SELECT DISTINCT employee_id FROM nomina_historial WHERE fecha_pago = ? AND archivo_nomina = ?",
+            (fecha_pago, archivo_nomina),
+        )]
+    return {(x, a) for x in ids if x is not None for a in anios}
+
+
+def _actualizar_acumulados(conn, pares) -> None:
+    """Recalcula las filas de `acumulado_anual` de esos (employee_id, año) desde el historial."""
+    if not pares:
+        return
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _pares_acumulado (employee_id TEXT, anio INTEGER)")
+    conn.execute("DELETE FROM _pares_acumulado")
+    conn.executemany("INSERT INTO _pares_acumulado VALUES (?, ?)", sorted(pares))
+    conn.execute(
+        "DELETE FROM acumulado_anual WHERE (employee_id, anio) IN (SELECT employee_id, anio FROM _pares_acumulado)"
+    )
+    del_anio = "h.anio = p.anio"
+    montos = ", ".join(
+        f"SUM(CASE WHEN {del_anio} THEN h.{c}_centavos ELSE 0 END)" for c in COLUMNAS_ACUMULADAS
+    )
+    tercios = ", ".join(
+        f"SUM(CASE WHEN {_ANIO_DECIMO} = p.anio AND {_TERCIO} = {t} "
+        f"THEN h.{COLUMNA_PAGO_BRUTO}_centavos ELSE 0 END)"
+        for t in (1, 2, 3)
+    )
+    conn.execute(
+        f"""
+        INSERT INTO acumulado_anual
+        SELECT p.employee_id, p.anio,
+               COALESCE(MAX(CASE WHEN {del_anio} THEN h.nombre END), MAX(h.nombre)),
+               COUNT(DISTINCT CASE WHEN {del_anio} THEN h.fecha_pago END),
+               SUM(CASE WHEN {del_anio} THEN h.horas_trabajadas ELSE 0 END),
+               {montos}, {tercios}
+        FROM _pares_acumulado p
+        JOIN nomina_vigente h ON h.employee_id = p.employee_id AND h.anio IN (p.anio - 1, p.anio)
+        GROUP BY p.employee_id, p.anio
+        HAVING SUM({del_anio}) > 0 OR SUM({_ANIO_DECIMO} = p.anio) > 0
+        """
+    )
+    conn.execute("DELETE FROM _pares_acumulado")
+
+
+def reconstruir_acumulados(carpeta=None, db_path=None, desde_excel=True) -> int:
+    """
+    Reconstruye `acumulado_anual` completo. Con desde_excel, antes vuelve a cargar el historial
+    desde los archivos de nómina guardados en la carpeta de datos (`importar_nominas_excel`).
+
+    Returns:
+        Cantidad de filas (empleado, año) del acumulado
+    """
+    if desde_excel:
+        importar_nominas_excel(carpeta, db_path)
+    with closing(_conectar(db_path)) as conn, conn:
+        conn.execute("DELETE FROM acumulado_anual")
+        pares = set(conn.execute(
+            f"SELECT DISTINCT employee_id, anio FROM nomina_historial h WHERE employee_id IS NOT NULL "
+            f"UNION SELECT DISTINCT employee_id, {_ANIO_DECIMO} FROM nomina_historial h WHERE employee_id IS NOT NULL"
+        ).fetchall())
+        _actualizar_acumulados(conn, pares)
+        total = conn.execute("SELECT COUNT(*) FROM acumulado_anual").fetchone()[0]
+    print(f"[OK] Acumulado anual reconstruido: {total} fila(s) empleado/año")
+    return total
+
+
+def acumulado_empleado(employee_id, anio, db_path=None) -> dict:
+    """
+    Acumulado del año de un empleado (búsqueda directa por clave), montos en dólares.
+    Incluye `decimo_tercio_1..3`: 1/12 del bruto de cada tercio (décimo tercer mes).
+    Devuelve {} si el empleado no tiene nóminas en ese año.
+    """
+    with closing(_conectar(db_path)) as conn:
+        conn.row_factory = sqlite3.Row
+        fila = conn.execute(
+            "SELECT * FROM acumulado_anual WHERE employee_id = ? AND anio = ?",
+            (normalizar_id(employee_id), int(anio)),
+        ).fetchone()
+    if fila is None:
+        return {}
+    resultado = {}
+    for col in fila.keys():
+        if col.endswith("_centavos"):
+            resultado[col[: -len("_centavos")]] = (fila[col] or 0) / 100
+        else:
+            resultado[col] = fila[col]
+    for t in (1, 2, 3):
+        resultado[f"decimo_tercio_{t}"] = decimo_tercer_mes_centavos(fila[f"bruto_tercio_{t}_centavos"] or 0) / 100
+    return resultado
+
+
+def decimo_tercer_mes_centavos(bruto_tercio_centavos: int) -> int:
+    """Décimo tercer mes de un tercio: 1/12 del bruto devengado, redondeado al centavo (mitad hacia arriba)."""
+    return (int(bruto_tercio_centavos) * 2 + 12) // 24
+
+
+def acumulados_anio(anio, db_path=None) -> pd.DataFrame:
+    """Acumulado de todos los empleados en un año (una fila por empleado), montos en dólares."""
+    with closing(_conectar(db_path)) as conn:
+        df = pd.read_sql_query(
+            "SELECT * FROM acumulado_anual WHERE anio = ? ORDER BY nombre", conn, params=(int(anio),)
+        )
+    for t in (1, 2, 3):
+        df[f"decimo_tercio_{t}_centavos"] = [
+            decimo_tercer_mes_centavos(x) for x in df[f"bruto_tercio_{t}_centavos"].fillna(0)
+        ]
+    return _a_dolares(df)
+
+
+def main():
+    """Mantenimiento del historial por línea de comandos."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Historial de nóminas y acumulado anual.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("reconstruir", help="Reconstruir historial y acumulado anual desde los Excel de nómina")
+    p.add_argument("--carpeta", default=None, help="Carpeta con nomina_quincenal_pago_*.xlsx (por defecto datos/)")
+    p.add_argument("--db", default=None, help="Base de datos del historial")
+    p.add_argument("--solo-acumulado", action="store_true", help="No releer los Excel; solo recalcular el acumulado")
+    p = sub.add_parser("acumulado", help="Mostrar el acumulado anual")
+    p.add_argument("anio", type=int)
+    p.add_argument("--empleado", default=None, help="ID del empleado")
+    p.add_argument("--db", default=None, help="Base de datos del historial")
+    args = parser.parse_args()
+
+    if args.comando == "reconstruir":
+        reconstruir_acumulados(args.carpeta, args.db, desde_excel=not args.solo_acumulado)
+    elif args.empleado:
+        for clave, valor in acumulado_empleado(args.empleado, args.anio, args.db).items():
+            print(f"{clave}: {valor}")
+    else:
+        print(acumulados_anio(args.anio, args.db).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,36 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 import sys
+import time
 import uuid
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 from decimal import Decimal, ROUND_HALF_UP
+from dataclasses import dataclass, field, replace
 from typing import Optional
 
-# Carpeta donde se guardan y leen los archivos de datos (Excel, logo, etc.)
-if getattr(sys, "frozen", False):
-    _BASE_DIR = os.path.dirname(sys.executable)
-else:
-    _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(_BASE_DIR, "datos")
+import historial
+from comun import DATA_DIR, mapear_por_valor, normalizar_id, normalizar_ids
+from almacenamiento import almacen_para, rutas_por_defecto, lectura_cacheada
+from escritor_xlsx import escribir_xlsx, FORMATO_HORAS, FORMATO_MONTO
+from salidas_nomina import guardar_salidas_nomina, leer_nomina, ruta_salida, FORMATOS_SALIDA
+from diagnostico import perfilable, activar_desde_argumentos, ejecutor_hilos
 
-DEFAULT_EMPLOYEES_FILE = os.path.join(DATA_DIR, "employees_information.xlsx")
+# Empleados, préstamos y seguridad: Excel o una base SQLite según datos/almacenamiento.json
+_RUTAS_ALMACEN = rutas_por_defecto()
+DEFAULT_EMPLOYEES_FILE = _RUTAS_ALMACEN["empleados"]
 DEFAULT_HOURS_FILE = os.path.join(DATA_DIR, "Reporte de Asistencia.xlsx")
-DEFAULT_PRESTAMOS_FILE = os.path.join(DATA_DIR, "prestamos.xlsx")
-DEFAULT_SEGURIDAD_HORARIO_FILE = os.path.join(DATA_DIR, "seguridad_horario.xlsx")
+DEFAULT_PRESTAMOS_FILE = _RUTAS_ALMACEN["prestamos"]
+DEFAULT_SEGURIDAD_HORARIO_FILE = _RUTAS_ALMACEN["seguridad_horario"]
+DEFAULT_METRICAS_LOG = os.path.join(DATA_DIR, "metricas_nomina.jsonl")
+
+# Formato de Excel por columna de las nóminas guardadas (se aplica una vez a toda la columna)
+FORMATOS_NOMINA = {
+    **{columna: FORMATO_HORAS for columna in historial.COLUMNAS_HORAS},
+    **{columna: FORMATO_MONTO for columna in historial.COLUMNAS_MONTO},
+}
 
 
 def parse_bool(value) -> bool:
@@ -38,84 +53,299 @@ def get_column_value(row, candidates, default=None):
     return default
 
 
+# Alias aceptados para cada columna del archivo de empleados (el primero con valor gana)
+_ALIAS_COLUMNAS_EMPLEADOS = {
+    "seguridad": ["seguridad", "Seguridad", "empleado_seguridad", "Empleado Seguridad"],
+    "empleado_por_contrato": ["Empleado por contrato", "empleado_por_contrato", "empleado por contrato"],
+    "islr": ["ISLR", "ISL", "isl", "Impuesto sobre la renta"],
+}
+
+COLUMNAS_TABLA_EMPLEADOS = [
+    "nombre", "salario_fijo", "empleado_fijo", "seguridad", "salario_minimo", "salario", "cargo",
+    "n_de_cuenta", "banco", "tipo_de_cuenta", "empleado_por_contrato", "islr",
+]
+
+
+def resolver_esquema_empleados(columnas) -> dict:
+    """
+    Resuelve una sola vez, para un archivo de empleados, qué columnas reales corresponden
+    a cada nombre canónico con alias. Devuelve {nombre_canonico: [columnas presentes en orden]}.
+    """
+    presentes = set(columnas)
+    return {
+        canonico: [col for col in alias if col in presentes]
+        for canonico, alias in _ALIAS_COLUMNAS_EMPLEADOS.items()
+    }
+
+
+def _primer_valor(df, columnas, default):
+    """Versión por columnas de `get_column_value`: primer valor no nulo entre `columnas`."""
+    if not columnas:
+        return pd.Series(default, index=df.index, dtype=object)
+    valores = df[columnas[0]]
+    for col in columnas[1:]:
+        valores = valores.where(valores.notna(), df[col])
+    return valores.where(valores.notna(), default)
+
+
+def construir_tabla_empleados(employees_df) -> pd.DataFrame:
+    """
+    Convierte el archivo de empleados en una tabla tipada indexada por ID normalizado
+    (columnas `COLUMNAS_TABLA_EMPLEADOS`). Los alias se resuelven una vez y cada columna
+    se convierte completa; si un ID se repite, gana la última fila (como el diccionario anterior).
+    """
+    if employees_df is None or employees_df.empty:
+        return pd.DataFrame(columns=COLUMNAS_TABLA_EMPLEADOS, index=pd.Index([], dtype=object, name="ID"))
+
+    esquema = resolver_esquema_empleados(employees_df.columns)
+    df = employees_df
+
+    def columna(nombre, default):
+        if nombre in df.columns:
+            return df[nombre]
+        return pd.Series(default, index=df.index, dtype=object)
+
+    def a_float(valores):
+        return pd.to_numeric(valores, errors="coerce").fillna(0.0).astype(float)
+
+    tabla = pd.DataFrame({
+        "nombre": df["nombre"],
+        # salario_fijo / empleado_fijo conservan la conversión histórica bool(valor)
+        "salario_fijo": mapear_por_valor(columna("salario_fijo", False), bool).astype(bool),
+        "empleado_fijo": mapear_por_valor(columna("empleado_fijo", False), bool).astype(bool),
+        "seguridad": mapear_por_valor(_primer_valor(df, esquema["seguridad"], False), parse_bool).astype(bool),
+        "salario_minimo": a_float(columna("salario_minimo", 0.0)),
+        "salario": a_float(df["salario"]),
+        "cargo": columna("cargo", ""),
+        "n_de_cuenta": columna("n_de_cuenta", ""),
+        "banco": columna("banco", ""),
+        "tipo_de_cuenta": columna("tipo_de_cuenta", ""),
+        "empleado_por_contrato": mapear_por_valor(
+            _primer_valor(df, esquema["empleado_por_contrato"], False), parse_bool
+        ).astype(bool),
+        "islr": a_float(_primer_valor(df, esquema["islr"], 0)),
+    }, columns=COLUMNAS_TABLA_EMPLEADOS)
+    tabla.index = pd.Index(normalizar_ids(df["ID"]).to_numpy(), name="ID")
+    return tabla[~tabla.index.duplicated(keep="last")]
+
+
+class EmpleadoRegistro:
+    """Datos de un solo empleado (sin diccionario por instancia)."""
+
+    __slots__ = ("id",) + tuple(COLUMNAS_TABLA_EMPLEADOS)
+
+    def __init__(self, **valores):
+        for campo in self.__slots__:
+            setattr(self, campo, valores.get(campo))
+
+    def __repr__(self):
+        return f"EmpleadoRegistro(id={self.id!r}, nombre={self.nombre!r})"
+
+
+class TablaEmpleados:
+    """
+    Empleados en columnas: un arreglo numpy por campo (`COLUMNAS_TABLA_EMPLEADOS`) más un
+    índice ID normalizado -> fila. Se construye una vez por archivo y la comparten el cálculo
+    de pagos, los préstamos y la salida de la nómina.
+    """
+
+    __slots__ = ("ids", "indice") + tuple(COLUMNAS_TABLA_EMPLEADOS)
+
+    def __init__(self, tabla: pd.DataFrame):
+        self.ids = tabla.index.to_numpy(dtype=object)
+        self.indice = pd.Index(self.ids)
+        for campo in COLUMNAS_TABLA_EMPLEADOS:
+            setattr(self, campo, tabla[campo].to_numpy())
+
+    @classmethod
+    def desde_dataframe(cls, employees_df) -> "TablaEmpleados":
+        """Construye la tabla a partir del DataFrame leído del archivo de empleados."""
+        return cls(construir_tabla_empleados(employees_df))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, employee_id):
+        return self.posiciones([employee_id])[0] >= 0
+
+    def posiciones(self, ids) -> np.ndarray:
+        """Fila de cada ID en la tabla (-1 si no existe)."""
+        return self.indice.get_indexer(normalizar_ids(pd.Series(ids, dtype=object)).to_numpy())
+
+    def tomar(self, campo: str, posiciones, default=None) -> np.ndarray:
+        """Valores de `campo` en `posiciones`; las posiciones -1 reciben `default`."""
+        valores = getattr(self, campo)
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        if len(valores) == 0:
+            return np.full(len(posiciones), default)
+        encontrados = posiciones >= 0
+        return np.where(encontrados, valores[np.where(encontrados, posiciones, 0)], default)
+
+    def registro(self, employee_id) -> Optional[EmpleadoRegistro]:
+        """Datos de un empleado por ID, o None si no existe."""
+        posicion = self.posiciones([employee_id])[0]
+        if posicion < 0:
+            return None
+        return EmpleadoRegistro(
+            id=self.ids[posicion],
+            **{campo: getattr(self, campo)[posicion] for campo in COLUMNAS_TABLA_EMPLEADOS},
+        )
+
+    def ids_seguridad(self) -> set:
+        """IDs normalizados de los empleados marcados como seguridad."""
+        return set(self.ids[self.seguridad])
+
+
 def ensure_seguridad_horario_file(horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE) -> None:
     """
-    Crea un archivo de configuración de seguridad si no existe.
-    Este archivo permite cambiar el turno sin tocar código.
+    Crea la configuración de seguridad si no existe (en Excel, `seguridad_horario.xlsx`).
+    Permite cambiar el turno sin tocar código.
     """
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if os.path.exists(horario_file):
-        return
+    almacen_para(horario_file).asegurar_seguridad_config()
 
-    columns = [
-        "vigente_desde",                 # fecha desde la cual aplica esta configuración
-        "horas_turno",                   # ej: 12
-        "hora_cambio_turno",             # HH:MM (inicio del turno Día). El turno Noche inicia + horas_turno.
-        "margen_salida_minutos",         # ej: 10 (antes/después de la hora de salida programada)
-        "tolerancia_turno_minutos",      # ej: 30 (tolerancia para duración real vs horas_turno)
-        "empleados_turno_dia",           # informativo
-        "empleados_turno_noche",         # informativo
-        "nota",
-    ]
-    df = pd.DataFrame([{
-        "vigente_desde": datetime.now().date(),
-        "horas_turno": 12,
-        "hora_cambio_turno": "07:00",
-        "margen_salida_minutos": 10,
-        "tolerancia_turno_minutos": 30,
+
+_SEGURIDAD_CONFIG_DEFAULTS = {
+    "horas_turno": 12,
+    "hora_cambio_turno": "07:00",
+    "margen_salida_minutos": 10,
+    "tolerancia_turno_minutos": 30,
+    "empleados_turno_dia": 0,
+    "empleados_turno_noche": 0,
+}
+
+# Cache de configuraciones de seguridad: ruta -> (mtime_ns, tabla)
+_seguridad_config_cache = {}
+
+
+def _normalizar_tabla_seguridad(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte las filas crudas de configuración de seguridad en una tabla tipada,
+    ordenada por `vigente_desde` (una fila por configuración).
+    Valores vacíos o 0 usan el valor por defecto (mismo criterio que `valor or defecto`).
+    """
+    df = df.copy() if df is not None else pd.DataFrame()
+    n = len(df)
+    tabla = pd.DataFrame(index=df.index)
+    if "vigente_desde" in df.columns:
+        tabla["vigente_desde"] = pd.to_datetime(df["vigente_desde"], errors="coerce")
+    else:
+        tabla["vigente_desde"] = pd.Series([pd.NaT] * n, index=df.index, dtype="datetime64[ns]")
+    tabla["vigente_desde"] = tabla["vigente_desde"].astype("datetime64[ns]")
+
+    minimos = {
+        "horas_turno": 1,
+        "margen_salida_minutos": 0,
+        "tolerancia_turno_minutos": 0,
         "empleados_turno_dia": 0,
         "empleados_turno_noche": 0,
-        "nota": "Editar este archivo para ajustar turnos de seguridad",
-    }], columns=columns)
+    }
+    for col, minimo in minimos.items():
+        default = _SEGURIDAD_CONFIG_DEFAULTS[col]
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            valores = valores.where(valores != 0, default)
+        else:
+            valores = pd.Series(default, index=df.index)
+        tabla[col] = valores.astype(float).astype(int).clip(lower=minimo)
 
-    with pd.ExcelWriter(horario_file, engine="openpyxl") as writer:
-        df.to_excel(writer, sheet_name="Config", index=False)
+    if "hora_cambio_turno" in df.columns:
+        hora = df["hora_cambio_turno"].astype(str).str.strip()
+        hora = hora.where(df["hora_cambio_turno"].notna() & (hora != ""), _SEGURIDAD_CONFIG_DEFAULTS["hora_cambio_turno"])
+    else:
+        hora = pd.Series(_SEGURIDAD_CONFIG_DEFAULTS["hora_cambio_turno"], index=df.index)
+    tabla["hora_cambio_turno"] = hora
 
+    tabla = tabla[tabla["vigente_desde"].notna()].sort_values("vigente_desde", kind="mergesort")
+    if tabla.empty:
+        fila = dict(_SEGURIDAD_CONFIG_DEFAULTS)
+        fila["vigente_desde"] = pd.Timestamp("1900-01-01")
+        tabla = pd.DataFrame([fila])
+        tabla["vigente_desde"] = tabla["vigente_desde"].astype("datetime64[ns]")
+    columnas = ["vigente_desde"] + list(_SEGURIDAD_CONFIG_DEFAULTS.keys())
+    return tabla[columnas].reset_index(drop=True)
 
-def leer_seguridad_config(fecha_referencia=None, horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE) -> dict:
+
+def cargar_seguridad_config(horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE) -> pd.DataFrame:
     """
-    Lee la configuración de turnos de seguridad vigente para una fecha.
+    Carga todas las configuraciones de turnos de seguridad como una tabla ordenada
+    por `vigente_desde`. El resultado se cachea por archivo y se vuelve a leer solo
+    cuando cambia la fecha de modificación del Excel.
+
+    Returns:
+        DataFrame con columnas: vigente_desde, horas_turno, hora_cambio_turno,
+        margen_salida_minutos, tolerancia_turno_minutos, empleados_turno_dia, empleados_turno_noche
     """
     ensure_seguridad_horario_file(horario_file)
-    df = pd.read_excel(horario_file, sheet_name="Config")
-    if df is None or df.empty:
-        return {
-            "horas_turno": 12,
-            "hora_cambio_turno": "07:00",
-            "margen_salida_minutos": 10,
-            "empleados_turno_dia": 0,
-            "empleados_turno_noche": 0,
-        }
+    key = os.path.abspath(horario_file)
+    try:
+        mtime = os.stat(horario_file).st_mtime_ns
+    except OSError:
+        mtime = None
 
-    df = df.copy()
-    df["vigente_desde"] = pd.to_datetime(df.get("vigente_desde"), errors="coerce")
-    df = df[df["vigente_desde"].notna()].sort_values("vigente_desde")
-    if df.empty:
-        chosen = None
-    else:
-        ref = pd.to_datetime(fecha_referencia, errors="coerce") if fecha_referencia is not None else pd.Timestamp(datetime.now().date())
-        if pd.isna(ref):
-            ref = pd.Timestamp(datetime.now().date())
-        candidates = df[df["vigente_desde"] <= ref]
-        chosen = candidates.iloc[-1] if not candidates.empty else df.iloc[0]
-
-    if chosen is None:
-        chosen = df.iloc[0]
-
-    horas_turno = int(pd.to_numeric(chosen.get("horas_turno", 12), errors="coerce") or 12)
-    hora_cambio = str(chosen.get("hora_cambio_turno", "07:00")).strip() or "07:00"
-    margen = int(pd.to_numeric(chosen.get("margen_salida_minutos", 10), errors="coerce") or 10)
-    tolerancia = int(pd.to_numeric(chosen.get("tolerancia_turno_minutos", 30), errors="coerce") or 30)
-    empleados_dia = int(pd.to_numeric(chosen.get("empleados_turno_dia", 0), errors="coerce") or 0)
-    empleados_noche = int(pd.to_numeric(chosen.get("empleados_turno_noche", 0), errors="coerce") or 0)
+    cached = _seguridad_config_cache.get(key)
+    if cached is not None and mtime is not None and cached[0] == mtime:
+        return cached[1].copy()
+
+    df = almacen_para(horario_file).leer_seguridad_config()
+    tabla = _normalizar_tabla_seguridad(df)
+    if mtime is not None:
+        _seguridad_config_cache[key] = (mtime, tabla)
+    return tabla.copy()
 
+
+def resolver_seguridad_config(fechas, config_tabla: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resuelve, para cada fecha, la configuración de seguridad vigente ese día
+    (última fila con `vigente_desde` <= fecha). Fechas anteriores a la primera
+    configuración (o inválidas) usan la primera fila.
+
+    Returns:
+        DataFrame alineado posicionalmente con `fechas` (índice 0..n-1).
+    """
+    fechas = pd.Series(pd.to_datetime(pd.Index(fechas), errors="coerce")).astype("datetime64[ns]")
+    tabla = config_tabla.sort_values("vigente_desde", kind="mergesort").reset_index(drop=True)
+    columnas = [c for c in tabla.columns if c != "vigente_desde"]
+
+    left = pd.DataFrame({"_fecha": fechas, "_orden": np.arange(len(fechas))})
+    validas = left[left["_fecha"].notna()].sort_values("_fecha", kind="mergesort")
+    merged = pd.merge_asof(
+        validas,
+        tabla,
+        left_on="_fecha",
+        right_on="vigente_desde",
+        direction="backward",
+    )
+    resultado = pd.DataFrame({"_orden": left["_orden"]}).merge(
+        merged[["_orden"] + columnas], on="_orden", how="left"
+    )
+    sin_config = resultado["horas_turno"].isna()
+    if sin_config.any():
+        primera = tabla.iloc[0]
+        for col in columnas:
+            resultado.loc[sin_config, col] = primera[col]
+    resultado = resultado.sort_values("_orden").drop(columns=["_orden"]).reset_index(drop=True)
+    for col in columnas:
+        if col != "hora_cambio_turno":
+            resultado[col] = resultado[col].astype(int)
+    return resultado
+
+
+def leer_seguridad_config(fecha_referencia=None, horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE) -> dict:
+    """
+    Lee la configuración de turnos de seguridad vigente para una fecha.
+    """
+    tabla = cargar_seguridad_config(horario_file)
+    ref = pd.to_datetime(fecha_referencia, errors="coerce") if fecha_referencia is not None else pd.Timestamp(datetime.now().date())
+    if pd.isna(ref):
+        ref = pd.Timestamp(datetime.now().date())
+    fila = resolver_seguridad_config([ref], tabla).iloc[0]
     return {
-        "horas_turno": max(1, horas_turno),
-        "hora_cambio_turno": hora_cambio,
-        "margen_salida_minutos": max(0, margen),
-        "tolerancia_turno_minutos": max(0, tolerancia),
-        "empleados_turno_dia": max(0, empleados_dia),
-        "empleados_turno_noche": max(0, empleados_noche),
+        "horas_turno": int(fila["horas_turno"]),
+        "hora_cambio_turno": str(fila["hora_cambio_turno"]),
+        "margen_salida_minutos": int(fila["margen_salida_minutos"]),
+        "tolerancia_turno_minutos": int(fila["tolerancia_turno_minutos"]),
+        "empleados_turno_dia": int(fila["empleados_turno_dia"]),
+        "empleados_turno_noche": int(fila["empleados_turno_noche"]),
     }
 
 
@@ -141,48 +371,11 @@ def _cents_to_money(cents: int) -> float:
 
 def ensure_prestamos_file(prestamos_file: str = DEFAULT_PRESTAMOS_FILE) -> None:
     """
-    Crea el archivo de préstamos si no existe.
-    Guarda:
+    Crea el almacenamiento de préstamos si no existe. En Excel guarda:
       - Hoja 'Prestamos' (estado del préstamo)
       - Hoja 'PagosPrestamo' (bitácora de descuentos aplicados)
     """
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if os.path.exists(prestamos_file):
-        return
-
-    prestamos_columns = [
-        "loan_id",
-        "employee_id",
-        "employee_name",
-        "fecha_inicio",
-        "monto_original_centavos",
-        "cuota_quincenal_centavos",
-        "saldo_centavos",
-        "estado",  # ACTIVO | PAUSADO | CERRADO
-        "nota",
-        "creado_en",
-    ]
-    pagos_columns = [
-        "payment_id",
-        "loan_id",
-        "employee_id",
-        "tipo_pago",  # NOMINA | MANUAL
-        "fecha_pago_nomina",
-        "quincena_inicio",
-        "quincena_fin",
-        "monto_pagado_centavos",
-        "saldo_antes_centavos",
-        "saldo_despues_centavos",
-        "nota",
-        "creado_en",
-    ]
-
-    prestamos_df = pd.DataFrame(columns=prestamos_columns)
-    pagos_df = pd.DataFrame(columns=pagos_columns)
-
-    with pd.ExcelWriter(prestamos_file, engine="openpyxl") as writer:
-        prestamos_df.to_excel(writer, sheet_name="Prestamos", index=False)
-        pagos_df.to_excel(writer, sheet_name="PagosPrestamo", index=False)
+    almacen_para(prestamos_file).asegurar_prestamos()
 
 
 def leer_prestamos(prestamos_file: str = DEFAULT_PRESTAMOS_FILE):
@@ -193,108 +386,19 @@ def leer_prestamos(prestamos_file: str = DEFAULT_PRESTAMOS_FILE):
         (prestamos_df, pagos_df)
     """
     ensure_prestamos_file(prestamos_file)
-
     try:
-        xls = pd.ExcelFile(prestamos_file)
-        prestamos_df = (
-            pd.read_excel(prestamos_file, sheet_name="Prestamos")
-            if "Prestamos" in xls.sheet_names
-            else pd.DataFrame()
-        )
-        pagos_df = (
-            pd.read_excel(prestamos_file, sheet_name="PagosPrestamo")
-            if "PagosPrestamo" in xls.sheet_names
-            else pd.DataFrame()
-        )
+        return almacen_para(prestamos_file).leer_prestamos()
     except Exception as e:
-        print(f"[ERROR] No se pudo leer el archivo de préstamos '{prestamos_file}': {e}")
+        _informar(f"[ERROR] No se pudo leer el archivo de préstamos '{prestamos_file}': {e}")
         raise
 
-    # Asegurar columnas mínimas
-    prestamos_required = [
-        "loan_id",
-        "employee_id",
-        "employee_name",
-        "fecha_inicio",
-        "monto_original_centavos",
-        "cuota_quincenal_centavos",
-        "saldo_centavos",
-        "estado",
-        "nota",
-        "creado_en",
-    ]
-    for col in prestamos_required:
-        if col not in prestamos_df.columns:
-            prestamos_df[col] = None
-
-    pagos_required = [
-        "payment_id",
-        "loan_id",
-        "employee_id",
-        "tipo_pago",
-        "fecha_pago_nomina",
-        "quincena_inicio",
-        "quincena_fin",
-        "monto_pagado_centavos",
-        "saldo_antes_centavos",
-        "saldo_despues_centavos",
-        "nota",
-        "creado_en",
-    ]
-    for col in pagos_required:
-        if col not in pagos_df.columns:
-            pagos_df[col] = None
-
-    # Normalizar tipos
-    for col in ["loan_id", "employee_id", "employee_name", "estado", "nota"]:
-        prestamos_df[col] = prestamos_df[col].astype(str).where(prestamos_df[col].notna(), "")
-        prestamos_df[col] = prestamos_df[col].astype(str).str.strip()
-
-    if "fecha_inicio" in prestamos_df.columns:
-        prestamos_df["fecha_inicio"] = pd.to_datetime(prestamos_df["fecha_inicio"], errors="coerce")
-    if "creado_en" in prestamos_df.columns:
-        prestamos_df["creado_en"] = pd.to_datetime(prestamos_df["creado_en"], errors="coerce")
-
-    for cent_col in ["monto_original_centavos", "cuota_quincenal_centavos", "saldo_centavos"]:
-        prestamos_df[cent_col] = (
-            pd.to_numeric(prestamos_df[cent_col], errors="coerce")
-            .fillna(0)
-            .astype(int)
-        )
-
-    if "estado" in prestamos_df.columns:
-        prestamos_df["estado"] = prestamos_df["estado"].replace({"": "ACTIVO"}).fillna("ACTIVO")
-        prestamos_df["estado"] = prestamos_df["estado"].astype(str).str.upper().str.strip()
-
-    for col in ["payment_id", "loan_id", "employee_id", "tipo_pago", "nota"]:
-        pagos_df[col] = pagos_df[col].astype(str).where(pagos_df[col].notna(), "")
-        pagos_df[col] = pagos_df[col].astype(str).str.strip()
-
-    if "tipo_pago" in pagos_df.columns:
-        pagos_df["tipo_pago"] = pagos_df["tipo_pago"].replace({"": "NOMINA"}).fillna("NOMINA")
-        pagos_df["tipo_pago"] = pagos_df["tipo_pago"].astype(str).str.upper().str.strip()
-
-    for date_col in ["fecha_pago_nomina", "quincena_inicio", "quincena_fin", "creado_en"]:
-        if date_col in pagos_df.columns:
-            pagos_df[date_col] = pd.to_datetime(pagos_df[date_col], errors="coerce")
-
-    for cent_col in ["monto_pagado_centavos", "saldo_antes_centavos", "saldo_despues_centavos"]:
-        pagos_df[cent_col] = (
-            pd.to_numeric(pagos_df[cent_col], errors="coerce")
-            .fillna(0)
-            .astype(int)
-        )
-
-    return prestamos_df[prestamos_required], pagos_df[pagos_required]
-
 
 def guardar_prestamos(prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame, prestamos_file: str = DEFAULT_PRESTAMOS_FILE) -> None:
     ensure_prestamos_file(prestamos_file)
-    with pd.ExcelWriter(prestamos_file, engine="openpyxl") as writer:
-        prestamos_df.to_excel(writer, sheet_name="Prestamos", index=False)
-        pagos_df.to_excel(writer, sheet_name="PagosPrestamo", index=False)
+    almacen_para(prestamos_file).guardar_prestamos(prestamos_df, pagos_df)
 
 
+@perfilable()
 def crear_prestamo(
     employee_id,
     employee_name: str,
@@ -310,8 +414,6 @@ def crear_prestamo(
     Returns:
         loan_id
     """
-    prestamos_df, pagos_df = leer_prestamos(prestamos_file)
-
     employee_id_str = str(employee_id).strip()
     employee_name = (employee_name or "").strip()
 
@@ -344,40 +446,35 @@ def crear_prestamo(
         "creado_en": creado_en,
     }
 
-    prestamos_df = pd.concat([prestamos_df, pd.DataFrame([nuevo])], ignore_index=True)
-    guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
+    ensure_prestamos_file(prestamos_file)
+    almacen_para(prestamos_file).agregar_prestamo(nuevo)
     return loan_id
 
 
+@perfilable()
 def actualizar_estado_prestamo(loan_id: str, nuevo_estado: str, prestamos_file: str = DEFAULT_PRESTAMOS_FILE) -> None:
-    prestamos_df, pagos_df = leer_prestamos(prestamos_file)
     loan_id = str(loan_id).strip()
     nuevo_estado = str(nuevo_estado).strip().upper()
     if nuevo_estado not in {"ACTIVO", "PAUSADO", "CERRADO"}:
         raise ValueError("Estado inválido (use ACTIVO, PAUSADO o CERRADO)")
 
-    mask = prestamos_df["loan_id"].astype(str).str.strip() == loan_id
-    if not mask.any():
+    ensure_prestamos_file(prestamos_file)
+    if almacen_para(prestamos_file).actualizar_prestamo(loan_id, {"estado": nuevo_estado}) is None:
         raise ValueError(f"No se encontró el préstamo con loan_id={loan_id}")
 
-    prestamos_df.loc[mask, "estado"] = nuevo_estado
-    guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
-
 
+@perfilable()
 def cerrar_prestamo(loan_id: str, condonar: bool = False, prestamos_file: str = DEFAULT_PRESTAMOS_FILE) -> None:
     """
     Cierra un préstamo. Si `condonar=True`, pone el saldo en 0.
     """
-    prestamos_df, pagos_df = leer_prestamos(prestamos_file)
     loan_id = str(loan_id).strip()
-    mask = prestamos_df["loan_id"].astype(str).str.strip() == loan_id
-    if not mask.any():
-        raise ValueError(f"No se encontró el préstamo con loan_id={loan_id}")
+    cambios = {"saldo_centavos": 0} if condonar else {}
+    cambios["estado"] = "CERRADO"
 
-    if condonar:
-        prestamos_df.loc[mask, "saldo_centavos"] = 0
-    prestamos_df.loc[mask, "estado"] = "CERRADO"
-    guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
+    ensure_prestamos_file(prestamos_file)
+    if almacen_para(prestamos_file).actualizar_prestamo(loan_id, cambios) is None:
+        raise ValueError(f"No se encontró el préstamo con loan_id={loan_id}")
 
 
 def obtener_prestamos(prestamos_file: str = DEFAULT_PRESTAMOS_FILE) -> pd.DataFrame:
@@ -395,11 +492,190 @@ def obtener_pagos_prestamo(
     if loan_id:
         df = df[df["loan_id"].astype(str).str.strip() == str(loan_id).strip()]
     if employee_id:
-        df = df[df["employee_id"].astype(str).str.strip() == str(employee_id).strip()]
+        df = df[normalizar_ids(df["employee_id"]) == normalizar_id(employee_id)]
     df = df.sort_values(["fecha_pago_nomina", "creado_en"], na_position="last")
     return df
 
 
+def _por_empleado(valor, n: int) -> list:
+    """Expande un valor común a una lista de `n` valores (o devuelve la lista si ya viene por empleado)."""
+    if isinstance(valor, (list, tuple, np.ndarray, pd.Series, pd.Index)):
+        valores = list(valor)
+        if len(valores) != n:
+            raise ValueError(f"Se esperaban {n} valores y se recibieron {len(valores)}")
+        return valores
+    return [valor] * n
+
+
+def _claves_pagos_nomina(pagos_df: pd.DataFrame) -> set:
+    """(loan_id, fecha_pago_nomina normalizada) de los pagos tipo NOMINA ya registrados."""
+    try:
+        if (
+            pagos_df is None
+            or pagos_df.empty
+            or "loan_id" not in pagos_df.columns
+            or "fecha_pago_nomina" not in pagos_df.columns
+        ):
+            return set()
+        # Solo bloquear duplicados de pagos tipo NOMINA
+        if "tipo_pago" in pagos_df.columns:
+            tmp = pagos_df[["loan_id", "fecha_pago_nomina", "tipo_pago"]].copy()
+            tmp["tipo_pago"] = tmp["tipo_pago"].astype(str).str.upper().str.strip().replace({"": "NOMINA"})
+            tmp = tmp[tmp["tipo_pago"] == "NOMINA"]
+        else:
+            tmp = pagos_df[["loan_id", "fecha_pago_nomina"]].copy()
+        tmp["loan_id"] = tmp["loan_id"].astype(str).str.strip()
+        tmp["fecha_pago_nomina"] = pd.to_datetime(tmp["fecha_pago_nomina"], errors="coerce").dt.normalize()
+        tmp = tmp.dropna(subset=["loan_id", "fecha_pago_nomina"])
+        return set(zip(tmp["loan_id"], tmp["fecha_pago_nomina"]))
+    except Exception:
+        return set()
+
+
+def aplicar_descuentos_prestamos_lote(
+    prestamos_df: pd.DataFrame,
+    pagos_df: pd.DataFrame,
+    employee_ids,
+    employee_names,
+    max_descuento_centavos,
+    fecha_pago,
+    quincena_inicio=None,
+    quincena_fin=None,
+):
+    """
+    Aplica el descuento de préstamos de todos los empleados de una nómina en una sola pasada.
+    Por empleado: préstamos ACTIVO con saldo y fecha_inicio <= fecha_pago, del más antiguo al más
+    nuevo; cada cuota se capea al saldo y a lo que quede del máximo del empleado, y no se repite
+    un loan_id ya descontado en esa fecha de nómina.
+    Modifica `prestamos_df` en memoria (sin guardar).
+
+    Args:
+        employee_ids, employee_names, max_descuento_centavos: un valor por empleado (máximo None = sin tope)
+        quincena_inicio, quincena_fin: un valor común o uno por empleado
+
+    Returns:
+        (descuentos_centavos, saldos_centavos, pagos_df_actualizado); los arreglos int64 van
+        alineados con `employee_ids` y el saldo es el total ACTIVO/PAUSADO tras el descuento.
+    """
+    ids = [normalizar_id(x) or "" for x in employee_ids]
+    n = len(ids)
+    descuentos = np.zeros(n, dtype=np.int64)
+    saldos = np.zeros(n, dtype=np.int64)
+
+    fecha_pago_dt = pd.to_datetime(fecha_pago, errors="coerce")
+    if n == 0 or pd.isna(fecha_pago_dt):
+        return descuentos, saldos, pagos_df
+    fecha_pago_key = fecha_pago_dt.normalize()
+
+    nombres = [x.strip() if isinstance(x, str) else "" for x in _por_empleado(employee_names, n)]
+    topes = [10**18 if m is None or pd.isna(m) else int(m) for m in _por_empleado(max_descuento_centavos, n)]
+    quincenas_inicio = pd.to_datetime(pd.Series(_por_empleado(quincena_inicio, n), dtype=object), errors="coerce")
+    quincenas_fin = pd.to_datetime(pd.Series(_por_empleado(quincena_fin, n), dtype=object), errors="coerce")
+
+    # Estado de los préstamos en arreglos (se escribe de vuelta al final)
+    loan_ids = prestamos_df["loan_id"].astype(str).str.strip().to_numpy()
+    prestamo_emp = normalizar_ids(prestamos_df["employee_id"]).fillna("").to_numpy()
+    estados = prestamos_df["estado"].astype(str).str.upper().str.strip().to_numpy()
+    saldo = pd.to_numeric(prestamos_df["saldo_centavos"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    cuota = pd.to_numeric(prestamos_df["cuota_quincenal_centavos"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    nombres_prestamo = prestamos_df["employee_name"].astype(str).str.strip().to_numpy(dtype=object)
+    fecha_inicio = pd.to_datetime(prestamos_df["fecha_inicio"], errors="coerce")
+
+    abierto = np.isin(estados, ["ACTIVO", "PAUSADO"])
+    saldo_empleado = pd.Series(saldo[abierto]).groupby(prestamo_emp[abierto]).sum().to_dict()
+
+    # Préstamos descontables, en orden de cobro, agrupados por empleado
+    elegibles = (
+        pd.Series(prestamo_emp).isin(set(ids)).to_numpy()
+        & (estados == "ACTIVO")
+        & (saldo > 0)
+        & fecha_inicio.notna().to_numpy()
+        & (fecha_inicio <= fecha_pago_dt).to_numpy()
+    )
+    orden = pd.DataFrame({
+        "fila": np.flatnonzero(elegibles),
+        "fecha_inicio": fecha_inicio.to_numpy()[elegibles],
+        "creado_en": pd.to_datetime(prestamos_df["creado_en"], errors="coerce").to_numpy()[elegibles],
+    }).sort_values(["fecha_inicio", "creado_en"], na_position="last", kind="mergesort")
+    prestamos_por_empleado = {}
+    for fila in orden["fila"]:
+        prestamos_por_empleado.setdefault(prestamo_emp[fila], []).append(fila)
+    filas_por_loan = pd.Series(np.arange(len(loan_ids))).groupby(loan_ids).indices if len(loan_ids) else {}
+
+    existing_keys = _claves_pagos_nomina(pagos_df)
+    now_ts = pd.Timestamp(datetime.now())
+    nuevos_pagos = []
+    filas_saldo, filas_cerradas, filas_nombre = set(), set(), set()
+
+    for i, employee_id_str in enumerate(ids):
+        disponible = topes[i]
+        descuento_total = 0
+        for fila in prestamos_por_empleado.get(employee_id_str, ()):
+            if disponible <= 0:
+                break
+            loan_id = loan_ids[fila]
+            if (loan_id, fecha_pago_key) in existing_keys:
+                # Ya se registró un pago para este préstamo en esta fecha de nómina
+                continue
+            if saldo[fila] <= 0 or cuota[fila] <= 0:
+                continue
+            pagar = int(min(cuota[fila], saldo[fila], disponible))
+
+            # Actualizar todas las filas del préstamo
+            filas = filas_por_loan[loan_id]
+            saldo_antes = int(saldo[filas[0]])
+            saldo_despues = max(0, saldo_antes - pagar)
+            for f in filas:
+                if abierto[f]:
+                    saldo_empleado[prestamo_emp[f]] -= int(saldo[f]) - saldo_despues
+            saldo[filas] = saldo_despues
+            filas_saldo.update(filas)
+            if saldo_despues == 0:
+                estados[filas] = "CERRADO"
+                filas_cerradas.update(filas)
+            if nombres[i] and (nombres_prestamo[filas] == "").any():
+                nombres_prestamo[filas] = nombres[i]
+                filas_nombre.update(filas)
+
+            payment_id = f"PM-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}"
+            nuevos_pagos.append(
+                {
+                    "payment_id": payment_id,
+                    "loan_id": loan_id,
+                    "employee_id": employee_id_str,
+                    "tipo_pago": "NOMINA",
+                    "fecha_pago_nomina": fecha_pago_dt,
+                    "quincena_inicio": quincenas_inicio.iloc[i],
+                    "quincena_fin": quincenas_fin.iloc[i],
+                    "monto_pagado_centavos": pagar,
+                    "saldo_antes_centavos": saldo_antes,
+                    "saldo_despues_centavos": int(saldo_despues),
+                    "nota": "",
+                    "creado_en": now_ts,
+                }
+            )
+            existing_keys.add((loan_id, fecha_pago_key))
+            descuento_total += pagar
+            disponible -= pagar
+
+        descuentos[i] = descuento_total
+        saldos[i] = int(saldo_empleado.get(employee_id_str, 0))
+
+    for columna, filas, valores in (
+        ("saldo_centavos", filas_saldo, saldo),
+        ("estado", filas_cerradas, estados),
+        ("employee_name", filas_nombre, nombres_prestamo),
+    ):
+        if filas:
+            filas = sorted(filas)
+            prestamos_df.loc[prestamos_df.index[filas], columna] = valores[filas]
+
+    if nuevos_pagos:
+        pagos_df = pd.concat([pagos_df, pd.DataFrame(nuevos_pagos)], ignore_index=True)
+
+    return descuentos, saldos, pagos_df
+
+
 def aplicar_descuento_prestamos_en_memoria(
     prestamos_df: pd.DataFrame,
     pagos_df: pd.DataFrame,
@@ -413,134 +689,78 @@ def aplicar_descuento_prestamos_en_memoria(
     """
     Aplica el descuento de préstamos (si existen) para un empleado.
     Modifica `prestamos_df` y `pagos_df` en memoria (sin guardar).
+    Para una nómina completa usar `aplicar_descuentos_prestamos_lote`.
 
     Returns:
         (descuento_total_centavos, saldo_total_centavos, pagos_df_actualizado)
     """
-    employee_id_str = str(employee_id).strip()
-    employee_name = (employee_name or "").strip()
+    descuentos, saldos, pagos_df = aplicar_descuentos_prestamos_lote(
+        prestamos_df,
+        pagos_df,
+        [employee_id],
+        [employee_name],
+        [max_descuento_centavos],
+        fecha_pago,
+        quincena_inicio,
+        quincena_fin,
+    )
+    return int(descuentos[0]), int(saldos[0]), pagos_df
+
+
+def revertir_descuentos_nomina(prestamos_df: pd.DataFrame, pagos_df: pd.DataFrame, employee_ids, fecha_pago):
+    """
+    Deshace en memoria los descuentos tipo NOMINA de esos empleados en esa fecha de pago, para
+    volver a aplicarlos tras un recálculo (aplicar + revertir + aplicar = un solo descuento).
+    Un pago solo se revierte si el préstamo sigue como lo dejó (saldo igual a su saldo_despues
+    y sin pagos posteriores); si no, se conserva y su monto se informa por empleado.
+    Modifica `prestamos_df` en memoria (sin guardar).
 
+    Returns:
+        (pagos_df_actualizado, conservados) con conservados = {employee_id: centavos}
+    """
+    conservados = {}
     fecha_pago_dt = pd.to_datetime(fecha_pago, errors="coerce")
-    if pd.isna(fecha_pago_dt):
-        return 0, 0, pagos_df
-
-    quincena_inicio_dt = pd.to_datetime(quincena_inicio, errors="coerce") if quincena_inicio is not None else pd.NaT
-    quincena_fin_dt = pd.to_datetime(quincena_fin, errors="coerce") if quincena_fin is not None else pd.NaT
-
-    df_emp = prestamos_df[
-        (prestamos_df["employee_id"].astype(str).str.strip() == employee_id_str)
-        & (prestamos_df["estado"].astype(str).str.upper().str.strip() == "ACTIVO")
-        & (prestamos_df["saldo_centavos"] > 0)
-    ].copy()
-
-    if df_emp.empty:
-        saldo_total = prestamos_df[
-            (prestamos_df["employee_id"].astype(str).str.strip() == employee_id_str)
-            & (prestamos_df["estado"].astype(str).str.upper().str.strip().isin(["ACTIVO", "PAUSADO"]))
-        ]["saldo_centavos"].sum()
-        return 0, int(saldo_total) if pd.notna(saldo_total) else 0, pagos_df
-
-    # Solo préstamos cuya fecha_inicio sea <= fecha_pago
-    df_emp["fecha_inicio"] = pd.to_datetime(df_emp["fecha_inicio"], errors="coerce")
-    df_emp = df_emp[df_emp["fecha_inicio"].notna() & (df_emp["fecha_inicio"] <= fecha_pago_dt)]
-    if df_emp.empty:
-        saldo_total = prestamos_df[
-            (prestamos_df["employee_id"].astype(str).str.strip() == employee_id_str)
-            & (prestamos_df["estado"].astype(str).str.upper().str.strip().isin(["ACTIVO", "PAUSADO"]))
-        ]["saldo_centavos"].sum()
-        return 0, int(saldo_total) if pd.notna(saldo_total) else 0, pagos_df
-
-    df_emp = df_emp.sort_values(["fecha_inicio", "creado_en"], na_position="last")
-
-    disponible = int(max_descuento_centavos) if max_descuento_centavos is not None else 10**18
-    descuento_total = 0
-    now_ts = pd.Timestamp(datetime.now())
-    nuevos_pagos = []
-
-    # Evitar doble descuento NOMINA si se recalcula la misma quincena (idempotencia por loan_id + fecha_pago_nomina)
-    existing_keys = set()
-    try:
+    if pagos_df is None or pagos_df.empty or prestamos_df.empty or pd.isna(fecha_pago_dt):
+        return pagos_df, conservados
+    ids = {normalizar_id(x) for x in employee_ids} - {None}
+
+    tipos = pagos_df["tipo_pago"].astype(str).str.upper().str.strip().replace({"": "NOMINA"})
+    pagos_loan = pagos_df["loan_id"].astype(str).str.strip()
+    pagos_emp = normalizar_ids(pagos_df["employee_id"])
+    creado = pd.to_datetime(pagos_df["creado_en"], errors="coerce")
+    fechas = pd.to_datetime(pagos_df["fecha_pago_nomina"], errors="coerce").dt.normalize()
+    objetivo = (tipos == "NOMINA") & (fechas == fecha_pago_dt.normalize()) & pagos_emp.isin(ids)
+    prestamo_loan = prestamos_df["loan_id"].astype(str).str.strip()
+    saldos = pd.to_numeric(prestamos_df["saldo_centavos"], errors="coerce").fillna(0)
+
+    quitar = []
+    # Del más reciente al más antiguo: cada reversión deja el saldo como estaba antes del pago
+    for idx in creado[objetivo].sort_values(ascending=False, na_position="first").index:
+        loan_id = pagos_loan[idx]
+        monto = int(pagos_df.at[idx, "monto_pagado_centavos"])
+        filas = prestamo_loan == loan_id
+        posteriores = (pagos_loan == loan_id) & (creado > creado[idx]) & ~pagos_df.index.isin(quitar)
         if (
-            pagos_df is not None
-            and (not pagos_df.empty)
-            and ("loan_id" in pagos_df.columns)
-            and ("fecha_pago_nomina" in pagos_df.columns)
+            not filas.any()
+            or posteriores.any()
+            or (saldos[filas] != int(pagos_df.at[idx, "saldo_despues_centavos"])).any()
         ):
-            # Solo bloquear duplicados de pagos tipo NOMINA
-            if "tipo_pago" in pagos_df.columns:
-                tmp = pagos_df[["loan_id", "fecha_pago_nomina", "tipo_pago"]].copy()
-                tmp["tipo_pago"] = tmp["tipo_pago"].astype(str).str.upper().str.strip().replace({"": "NOMINA"})
-                tmp = tmp[tmp["tipo_pago"] == "NOMINA"]
-            else:
-                tmp = pagos_df[["loan_id", "fecha_pago_nomina"]].copy()
-            tmp["loan_id"] = tmp["loan_id"].astype(str).str.strip()
-            tmp["fecha_pago_nomina"] = pd.to_datetime(tmp["fecha_pago_nomina"], errors="coerce").dt.normalize()
-            tmp = tmp.dropna(subset=["loan_id", "fecha_pago_nomina"])
-            existing_keys = set(zip(tmp["loan_id"], tmp["fecha_pago_nomina"].astype("datetime64[ns]")))
-    except Exception:
-        existing_keys = set()
-    fecha_pago_key = fecha_pago_dt.normalize().to_datetime64()
-
-    for _, loan in df_emp.iterrows():
-        if disponible <= 0:
-            break
-
-        loan_id = str(loan["loan_id"]).strip()
-        if (loan_id, fecha_pago_key) in existing_keys:
-            # Ya se registró un pago para este préstamo en esta fecha de nómina
+            conservados[pagos_emp[idx]] = conservados.get(pagos_emp[idx], 0) + monto
             continue
-        saldo = int(loan["saldo_centavos"]) if pd.notna(loan["saldo_centavos"]) else 0
-        cuota = int(loan["cuota_quincenal_centavos"]) if pd.notna(loan["cuota_quincenal_centavos"]) else 0
-        if saldo <= 0 or cuota <= 0:
-            continue
-
-        pagar = min(cuota, saldo, disponible)
-        if pagar <= 0:
-            continue
-
-        # Actualizar préstamo en DF principal
-        mask = prestamos_df["loan_id"].astype(str).str.strip() == loan_id
-        saldo_antes = int(prestamos_df.loc[mask, "saldo_centavos"].iloc[0])
-        saldo_despues = max(0, saldo_antes - pagar)
-        prestamos_df.loc[mask, "saldo_centavos"] = saldo_despues
-        if saldo_despues == 0:
-            prestamos_df.loc[mask, "estado"] = "CERRADO"
-        if employee_name and (prestamos_df.loc[mask, "employee_name"].astype(str).str.strip() == "").any():
-            prestamos_df.loc[mask, "employee_name"] = employee_name
-
-        payment_id = f"PM-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}"
-        nuevos_pagos.append(
-            {
-                "payment_id": payment_id,
-                "loan_id": loan_id,
-                "employee_id": employee_id_str,
-                "tipo_pago": "NOMINA",
-                "fecha_pago_nomina": fecha_pago_dt,
-                "quincena_inicio": quincena_inicio_dt,
-                "quincena_fin": quincena_fin_dt,
-                "monto_pagado_centavos": int(pagar),
-                "saldo_antes_centavos": int(saldo_antes),
-                "saldo_despues_centavos": int(saldo_despues),
-                "nota": "",
-                "creado_en": now_ts,
-            }
-        )
-        existing_keys.add((loan_id, fecha_pago_key))
+        saldo_antes = int(pagos_df.at[idx, "saldo_antes_centavos"])
+        prestamos_df.loc[filas, "saldo_centavos"] = saldo_antes
+        saldos[filas] = saldo_antes
+        cerrados = filas & (prestamos_df["estado"].astype(str).str.upper().str.strip() == "CERRADO")
+        if saldo_antes > 0 and cerrados.any():
+            prestamos_df.loc[cerrados, "estado"] = "ACTIVO"
+        quitar.append(idx)
 
-        descuento_total += pagar
-        disponible -= pagar
-
-    if nuevos_pagos:
-        pagos_df = pd.concat([pagos_df, pd.DataFrame(nuevos_pagos)], ignore_index=True)
-
-    saldo_total = prestamos_df[
-        (prestamos_df["employee_id"].astype(str).str.strip() == employee_id_str)
-        & (prestamos_df["estado"].astype(str).str.upper().str.strip().isin(["ACTIVO", "PAUSADO"]))
-    ]["saldo_centavos"].sum()
-
-    return int(descuento_total), int(saldo_total) if pd.notna(saldo_total) else 0, pagos_df
+    if quitar:
+        pagos_df = pagos_df.drop(index=quitar).reset_index(drop=True)
+    return pagos_df, conservados
 
 
+@perfilable()
 def registrar_pago_manual_prestamo(
     loan_id: str,
     monto,
@@ -554,56 +774,54 @@ def registrar_pago_manual_prestamo(
       - Registra en 'PagosPrestamo' con tipo_pago='MANUAL'
       - Cierra el préstamo si llega a 0
     """
-    prestamos_df, pagos_df = leer_prestamos(prestamos_file)
     loan_id = str(loan_id).strip()
 
-    mask = prestamos_df["loan_id"].astype(str).str.strip() == loan_id
-    if not mask.any():
-        raise ValueError(f"No se encontró el préstamo con loan_id={loan_id}")
-
-    estado = str(prestamos_df.loc[mask, "estado"].iloc[0]).strip().upper()
-    saldo_antes = int(prestamos_df.loc[mask, "saldo_centavos"].iloc[0])
-    if saldo_antes <= 0:
-        raise ValueError("Este préstamo ya no tiene saldo.")
-    if estado == "CERRADO":
-        raise ValueError("Este préstamo está cerrado.")
-
     monto_cent = _money_to_cents(monto)
-    if monto_cent <= 0:
-        raise ValueError("El monto del pago debe ser mayor a 0")
-    if monto_cent > saldo_antes:
-        raise ValueError("El monto del pago no puede ser mayor al saldo pendiente")
-
     fecha_pago_dt = pd.to_datetime(fecha_pago, errors="coerce") if fecha_pago is not None else pd.Timestamp(datetime.now().date())
-    if pd.isna(fecha_pago_dt):
-        raise ValueError("Fecha de pago inválida")
-
-    saldo_despues = saldo_antes - monto_cent
-    prestamos_df.loc[mask, "saldo_centavos"] = saldo_despues
-    if saldo_despues == 0:
-        prestamos_df.loc[mask, "estado"] = "CERRADO"
 
-    employee_id = str(prestamos_df.loc[mask, "employee_id"].iloc[0]).strip()
+    def calcular(prestamo: dict):
+        # Se valida contra el saldo leído en la misma transacción que guarda el pago
+        estado = str(prestamo["estado"]).strip().upper()
+        saldo_antes = int(prestamo["saldo_centavos"])
+        if saldo_antes <= 0:
+            raise ValueError("Este préstamo ya no tiene saldo.")
+        if estado == "CERRADO":
+            raise ValueError("Este préstamo está cerrado.")
+
+        if monto_cent <= 0:
+            raise ValueError("El monto del pago debe ser mayor a 0")
+        if monto_cent > saldo_antes:
+            raise ValueError("El monto del pago no puede ser mayor al saldo pendiente")
+
+        if pd.isna(fecha_pago_dt):
+            raise ValueError("Fecha de pago inválida")
+
+        saldo_despues = saldo_antes - monto_cent
+        cambios = {"saldo_centavos": saldo_despues}
+        if saldo_despues == 0:
+            cambios["estado"] = "CERRADO"
 
-    payment_id = f"PM-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}"
-    now_ts = pd.Timestamp(datetime.now())
-    nuevo_pago = {
-        "payment_id": payment_id,
-        "loan_id": loan_id,
-        "employee_id": employee_id,
-        "tipo_pago": "MANUAL",
-        "fecha_pago_nomina": fecha_pago_dt,
-        "quincena_inicio": pd.NaT,
-        "quincena_fin": pd.NaT,
-        "monto_pagado_centavos": int(monto_cent),
-        "saldo_antes_centavos": int(saldo_antes),
-        "saldo_despues_centavos": int(saldo_despues),
-        "nota": (nota or "").strip(),
-        "creado_en": now_ts,
-    }
+        payment_id = f"PM-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}"
+        now_ts = pd.Timestamp(datetime.now())
+        nuevo_pago = {
+            "payment_id": payment_id,
+            "loan_id": loan_id,
+            "employee_id": str(prestamo["employee_id"]).strip(),
+            "tipo_pago": "MANUAL",
+            "fecha_pago_nomina": fecha_pago_dt,
+            "quincena_inicio": pd.NaT,
+            "quincena_fin": pd.NaT,
+            "monto_pagado_centavos": int(monto_cent),
+            "saldo_antes_centavos": int(saldo_antes),
+            "saldo_despues_centavos": int(saldo_despues),
+            "nota": (nota or "").strip(),
+            "creado_en": now_ts,
+        }
+        return cambios, nuevo_pago
 
-    pagos_df = pd.concat([pagos_df, pd.DataFrame([nuevo_pago])], ignore_index=True)
-    guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
+    ensure_prestamos_file(prestamos_file)
+    if almacen_para(prestamos_file).registrar_pago_prestamo(loan_id, calcular) is None:
+        raise ValueError(f"No se encontró el préstamo con loan_id={loan_id}")
 
 feriados_panama = {
     2026: {
@@ -755,18 +973,8 @@ def leer_reporte_asistencia(archivo=None):
         result_df['nombre'] = (df['First Name'].astype(str).str.strip() + ' ' + 
                               df['Last Name'].astype(str).str.strip()).str.strip()
         
-        # ID - normalizar: convertir a string y eliminar espacios
-        # Si el ID es un número float (ej: 170660927.0), convertirlo a int primero
-        def normalizar_id(id_val):
-            if pd.isna(id_val):
-                return None
-            # Si es float y es entero, convertir a int
-            if isinstance(id_val, float) and id_val.is_integer():
-                return str(int(id_val))
-            # Convertir a string y limpiar
-            return str(id_val).strip()
-        
-        result_df['ID'] = df['ID'].apply(normalizar_id)
+        # ID - normalizar: string sin espacios (170660927.0 -> "170660927")
+        result_df['ID'] = normalizar_ids(df['ID']).to_numpy()
         
         # Fecha - convertir a datetime
         result_df['fecha'] = pd.to_datetime(df['Date'], errors='coerce')
@@ -807,12 +1015,12 @@ def leer_reporte_asistencia(archivo=None):
         # Resetear índice
         result_df = result_df.reset_index(drop=True)
         
-        print(f"[OK] Archivo de asistencia leído: {len(result_df)} registros procesados")
+        _informar(f"[OK] Archivo de asistencia leído: {len(result_df)} registros procesados")
         
         return result_df
         
     except Exception as e:
-        print(f"[ERROR] Error al leer el archivo de asistencia: {e}")
+        _informar(f"[ERROR] Error al leer el archivo de asistencia: {e}")
         raise
 
 
@@ -832,7 +1040,7 @@ def validate_attendance_records(hours_df, security_ids=None):
     
     # Agrupar por empleado (usando ID) y fecha
     for (employee_id, date), group in hours_df.groupby(['ID', 'fecha']):
-        employee_id_str = str(employee_id).strip()
+        employee_id_str = normalizar_id(employee_id)
         record_count = len(group)
         employee_name = group['nombre'].iloc[0]
 
@@ -852,8 +1060,8 @@ def validate_attendance_records(hours_df, security_ids=None):
 
     # Validación adicional para seguridad: cantidad de registros por empleado debe ser par
     if security_ids:
-        for employee_id, group in hours_df.groupby(["ID"]):
-            employee_id_str = str(employee_id).strip()
+        for employee_id, group in hours_df.groupby("ID"):
+            employee_id_str = normalizar_id(employee_id)
             if employee_id_str not in security_ids:
                 continue
             count = len(group)
@@ -1042,7 +1250,7 @@ def calculate_hours_per_day(hours_df):
             
             # Validar que las horas sean razonables (entre 1 y 16 horas por día)
             if horas_trabajadas < 1 or horas_trabajadas > 16:
-                print(f"[ADVERTENCIA] Horas calculadas para {employee_name} el {date} parecen incorrectas: {horas_trabajadas:.2f} horas")
+                _informar(f"[ADVERTENCIA] Horas calculadas para {employee_name} el {date} parecen incorrectas: {horas_trabajadas:.2f} horas")
             
             # Verificar si es feriado o domingo
             es_feriado_domingo = es_feriado_o_domingo(date)
@@ -1070,6 +1278,8 @@ def calculate_hours_per_day_security(hours_df, security_ids, security_config):
       se ajusta a la hora programada.
     - Horas extra: mismas reglas que 'por horas' (después de 15:00 o 12:00 sábado). Si la entrada es después del límite,
       todas las horas cuentan como extra.
+    - `security_config` puede ser la tabla de `cargar_seguridad_config` (cada turno usa la configuración
+      vigente en su fecha de entrada) o un dict con una sola configuración.
 
     Returns:
         DataFrame con columnas compatibles con el resto:
@@ -1104,22 +1314,21 @@ def calculate_hours_per_day_security(hours_df, security_ids, security_config):
     if df.empty:
         return pd.DataFrame(columns=["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "es_seguridad", "turno_seguridad"])
 
-    df["ID_str"] = df["ID"].astype(str).str.strip()
+    df["ID_str"] = normalizar_ids(df["ID"])
     df = df[df["ID_str"].isin(security_ids)].copy()
     if df.empty:
         return pd.DataFrame(columns=["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "es_seguridad", "turno_seguridad"])
 
-    horas_turno = int(security_config.get("horas_turno", 12) or 12)
-    margen_min = int(security_config.get("margen_salida_minutos", 10) or 10)
-    tolerancia_min = int(security_config.get("tolerancia_turno_minutos", 30) or 30)
-    hora_cambio = str(security_config.get("hora_cambio_turno", "07:00") or "07:00").strip()
-    try:
-        cambio_h, cambio_m = [int(x) for x in hora_cambio.split(":")]
-    except Exception:
-        cambio_h, cambio_m = 7, 0
-
-    daily_rows = []
+    # Configuración: tabla con vigencias (cargar_seguridad_config) o un dict único (compatibilidad)
+    if isinstance(security_config, pd.DataFrame):
+        config_tabla = security_config
+    else:
+        config_tabla = _normalizar_tabla_seguridad(
+            pd.DataFrame([{**(security_config or {}), "vigente_desde": pd.Timestamp("1900-01-01")}])
+        )
 
+    # Emparejar registros consecutivos (entrada/salida) por empleado
+    pares = []
     for employee_id, g in df.groupby("ID"):
         g = g.sort_values(["fecha", "hora"]).copy()
         # Construir timestamp real combinando fecha + hora (24h)
@@ -1128,75 +1337,95 @@ def calculate_hours_per_day_security(hours_df, security_ids, security_config):
         stamps = list(g["timestamp"])
         name = g["nombre"].iloc[0] if "nombre" in g.columns and not g.empty else ""
 
-        # Emparejar consecutivos
         for i in range(0, len(stamps) - 1, 2):
             entrada_dt = stamps[i]
             salida_dt = stamps[i + 1]
             # Si salida es antes, forzar al día siguiente (por seguridad)
             if salida_dt < entrada_dt:
                 salida_dt = salida_dt + timedelta(days=1)
+            pares.append((employee_id, name, entrada_dt, salida_dt))
 
-            duracion_real_min = (salida_dt - entrada_dt).total_seconds() / 60.0
-            expected_min = horas_turno * 60.0
-            diff_min = duracion_real_min - expected_min
-            dentro_tolerancia = abs(diff_min) <= float(tolerancia_min)
-            alerta = ""
-            if not dentro_tolerancia:
-                alerta = (
-                    f"Revisar marcas: duración real {duracion_real_min/60.0:.2f}h "
-                    f"(dif {diff_min:+.0f} min) vs turno {horas_turno}h ±{tolerancia_min}min"
-                )
+    if not pares:
+        return pd.DataFrame(columns=["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "es_seguridad", "turno_seguridad"])
 
-            # Determinar inicio programado más cercano al timestamp de entrada
-            base = datetime.combine(entrada_dt.date(), datetime.min.time().replace(hour=cambio_h, minute=cambio_m))
-            candidates = [base - timedelta(hours=horas_turno), base, base + timedelta(hours=horas_turno)]
-            start_sched = min(candidates, key=lambda d: abs((entrada_dt - d).total_seconds()))
-            end_sched = start_sched + timedelta(hours=horas_turno)
+    # Cada turno usa la configuración vigente en su fecha de entrada
+    configs = resolver_seguridad_config(
+        [pd.Timestamp(entrada_dt.date()) for _, _, entrada_dt, _ in pares],
+        config_tabla,
+    )
 
-            # Margen de salida +/- X min alrededor de salida programada
-            if abs((salida_dt - end_sched).total_seconds()) <= margen_min * 60:
-                salida_dt_ajustada = end_sched
-            else:
-                salida_dt_ajustada = salida_dt
+    daily_rows = []
+
+    for (employee_id, name, entrada_dt, salida_dt), cfg in zip(pares, configs.itertuples(index=False)):
+        horas_turno = int(cfg.horas_turno)
+        margen_min = int(cfg.margen_salida_minutos)
+        tolerancia_min = int(cfg.tolerancia_turno_minutos)
+        try:
+            cambio_h, cambio_m = [int(x) for x in str(cfg.hora_cambio_turno).strip().split(":")]
+        except Exception:
+            cambio_h, cambio_m = 7, 0
+
+        duracion_real_min = (salida_dt - entrada_dt).total_seconds() / 60.0
+        expected_min = horas_turno * 60.0
+        diff_min = duracion_real_min - expected_min
+        dentro_tolerancia = abs(diff_min) <= float(tolerancia_min)
+        alerta = ""
+        if not dentro_tolerancia:
+            alerta = (
+                f"Revisar marcas: duración real {duracion_real_min/60.0:.2f}h "
+                f"(dif {diff_min:+.0f} min) vs turno {horas_turno}h ±{tolerancia_min}min"
+            )
+
+        # Determinar inicio programado más cercano al timestamp de entrada
+        base = datetime.combine(entrada_dt.date(), datetime.min.time().replace(hour=cambio_h, minute=cambio_m))
+        candidates = [base - timedelta(hours=horas_turno), base, base + timedelta(hours=horas_turno)]
+        start_sched = min(candidates, key=lambda d: abs((entrada_dt - d).total_seconds()))
+        end_sched = start_sched + timedelta(hours=horas_turno)
+
+        # Margen de salida +/- X min alrededor de salida programada
+        if abs((salida_dt - end_sched).total_seconds()) <= margen_min * 60:
+            salida_dt_ajustada = end_sched
+        else:
+            salida_dt_ajustada = salida_dt
 
-            # Turno
-            turno = "Día" if (start_sched.time().hour == cambio_h and start_sched.time().minute == cambio_m) else "Noche"
+        # Turno
+        turno = "Día" if (start_sched.time().hour == cambio_h and start_sched.time().minute == cambio_m) else "Noche"
 
-            # Horas trabajadas: turno fijo
-            horas_trabajadas = float(horas_turno)
+        # Horas trabajadas: turno fijo
+        horas_trabajadas = float(horas_turno)
 
-            # Horas extra (misma lógica que por hora actual)
-            work_date = entrada_dt.date()
-            es_sabado = datetime.combine(work_date, datetime.min.time()).weekday() == 5
-            hora_limite_extra = 12 if es_sabado else 15
-            if entrada_dt.hour > hora_limite_extra or (entrada_dt.hour == hora_limite_extra and entrada_dt.minute > 10):
-                horas_extra = horas_trabajadas
+        # Horas extra (misma lógica que por hora actual)
+        work_date = entrada_dt.date()
+        es_sabado = datetime.combine(work_date, datetime.min.time()).weekday() == 5
+        hora_limite_extra = 12 if es_sabado else 15
+        if entrada_dt.hour > hora_limite_extra or (entrada_dt.hour == hora_limite_extra and entrada_dt.minute > 10):
+            horas_extra = horas_trabajadas
+        else:
+            # Aproximación simple: si la "salida" (ajustada) pasa el límite, lo que excede cuenta como extra
+            limite_dt = datetime.combine(work_date, datetime.min.time().replace(hour=hora_limite_extra, minute=0))
+            # Si el turno cruza medianoche, mantenemos el criterio histórico: si la entrada es después del límite, todo es extra.
+            if salida_dt_ajustada <= limite_dt:
+                horas_extra = 0.0
             else:
-                # Aproximación simple: si la "salida" (ajustada) pasa el límite, lo que excede cuenta como extra
-                limite_dt = datetime.combine(work_date, datetime.min.time().replace(hour=hora_limite_extra, minute=0))
-                # Si el turno cruza medianoche, mantenemos el criterio histórico: si la entrada es después del límite, todo es extra.
-                if salida_dt_ajustada <= limite_dt:
-                    horas_extra = 0.0
-                else:
-                    horas_extra = (salida_dt_ajustada - max(entrada_dt, limite_dt)).total_seconds() / 3600.0
-                    # No exceder horas totales
-                    horas_extra = max(0.0, min(horas_trabajadas, horas_extra))
-
-            es_feriado_domingo = es_feriado_o_domingo(pd.Timestamp(work_date))
-
-            daily_rows.append({
-                "ID": employee_id,
-                "nombre": name,
-                "fecha": pd.Timestamp(work_date),
-                "horas_trabajadas": horas_trabajadas,
-                "horas_extra": float(horas_extra),
-                "es_feriado_domingo": bool(es_feriado_domingo),
-                "es_seguridad": True,
-                "turno_seguridad": turno,
-                "horas_reales_seguridad": round(duracion_real_min / 60.0, 2),
-                "diferencia_turno_seguridad_min": int(round(diff_min)),
-                "alerta_seguridad": alerta,
-            })
+                horas_extra = (salida_dt_ajustada - max(entrada_dt, limite_dt)).total_seconds() / 3600.0
+                # No exceder horas totales
+                horas_extra = max(0.0, min(horas_trabajadas, horas_extra))
+
+        es_feriado_domingo = es_feriado_o_domingo(pd.Timestamp(work_date))
+
+        daily_rows.append({
+            "ID": employee_id,
+            "nombre": name,
+            "fecha": pd.Timestamp(work_date),
+            "horas_trabajadas": horas_trabajadas,
+            "horas_extra": float(horas_extra),
+            "es_feriado_domingo": bool(es_feriado_domingo),
+            "es_seguridad": True,
+            "turno_seguridad": turno,
+            "horas_reales_seguridad": round(duracion_real_min / 60.0, 2),
+            "diferencia_turno_seguridad_min": int(round(diff_min)),
+            "alerta_seguridad": alerta,
+        })
 
     return pd.DataFrame(daily_rows)
 
@@ -1208,7 +1437,8 @@ def calculate_hours_per_day_mixed(hours_df, security_ids=None, security_config=N
     - Seguridad: empareja registros consecutivos (permite cruzar medianoche)
     """
     security_ids = set(str(x).strip() for x in security_ids) if security_ids else set()
-    security_config = security_config or {"horas_turno": 12, "hora_cambio_turno": "07:00", "margen_salida_minutos": 10}
+    if security_config is None:
+        security_config = dict(_SEGURIDAD_CONFIG_DEFAULTS)
 
     if not security_ids:
         df = calculate_hours_per_day(hours_df)
@@ -1219,7 +1449,7 @@ def calculate_hours_per_day_mixed(hours_df, security_ids=None, security_config=N
 
     # Separar
     tmp = hours_df.copy()
-    tmp["ID_str"] = tmp["ID"].astype(str).str.strip()
+    tmp["ID_str"] = normalizar_ids(tmp["ID"])
     df_sec = tmp[tmp["ID_str"].isin(security_ids)].copy()
     df_non = tmp[~tmp["ID_str"].isin(security_ids)].copy()
 
@@ -1277,6 +1507,27 @@ def get_quincena_periods(daily_hours_df):
     return daily_hours_df
 
 
+def _horas_manuales_por_tipo(manual_hours_df):
+    """
+    Convierte en bloque las columnas de horas manuales a float (inválidos = 0, negativos = 0).
+
+    Returns:
+        (validos, horas_normales, horas_extra, horas_feriado_domingo) como arrays de numpy
+    """
+    df = manual_hours_df
+
+    def horas_columna(col):
+        if col not in df.columns:
+            return np.zeros(len(df), dtype=float)
+        return pd.to_numeric(df[col], errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy(dtype=float)
+
+    validos = df["ID"].notna().to_numpy()
+    hn = horas_columna("horas_normales")
+    he = horas_columna("horas_extra")
+    h_fd = horas_columna("horas_domingo") + horas_columna("horas_feriado")  # feriado y domingo se pagan igual (50% adicional)
+    return validos, hn, he, h_fd
+
+
 def manual_hours_to_daily_df(manual_hours_df, quincena_inicio_target, quincena_fin_target):
     """
     Convierte un DataFrame de horas manuales (por empleado y tipo) al formato
@@ -1293,575 +1544,1652 @@ def manual_hours_to_daily_df(manual_hours_df, quincena_inicio_target, quincena_f
     Se generan filas sintéticas para que el cálculo de nómina aplique las mismas
     reglas (normales, extra, feriado/domingo).
     """
+    columnas = ["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "quincena_inicio", "quincena_fin"]
     if manual_hours_df is None or manual_hours_df.empty:
-        return pd.DataFrame(columns=["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "quincena_inicio", "quincena_fin"])
-    
-    def safe_float(val, default=0.0):
-        if val is None or (isinstance(val, float) and pd.isna(val)):
-            return default
-        try:
-            return float(val)
-        except (TypeError, ValueError):
-            return default
-    
-    rows = []
-    for _, row in manual_hours_df.iterrows():
-        emp_id = row.get("ID")
-        nombre = row.get("nombre", "")
-        if pd.isna(emp_id):
+        return pd.DataFrame(columns=columnas)
+
+    df = manual_hours_df
+    if "ID" not in df.columns:
+        return pd.DataFrame(columns=columnas)
+    validos, hn, he, h_fd = _horas_manuales_por_tipo(df)
+
+    ids = df["ID"].to_numpy()
+    nombres = df["nombre"].to_numpy() if "nombre" in df.columns else np.full(len(df), "", dtype=object)
+    posiciones = np.arange(len(df))
+
+    # Fechas sintéticas para que groupby por (ID, quincena_inicio) tenga varias filas
+    base_date = pd.Timestamp(quincena_inicio_target)
+    sin_extra = np.zeros(len(df), dtype=float)
+    bloques = []
+    for orden, (horas, horas_extra, es_fd) in enumerate([(hn, sin_extra, False), (he, he, False), (h_fd, sin_extra, True)]):
+        mask = validos & (horas > 0)
+        if not mask.any():
             continue
-        hn = max(0.0, safe_float(row.get("horas_normales", 0)))
-        he = max(0.0, safe_float(row.get("horas_extra", 0)))
-        hd = max(0.0, safe_float(row.get("horas_domingo", 0)))
-        hf = max(0.0, safe_float(row.get("horas_feriado", 0)))
-        h_fd = hd + hf  # feriado y domingo se pagan igual (50% adicional)
-        
-        # Fechas sintéticas para que groupby por (ID, quincena_inicio) tenga varias filas
-        base_date = pd.Timestamp(quincena_inicio_target)
-        if hn > 0:
-            rows.append({
-                "ID": emp_id, "nombre": nombre, "fecha": base_date,
-                "horas_trabajadas": hn, "horas_extra": 0.0, "es_feriado_domingo": False,
-                "quincena_inicio": quincena_inicio_target, "quincena_fin": quincena_fin_target,
-            })
-        if he > 0:
-            rows.append({
-                "ID": emp_id, "nombre": nombre, "fecha": base_date + timedelta(days=1),
-                "horas_trabajadas": he, "horas_extra": he, "es_feriado_domingo": False,
-                "quincena_inicio": quincena_inicio_target, "quincena_fin": quincena_fin_target,
-            })
-        if h_fd > 0:
-            rows.append({
-                "ID": emp_id, "nombre": nombre, "fecha": base_date + timedelta(days=2),
-                "horas_trabajadas": h_fd, "horas_extra": 0.0, "es_feriado_domingo": True,
-                "quincena_inicio": quincena_inicio_target, "quincena_fin": quincena_fin_target,
-            })
-    
-    if not rows:
-        return pd.DataFrame(columns=["ID", "nombre", "fecha", "horas_trabajadas", "horas_extra", "es_feriado_domingo", "quincena_inicio", "quincena_fin"])
-    return pd.DataFrame(rows)
+        bloques.append(pd.DataFrame({
+            "_pos": posiciones[mask],
+            "_orden": orden,
+            "ID": ids[mask],
+            "nombre": nombres[mask],
+            "fecha": base_date + timedelta(days=orden),
+            "horas_trabajadas": horas[mask],
+            "horas_extra": horas_extra[mask],
+            "es_feriado_domingo": es_fd,
+        }))
+
+    if not bloques:
+        return pd.DataFrame(columns=columnas)
+    rows = pd.concat(bloques, ignore_index=True).sort_values(["_pos", "_orden"], kind="mergesort")
+    rows["quincena_inicio"] = quincena_inicio_target
+    rows["quincena_fin"] = quincena_fin_target
+    rows[["ID", "nombre"]] = rows[["ID", "nombre"]].infer_objects()
+    rows = rows.astype({"fecha": "datetime64[ns]", "quincena_inicio": "datetime64[ns]", "quincena_fin": "datetime64[ns]"})
+    return rows[columnas].reset_index(drop=True)
+
+
+_COLUMNAS_RESUMEN_HORAS = [
+    "ID",
+    "quincena_inicio",
+    "quincena_fin",
+    "total_horas",
+    "total_horas_extra",
+    "horas_normales",
+    "horas_extra_normales",
+    "horas_feriado_domingo",
+]
+
+
+def _sumar_en_orden(codigos, valores, n_grupos) -> np.ndarray:
+    """
+    Suma `valores` por grupo respetando el orden de las filas (la misma secuencia de sumas
+    que un `+=` fila por fila), con una operación vectorizada por posición dentro del grupo.
+    Las sumas compensadas de pandas difieren en el último bit, y eso cambia el redondeo
+    de montos que caen justo en medio centavo.
+    """
+    codigos = np.asarray(codigos, dtype=np.int64)
+    valores = np.asarray(valores, dtype=float)
+    total = np.zeros(n_grupos, dtype=float)
+    if len(codigos) == 0:
+        return total
+    orden = np.argsort(codigos, kind="stable")
+    codigos = codigos[orden]
+    inicio = np.searchsorted(codigos, np.arange(n_grupos))
+    posicion = np.arange(len(codigos)) - inicio[codigos]
+    matriz = np.zeros((n_grupos, int(posicion.max()) + 1), dtype=float)
+    matriz[codigos, posicion] = valores[orden]
+    for j in range(matriz.shape[1]):
+        total = total + matriz[:, j]
+    return total
+
+
+def _agregar_horas(ids, quincena_inicio, quincena_fin, horas, extra, es_fd):
+    """Agrega filas de horas (en orden) por empleado y quincena. Ver `resumir_horas_quincena`."""
+    horas = np.asarray(horas, dtype=float)
+    extra = np.asarray(extra, dtype=float)
+    es_fd = np.asarray(es_fd, dtype=bool)
+    claves = pd.DataFrame({"ID": ids, "quincena_inicio": quincena_inicio, "quincena_fin": quincena_fin})
+    grupos = claves.groupby(["ID", "quincena_inicio"], sort=True)
+    codigos = grupos.ngroup().to_numpy()
+    resumen = grupos["quincena_fin"].first().reset_index()
+    validos = codigos >= 0
+    codigos = codigos[validos]
+
+    columnas = {
+        "total_horas": horas,
+        "total_horas_extra": extra,
+        "horas_normales": np.where(es_fd, 0.0, horas - extra),
+        "horas_extra_normales": np.where(es_fd, 0.0, extra),
+        "horas_feriado_domingo": np.where(es_fd, horas, 0.0),
+    }
+    for col, valores in columnas.items():
+        resumen[col] = _sumar_en_orden(codigos, valores[validos], len(resumen))
+    return resumen[_COLUMNAS_RESUMEN_HORAS]
 
 
-def calculate_payroll_quincenal(employees_file=None, 
-                                 hours_file=None,
-                                 output_file=None,
-                                 quincena_fecha=None,
-                                 prestamos_file: str = DEFAULT_PRESTAMOS_FILE,
-                                 seguridad_horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE,
-                                 manual_hours_df=None):
+def resumir_horas_quincena(daily_hours_df):
     """
-    Calcula la nómina quincenal para todos los empleados de UNA quincena específica.
-    
-    Args:
-        employees_file: Archivo Excel con información de empleados
-        hours_file: Archivo Excel del reporte de asistencia del escáner biométrico (ignorado si manual_hours_df no es None)
-        output_file: Nombre del archivo Excel de salida (si es None, se genera automáticamente)
-        quincena_fecha: Fecha de referencia para determinar qué quincena calcular (obligatorio si manual_hours_df no es None)
-        manual_hours_df: Si se proporciona, se usan estas horas en lugar del reporte biométrico (columnas: ID, nombre, horas_normales, horas_extra, horas_domingo, horas_feriado)
-        
+    Agrega las horas diarias por empleado y quincena en una sola pasada (sumas con máscara).
+
+    Reglas (mismas que el cálculo por día):
+      - Feriado/domingo: todas las horas del día van a `horas_feriado_domingo`
+      - Día normal: `horas_trabajadas - horas_extra` son normales y `horas_extra` son extra (25%)
+
     Returns:
-        DataFrame con la nómina calculada o None si hay errores
+        DataFrame con columnas: ID, quincena_inicio, quincena_fin, total_horas, total_horas_extra,
+        horas_normales, horas_extra_normales, horas_feriado_domingo
     """
-    if employees_file is None:
-        employees_file = DEFAULT_EMPLOYEES_FILE
-    if hours_file is None:
-        hours_file = DEFAULT_HOURS_FILE
-    print("="*80)
-    print("SISTEMA DE NOMINA QUINCENAL")
-    print("="*80)
-    
-    # Leer archivo de empleados
-    print(f"\nLeyendo informacion de empleados desde: {employees_file}")
-    try:
-        employees_df = pd.read_excel(employees_file)
-        print(f"[OK] Encontrados {len(employees_df)} empleados")
-    except Exception as e:
-        print(f"[ERROR] Error al leer {employees_file}: {e}")
-        return None
+    if daily_hours_df is None or daily_hours_df.empty:
+        return pd.DataFrame(columns=_COLUMNAS_RESUMEN_HORAS)
 
-    # Identificar empleados de seguridad (nuevo tipo)
-    security_ids = set()
-    try:
-        for _, emp in employees_df.iterrows():
-            seg_val = get_column_value(emp, ["seguridad", "Seguridad", "empleado_seguridad", "Empleado Seguridad"], default=False)
-            if parse_bool(seg_val):
-                security_ids.add(str(emp["ID"]).strip())
-    except Exception:
-        security_ids = set()
-    
-    # --- Ruta con horas manuales (sin reporte biométrico) ---
-    if manual_hours_df is not None and not manual_hours_df.empty:
-        if quincena_fecha is None:
-            print("[ERROR] Al usar horas manuales debe indicar la fecha de referencia de la quincena (quincena_fecha).")
-            return None
-        if isinstance(quincena_fecha, str):
-            quincena_fecha = pd.to_datetime(quincena_fecha, format="%d/%m/%Y", errors="coerce")
-        elif not isinstance(quincena_fecha, pd.Timestamp):
-            quincena_fecha = pd.to_datetime(quincena_fecha)
-        day = quincena_fecha.day
-        if day <= 15:
-            quincena_inicio_target = quincena_fecha.replace(day=1)
-        else:
-            quincena_inicio_target = quincena_fecha.replace(day=16)
-        if quincena_inicio_target.day == 1:
-            fecha_pago = quincena_inicio_target.replace(day=15)
-        else:
-            if quincena_inicio_target.month == 12:
-                fecha_pago = quincena_inicio_target.replace(day=31)
-            else:
-                siguiente_mes = quincena_inicio_target.replace(month=quincena_inicio_target.month + 1, day=1)
-                fecha_pago = siguiente_mes - timedelta(days=1)
-        quincena_fin_target = fecha_pago
-        print(f"Calculando nómina con HORAS MANUALES para quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
-        seguridad_cfg = leer_seguridad_config(fecha_pago, seguridad_horario_file)
-        daily_hours_df = manual_hours_to_daily_df(manual_hours_df, quincena_inicio_target, quincena_fin_target)
-        print(f"[OK] Horas manuales convertidas para {daily_hours_df['ID'].nunique()} empleados")
-    else:
-        # --- Ruta normal: reporte de asistencia biométrico ---
-        print(f"\nLeyendo reporte de asistencia desde: {hours_file}")
-        try:
-            hours_df = leer_reporte_asistencia(hours_file)
-            print(f"[OK] Encontrados {len(hours_df)} registros de asistencia")
-        except Exception as e:
-            print(f"[ERROR] Error al leer {hours_file}: {e}")
-            return None
+    return _agregar_horas(
+        daily_hours_df["ID"].to_numpy(),
+        daily_hours_df["quincena_inicio"].to_numpy(),
+        daily_hours_df["quincena_fin"].to_numpy(),
+        daily_hours_df["horas_trabajadas"].to_numpy(dtype=float),
+        daily_hours_df["horas_extra"].to_numpy(dtype=float),
+        daily_hours_df["es_feriado_domingo"].to_numpy(dtype=bool),
+    )
 
-        if not pd.api.types.is_datetime64_any_dtype(hours_df["fecha"]):
-            hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], errors="coerce")
-            if hours_df["fecha"].isna().any():
-                hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], format="%d/%m/%Y", errors="coerce")
-        
-        print("\nValidando registros de asistencia...")
-        errors = validate_attendance_records(hours_df, security_ids=security_ids)
-        if errors:
-            print("\n" + "="*80)
-            print("ERRORES ENCONTRADOS - CORRIJA ANTES DE CONTINUAR")
-            print("="*80)
-            for error in errors:
-                print(f"\n{error['mensaje']}")
-            print("\n" + "="*80)
-            return None
-        print("[OK] Todos los registros son validos")
 
-        if quincena_fecha is None:
-            fecha_maxima = hours_df["fecha"].max()
-            quincena_fecha = fecha_maxima
-            print(f"Calculando nómina para la quincena más reciente (fecha de referencia: {quincena_fecha.strftime('%d/%m/%Y')})")
-        else:
-            if isinstance(quincena_fecha, str):
-                quincena_fecha = pd.to_datetime(quincena_fecha, format="%d/%m/%Y", errors="coerce")
-            elif not isinstance(quincena_fecha, pd.Timestamp):
-                quincena_fecha = pd.to_datetime(quincena_fecha)
-            print(f"Calculando nómina para quincena que contiene la fecha: {quincena_fecha.strftime('%d/%m/%Y')}")
-        
-        day = quincena_fecha.day
-        if day <= 15:
-            quincena_inicio_target = quincena_fecha.replace(day=1)
-        else:
-            quincena_inicio_target = quincena_fecha.replace(day=16)
-        if quincena_inicio_target.day == 1:
-            fecha_pago = quincena_inicio_target.replace(day=15)
+def resumir_horas_manuales(manual_hours_df, quincena_inicio_target, quincena_fin_target):
+    """
+    Igual que `resumir_horas_quincena(manual_hours_to_daily_df(...))`, pero directo desde
+    las columnas de horas manuales, sin construir filas diarias sintéticas.
+    """
+    if manual_hours_df is None or manual_hours_df.empty or "ID" not in manual_hours_df.columns:
+        return pd.DataFrame(columns=_COLUMNAS_RESUMEN_HORAS)
+
+    validos, hn, he, h_fd = _horas_manuales_por_tipo(manual_hours_df)
+    con_horas = validos & ((hn > 0) | (he > 0) | (h_fd > 0))
+    if not con_horas.any():
+        return pd.DataFrame(columns=_COLUMNAS_RESUMEN_HORAS)
+
+    # Por cada fila: normales, extra y feriado/domingo (mismo orden que las filas sintéticas)
+    n = int(con_horas.sum())
+    ids = pd.Series(manual_hours_df["ID"].to_numpy()[con_horas]).infer_objects().to_numpy()
+    horas = np.column_stack([hn[con_horas], he[con_horas], h_fd[con_horas]]).ravel()
+    extra = np.column_stack([np.zeros(n), he[con_horas], np.zeros(n)]).ravel()
+    es_fd = np.tile([False, False, True], n)
+    return _agregar_horas(
+        np.repeat(ids, 3),
+        np.full(3 * n, pd.Timestamp(quincena_inicio_target)),
+        np.full(3 * n, pd.Timestamp(quincena_fin_target)),
+        horas,
+        extra,
+        es_fd,
+    )
+
+
+def _a_centavos(montos) -> np.ndarray:
+    """
+    Versión vectorizada de `_money_to_cents` para floats: centavos int64 con ROUND_HALF_UP sobre
+    el valor decimal que muestra el float (2.675 -> 268). Un monto está en empate exactamente
+    cuando es el float más cercano a k + 0.5 centavos, y eso se decide sin pasar por Decimal.
+    """
+    x = np.nan_to_num(np.asarray(montos, dtype=float), nan=0.0)
+    magnitud = np.abs(x)
+    k = np.floor(magnitud * 100.0)
+    empate_o_mas = magnitud >= (k + 0.5) / 100.0
+    centavos = (k + empate_o_mas).astype(np.int64)
+    return np.where(x < 0, -centavos, centavos)
+
+
+def _porcentaje_centavos(centavos, puntos_basicos: int) -> np.ndarray:
+    """
+    Porcentaje de montos en centavos con aritmética entera (puntos_basicos: 975 = 9.75%).
+    Redondeo ROUND_HALF_UP al centavo, el mismo de `_money_to_cents`.
+    """
+    centavos = np.asarray(centavos, dtype=np.int64)
+    resultado = (np.abs(centavos) * puntos_basicos + 5000) // 10000
+    return np.where(centavos < 0, -resultado, resultado)
+
+
+def _centavos_a_dinero(centavos) -> np.ndarray:
+    """Centavos -> dólares (float) para la salida; mismo valor que `_cents_to_money`."""
+    return np.asarray(centavos, dtype=np.int64) / 100.0
+
+
+FACTOR_HORAS_EXTRA = 1.25          # 25% adicional después de 3 PM
+FACTOR_FERIADO_DOMINGO = 1.50      # 50% adicional en feriados/domingos
+
+
+def _montos_quincena(horas_normales, horas_extra_normales, horas_feriado_domingo,
+                     salario, salario_minimo, es_salario_fijo, es_empleado_fijo,
+                     factor_extra=FACTOR_HORAS_EXTRA, factor_feriado_domingo=FACTOR_FERIADO_DOMINGO):
+    """
+    Reglas de pago de la quincena (montos float sin redondear). Todos los argumentos se
+    combinan con broadcasting de numpy: con empleados en filas (N, 1) y parámetros en columnas
+    (1, S) se obtiene la matriz empleados x escenarios de `evaluar_escenarios`.
+
+    Returns:
+        (pago_extra, pago_feriado_domingo, bono_horas_extra, pago_quincenal)
+    """
+    # Horas extra y feriado/domingo con recargo (salario fijo no recibe extras)
+    pago_extra = np.where(es_salario_fijo, 0.0, (salario * factor_extra) * horas_extra_normales)
+    pago_feriado_domingo = np.where(es_salario_fijo, 0.0, (salario * factor_feriado_domingo) * horas_feriado_domingo)
+
+    # Empleado fijo: salario mínimo garantizado + bono por horas (normales + feriado/domingo)
+    # por encima de las horas requeridas para el mínimo (quincenal)
+    salario_hora_valido = np.where(salario > 0, salario, 1.0)
+    horas_requeridas_quincenal = np.where(salario > 0, (salario_minimo / salario_hora_valido) / 2, 0.0)
+    exceso_horas = (horas_normales + horas_feriado_domingo) - horas_requeridas_quincenal
+    bono_horas_extra = np.where(es_empleado_fijo, np.where(exceso_horas > 0, exceso_horas, 0.0) * salario, 0.0)
+
+    pago_quincenal = np.select(
+        [es_salario_fijo, es_empleado_fijo],
+        [
+            salario / 2,
+            ((salario_minimo / 2 + bono_horas_extra) + pago_extra) + pago_feriado_domingo,
+        ],
+        default=(salario * horas_normales + pago_extra) + pago_feriado_domingo,
+    )
+    return pago_extra, pago_feriado_domingo, bono_horas_extra, pago_quincenal
+
+
+def calcular_pagos_quincena(horas_resumen_df, empleados: TablaEmpleados):
+    """
+    Calcula el pago quincenal y los descuentos de ley (sin préstamos) de todos los empleados
+    a la vez, con operaciones por columna.
+
+    Args:
+        horas_resumen_df: salida de `resumir_horas_quincena` / `resumir_horas_manuales`
+        empleados: `TablaEmpleados` del archivo de empleados
+
+    Returns:
+        DataFrame alineado con `horas_resumen_df` con fila_empleado (-1 si no está en la tabla),
+        encontrado, tipo_pago y los montos en centavos int64 (ROUND_HALF_UP): pago_extra_centavos,
+        pago_feriado_domingo_centavos, bono_horas_extra_centavos, pago_quincenal_centavos,
+        seguro_social_centavos (9.75%), seguro_educativo_centavos (1.25%), descuento_islr_centavos,
+        total_descuentos_base_centavos
+    """
+    fila_empleado = empleados.posiciones(horas_resumen_df["ID"])
+    encontrado = fila_empleado >= 0
+
+    salario = empleados.tomar("salario", fila_empleado, 0.0).astype(float)
+    salario_minimo = empleados.tomar("salario_minimo", fila_empleado, 0.0).astype(float)
+    salario_fijo = empleados.tomar("salario_fijo", fila_empleado, False).astype(bool)
+    empleado_fijo = empleados.tomar("empleado_fijo", fila_empleado, False).astype(bool)
+    seguridad = empleados.tomar("seguridad", fila_empleado, False).astype(bool)
+    por_contrato = empleados.tomar("empleado_por_contrato", fila_empleado, False).astype(bool)
+    islr = empleados.tomar("islr", fila_empleado, 0.0).astype(float)
+
+    horas_normales = horas_resumen_df["horas_normales"].to_numpy(dtype=float)
+    horas_extra_normales = horas_resumen_df["horas_extra_normales"].to_numpy(dtype=float)
+    horas_feriado_domingo = horas_resumen_df["horas_feriado_domingo"].to_numpy(dtype=float)
+
+    # Seguridad siempre cobra por horas (aunque esté marcado como fijo)
+    es_salario_fijo = salario_fijo & ~seguridad
+    es_empleado_fijo = empleado_fijo & ~seguridad & ~es_salario_fijo
+
+    pago_extra, pago_feriado_domingo, bono_horas_extra, pago_quincenal = _montos_quincena(
+        horas_normales, horas_extra_normales, horas_feriado_domingo,
+        salario, salario_minimo, es_salario_fijo, es_empleado_fijo,
+    )
+    tipo_pago = np.select(
+        [es_salario_fijo, es_empleado_fijo, seguridad],
+        ["Salario Fijo", "Empleado Fijo", "Seguridad (Por horas)"],
+        default="Por horas",
+    )
+
+    # Montos en centavos (int64) desde aquí; descuentos por contrato con aritmética entera
+    pago_quincenal_centavos = _a_centavos(pago_quincenal)
+    seguro_social = np.where(por_contrato, _porcentaje_centavos(pago_quincenal_centavos, 975), 0)
+    seguro_educativo = np.where(por_contrato, _porcentaje_centavos(pago_quincenal_centavos, 125), 0)
+    descuento_islr = np.where(por_contrato, _a_centavos(islr), 0)
+
+    return pd.DataFrame({
+        "fila_empleado": fila_empleado,
+        "encontrado": encontrado,
+        "tipo_pago": tipo_pago,
+        "pago_extra_centavos": _a_centavos(pago_extra),
+        "pago_feriado_domingo_centavos": _a_centavos(pago_feriado_domingo),
+        "bono_horas_extra_centavos": _a_centavos(bono_horas_extra),
+        "pago_quincenal_centavos": pago_quincenal_centavos,
+        "seguro_social_centavos": seguro_social.astype(np.int64),
+        "seguro_educativo_centavos": seguro_educativo.astype(np.int64),
+        "descuento_islr_centavos": descuento_islr.astype(np.int64),
+        "total_descuentos_base_centavos": (seguro_social + seguro_educativo + descuento_islr).astype(np.int64),
+    }, index=horas_resumen_df.index)
+
+
+ESCENARIO_ACTUAL = {
+    "nombre": "Actual",
+    "aumento_salario_pct": 0.0,
+    "aumento_salario_minimo_pct": 0.0,
+    "factor_extra": FACTOR_HORAS_EXTRA,
+    "factor_feriado_domingo": FACTOR_FERIADO_DOMINGO,
+}
+
+
+def evaluar_escenarios(horas_resumen_df, empleados: TablaEmpleados, escenarios):
+    """
+    Evalúa varios escenarios de costo sobre las mismas horas ya calculadas, en una sola pasada
+    vectorizada (matriz empleados x escenarios), sin leer ni escribir archivos.
+
+    Args:
+        horas_resumen_df: horas por empleado (`PayrollRun.horas_resumen`, `resumir_horas_quincena`, ...)
+        empleados: `TablaEmpleados`
+        escenarios: lista de dicts; claves no indicadas toman el valor de `ESCENARIO_ACTUAL`
+            (nombre, aumento_salario_pct, aumento_salario_minimo_pct, factor_extra, factor_feriado_domingo)
+
+    Returns:
+        (resumen, por_empleado):
+          - resumen: una fila por escenario con los parámetros, total pago quincenal, seguro social,
+            seguro educativo, ISLR, total neto (sin préstamos) y diferencia vs el escenario actual
+          - por_empleado: ID, Nombre y el pago quincenal de cada escenario (una columna por nombre)
+    """
+    parametros = pd.DataFrame([{**ESCENARIO_ACTUAL, **esc} for esc in escenarios], columns=list(ESCENARIO_ACTUAL))
+    if parametros.empty:
+        raise ValueError("Debe indicar al menos un escenario")
+    parametros["nombre"] = [
+        str(nombre) if pd.notna(nombre) and str(nombre).strip() else f"Escenario {i + 1}"
+        for i, nombre in enumerate(parametros["nombre"])
+    ]
+    if parametros["nombre"].duplicated().any():
+        raise ValueError("Los nombres de escenario deben ser únicos")
+
+    fila = empleados.posiciones(horas_resumen_df["ID"])
+    horas = horas_resumen_df[fila >= 0]
+    fila = fila[fila >= 0]
+
+    def columna(valores):
+        return np.asarray(valores)[:, None]
+
+    # Columna 0: escenario actual (para la diferencia); 1..S: escenarios pedidos
+    matriz = pd.concat([pd.DataFrame([ESCENARIO_ACTUAL]), parametros], ignore_index=True)
+
+    def por_escenario(nombre):
+        return matriz[nombre].to_numpy(dtype=float)[None, :]
+
+    seguridad = empleados.seguridad[fila]
+    es_salario_fijo = empleados.salario_fijo[fila] & ~seguridad
+    es_empleado_fijo = empleados.empleado_fijo[fila] & ~seguridad & ~es_salario_fijo
+    salario = columna(empleados.salario[fila].astype(float)) * (1 + por_escenario("aumento_salario_pct") / 100)
+    salario_minimo = (
+        columna(empleados.salario_minimo[fila].astype(float)) * (1 + por_escenario("aumento_salario_minimo_pct") / 100)
+    )
+    _, _, _, pago_quincenal = _montos_quincena(
+        columna(horas["horas_normales"].to_numpy(dtype=float)),
+        columna(horas["horas_extra_normales"].to_numpy(dtype=float)),
+        columna(horas["horas_feriado_domingo"].to_numpy(dtype=float)),
+        salario,
+        salario_minimo,
+        columna(es_salario_fijo),
+        columna(es_empleado_fijo),
+        factor_extra=por_escenario("factor_extra"),
+        factor_feriado_domingo=por_escenario("factor_feriado_domingo"),
+    )
+    pago_centavos = _a_centavos(pago_quincenal)
+    total_actual = pago_centavos[:, 0].sum()
+    pago_centavos = pago_centavos[:, 1:]
+
+    por_contrato = columna(empleados.empleado_por_contrato[fila])
+    seguro_social = np.where(por_contrato, _porcentaje_centavos(pago_centavos, 975), 0)
+    seguro_educativo = np.where(por_contrato, _porcentaje_centavos(pago_centavos, 125), 0)
+    islr = np.broadcast_to(
+        np.where(por_contrato, columna(_a_centavos(empleados.islr[fila].astype(float))), 0), pago_centavos.shape
+    )
+
+    total_pago = pago_centavos.sum(axis=0)
+    total_descuentos = seguro_social.sum(axis=0) + seguro_educativo.sum(axis=0) + islr.sum(axis=0)
+
+    resumen = parametros.copy()
+    resumen["Total Pago Quincenal"] = _centavos_a_dinero(total_pago)
+    resumen["Seguro Social (9.75%)"] = _centavos_a_dinero(seguro_social.sum(axis=0))
+    resumen["Seguro Educativo (1.25%)"] = _centavos_a_dinero(seguro_educativo.sum(axis=0))
+    resumen["ISLR"] = _centavos_a_dinero(islr.sum(axis=0))
+    resumen["Total Neto (sin préstamos)"] = _centavos_a_dinero(total_pago - total_descuentos)
+    resumen["Diferencia vs Actual"] = _centavos_a_dinero(total_pago - total_actual)
+
+    por_empleado = pd.DataFrame({"ID": horas["ID"].to_numpy(), "Nombre": empleados.nombre[fila]})
+    por_empleado = pd.concat(
+        [por_empleado, pd.DataFrame(_centavos_a_dinero(pago_centavos), columns=parametros["nombre"].tolist())],
+        axis=1,
+    )
+    return resumen, por_empleado
+
+
+COLUMNAS_NOMINA = [
+    'ID', 'Nombre', 'Cargo', 'Tipo', 'Salario Fijo', 'Empleado Fijo', 'Empleado por contrato',
+    'Salario Base', 'Quincena Inicio', 'Quincena Fin', 'Fecha de Pago',
+    'Total Horas Trabajadas', 'Horas Extra (después 3 PM)',
+    'Pago Extra (25% adicional)', 'Bono Horas Extra', 'Horas Feriado/Domingo',
+    'Pago Feriado/Domingo (50% adicional)',
+    'Seguro Social (9.75%)', 'Seguro Educativo (1.25%)', 'ISLR', 'Descuento Préstamo', 'Total Descuentos', 'Total Saldo Préstamo',
+    'Número de Cuenta', 'Banco', 'Tipo de Cuenta', 'Total Pago a Empleados',
+]
+
+# Seguridad: todas las horas se pagan igual (sin horas extra ni feriado/domingo)
+COLUMNAS_NOMINA_SEGURIDAD = [
+    'ID', 'Nombre', 'Cargo', 'Tipo', 'Salario Base', 'Quincena Inicio', 'Quincena Fin', 'Fecha de Pago',
+    'Total Horas Trabajadas',
+    'Seguro Social (9.75%)', 'Seguro Educativo (1.25%)', 'ISLR', 'Descuento Préstamo', 'Total Descuentos', 'Total Saldo Préstamo',
+    'Total Pago a Empleados', 'Número de Cuenta', 'Banco', 'Tipo de Cuenta',
+]
+
+
+def _parsear_quincena_fecha(quincena_fecha) -> pd.Timestamp:
+    """Fecha de referencia de la quincena como Timestamp (texto en formato dd/mm/YYYY)."""
+    if isinstance(quincena_fecha, str):
+        return pd.to_datetime(quincena_fecha, format="%d/%m/%Y", errors="coerce")
+    if not isinstance(quincena_fecha, pd.Timestamp):
+        return pd.to_datetime(quincena_fecha)
+    return quincena_fecha
+
+
+def periodo_quincena(quincena_fecha):
+    """
+    Quincena que contiene la fecha: del 1 al 15 o del 16 al fin de mes. Se paga el último día.
+
+    Returns:
+        (quincena_inicio, quincena_fin, fecha_pago)
+    """
+    quincena_fecha = _parsear_quincena_fecha(quincena_fecha)
+    if quincena_fecha.day <= 15:
+        quincena_inicio = quincena_fecha.replace(day=1)
+    else:
+        quincena_inicio = quincena_fecha.replace(day=16)
+    if quincena_inicio.day == 1:
+        fecha_pago = quincena_inicio.replace(day=15)
+    else:
+        if quincena_inicio.month == 12:
+            fecha_pago = quincena_inicio.replace(day=31)
         else:
-            if quincena_inicio_target.month == 12:
-                fecha_pago = quincena_inicio_target.replace(day=31)
-            else:
-                siguiente_mes = quincena_inicio_target.replace(month=quincena_inicio_target.month + 1, day=1)
-                fecha_pago = siguiente_mes - timedelta(days=1)
-        quincena_fin_target = fecha_pago
-        print(f"Período de la quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
-
-        seguridad_cfg = leer_seguridad_config(fecha_pago, seguridad_horario_file)
-        print("\nCalculando horas trabajadas por dia...")
-        daily_hours_df = calculate_hours_per_day_mixed(hours_df, security_ids=security_ids, security_config=seguridad_cfg)
-        print(f"[OK] Horas calculadas para {len(daily_hours_df)} dias")
-        print("\nAgrupando en períodos quincenales...")
-        daily_hours_df = get_quincena_periods(daily_hours_df)
-        daily_hours_df = daily_hours_df[daily_hours_df['quincena_inicio'] == quincena_inicio_target]
-    
-    if daily_hours_df.empty:
-        print(f"[ERROR] No se encontraron datos para la quincena del {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
+            siguiente_mes = quincena_inicio.replace(month=quincena_inicio.month + 1, day=1)
+            fecha_pago = siguiente_mes - timedelta(days=1)
+    return quincena_inicio, fecha_pago, fecha_pago
+
+
+def _filas_nomina(horas_resumen_df, pagos, empleados: TablaEmpleados, descuento_prestamo, saldo_prestamo_total):
+    """Filas de nómina (todas las columnas, seguridad incluida) de los empleados encontrados en `pagos`."""
+    fila = pagos["fila_empleado"].to_numpy()
+    nombres = empleados.nombre[fila]
+    total_descuentos = pagos["total_descuentos_base_centavos"].to_numpy() + descuento_prestamo
+    total_pago = pagos["pago_quincenal_centavos"].to_numpy() - total_descuentos
+
+    # Preparar resultados (horas con np.round; montos de centavos a dólares solo aquí)
+    return pd.DataFrame({
+        'ID': horas_resumen_df['ID'].to_numpy(),
+        'Nombre': nombres,
+        'Cargo': empleados.cargo[fila],
+        'Tipo': pagos['tipo_pago'].to_numpy(),
+        'Salario Fijo': np.where(empleados.salario_fijo[fila], 'Sí', 'No'),
+        'Empleado Fijo': np.where(empleados.empleado_fijo[fila], 'Sí', 'No'),
+        'Empleado por contrato': np.where(empleados.empleado_por_contrato[fila], 'Sí', 'No'),
+        'Salario Base': empleados.salario[fila],
+        'Quincena Inicio': pd.to_datetime(horas_resumen_df['quincena_inicio']).dt.strftime('%d/%m/%Y').to_numpy(),
+        'Quincena Fin': pd.to_datetime(horas_resumen_df['quincena_fin']).dt.strftime('%d/%m/%Y').to_numpy(),
+        'Total Horas Trabajadas': np.round(horas_resumen_df['total_horas'].to_numpy(dtype=float), 2),
+        'Horas Extra (después 3 PM)': np.round(horas_resumen_df['total_horas_extra'].to_numpy(dtype=float), 2),
+        'Pago Extra (25% adicional)': _centavos_a_dinero(pagos['pago_extra_centavos']),
+        'Pago Quincenal': _centavos_a_dinero(pagos['pago_quincenal_centavos']),
+        'Seguro Social (9.75%)': _centavos_a_dinero(pagos['seguro_social_centavos']),
+        'Seguro Educativo (1.25%)': _centavos_a_dinero(pagos['seguro_educativo_centavos']),
+        'ISLR': _centavos_a_dinero(pagos['descuento_islr_centavos']),
+        'Descuento Préstamo': _centavos_a_dinero(descuento_prestamo),
+        'Total Descuentos': _centavos_a_dinero(total_descuentos),
+        'Total Saldo Préstamo': _centavos_a_dinero(saldo_prestamo_total),
+        'Total Pago a Empleados': _centavos_a_dinero(total_pago),
+        'Número de Cuenta': empleados.n_de_cuenta[fila],
+        'Banco': empleados.banco[fila],
+        'Tipo de Cuenta': empleados.tipo_de_cuenta[fila],
+        'Horas Feriado/Domingo': np.round(horas_resumen_df['horas_feriado_domingo'].to_numpy(dtype=float), 2),
+        'Pago Feriado/Domingo (50% adicional)': _centavos_a_dinero(pagos['pago_feriado_domingo_centavos']),
+        'Bono Horas Extra': _centavos_a_dinero(pagos['bono_horas_extra_centavos']),
+    }).infer_objects()
+
+
+def _mtime_archivo(path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
         return None
-    
-    print(f"[OK] Encontrados datos para {len(daily_hours_df)} días en esta quincena")
-    
-    def get_column_value(row, candidates, default=None):
-        """Obtiene el primer valor disponible de una lista de columnas."""
-        for col in candidates:
-            if col in row and pd.notna(row[col]):
-                return row[col]
-        return default
 
-    def parse_bool(value):
-        """Normaliza valores de contrato a booleano."""
-        if pd.isna(value):
-            return False
-        if isinstance(value, (int, float, np.integer)):
-            return value != 0
-        text = str(value).strip().lower()
-        return text in ['s', 'si', 'sí', 'y', 'yes', 'true', '1']
-
-    # Crear diccionario de empleados para acceso rápido
-    employees_dict = {}
-    for _, emp in employees_df.iterrows():
-        contrato_val = get_column_value(
-            emp,
-            ['Empleado por contrato', 'empleado_por_contrato', 'empleado por contrato'],
-            default=False
-        )
-        seguridad_val = get_column_value(
-            emp,
-            ['seguridad', 'Seguridad', 'empleado_seguridad', 'Empleado Seguridad'],
-            default=False
+
+# Subir cuando cambien las reglas de cálculo (recargos, descuentos, redondeo): invalida la caché
+VERSION_REGLAS = "2026.1"
+CACHE_NOMINAS_MAX = 8
+
+_cache_nominas = OrderedDict()  # clave de manifiesto -> PayrollRun (orden LRU)
+_version_codigo = None
+
+
+def _sha256_archivo(path) -> Optional[str]:
+    """Hash del contenido de un archivo (None si no existe o no se puede leer)."""
+    try:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+        return h.hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def _obtener_version_codigo() -> str:
+    """Hash de este módulo (o 'desconocida' si no se puede leer, ej. ejecutable empaquetado)."""
+    global _version_codigo
+    if _version_codigo is None:
+        _version_codigo = _sha256_archivo(os.path.abspath(__file__)) or "desconocida"
+    return _version_codigo
+
+
+def construir_manifiesto(employees_file, hours_file, quincena_fecha, prestamos_file,
+                         seguridad_horario_file, manual_hours_df=None) -> dict:
+    """
+    Manifiesto de una corrida: hash del contenido de cada archivo de entrada, quincena pedida
+    y versión de reglas/código. `clave` identifica la corrida (misma clave = mismo resultado).
+    """
+    archivos = {
+        "empleados": employees_file,
+        "prestamos": prestamos_file,
+        "seguridad_horario": seguridad_horario_file,
+    }
+    manual = manual_hours_df is not None and not manual_hours_df.empty
+    if not manual:
+        archivos["asistencia"] = hours_file
+    manifiesto = {
+        "version_reglas": VERSION_REGLAS,
+        "version_codigo": _obtener_version_codigo(),
+        "quincena_fecha": None if quincena_fecha is None else str(quincena_fecha),
+        "archivos": {
+            nombre: {"ruta": None if ruta is None else os.path.abspath(ruta), "sha256": _sha256_archivo(ruta)}
+            for nombre, ruta in archivos.items()
+        },
+    }
+    if manual:
+        h = hashlib.sha256(repr(list(manual_hours_df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(manual_hours_df.astype(str), index=True).to_numpy().tobytes())
+        manifiesto["horas_manuales_sha256"] = h.hexdigest()
+
+    # La clave depende del contenido, no de las rutas
+    contenido = {k: v for k, v in manifiesto.items() if k != "archivos"}
+    contenido["archivos"] = {nombre: datos["sha256"] for nombre, datos in manifiesto["archivos"].items()}
+    manifiesto["clave"] = hashlib.sha256(json.dumps(contenido, sort_keys=True).encode("utf-8")).hexdigest()
+    return manifiesto
+
+
+def _copiar_run(run):
+    """Copia de una corrida para la caché: editar el resultado no debe alterar lo cacheado."""
+    copiar = lambda df: None if df is None else df.copy()
+    return replace(
+        run,
+        nomina=copiar(run.nomina),
+        nomina_seguridad=copiar(run.nomina_seguridad),
+        prestamos_df=copiar(run.prestamos_df),
+        pagos_prestamos_df=copiar(run.pagos_prestamos_df),
+        pagos_prestamo_nuevos=copiar(run.pagos_prestamo_nuevos),
+        advertencias=list(run.advertencias),
+        errores_asistencia=[dict(e) for e in run.errores_asistencia],
+        recalculados=list(run.recalculados),
+        manifiesto=None if run.manifiesto is None else dict(run.manifiesto),
+    )
+
+
+def limpiar_cache_nominas() -> None:
+    """Vacía la caché de corridas de nómina."""
+    _cache_nominas.clear()
+
+
+# Columnas numéricas (horas y montos) que se comparan entre dos nóminas
+COLUMNAS_COMPARABLES = [
+    'Salario Base', 'Total Horas Trabajadas', 'Horas Extra (después 3 PM)', 'Horas Feriado/Domingo',
+    'Pago Extra (25% adicional)', 'Bono Horas Extra', 'Pago Feriado/Domingo (50% adicional)',
+    'Seguro Social (9.75%)', 'Seguro Educativo (1.25%)', 'ISLR', 'Descuento Préstamo',
+    'Total Descuentos', 'Total Saldo Préstamo', 'Total Pago a Empleados',
+]
+
+
+@dataclass
+class DiferenciaNomina:
+    """Resultado de `comparar_nominas`."""
+    agregados: pd.DataFrame  # empleados solo en la nómina nueva
+    eliminados: pd.DataFrame  # empleados solo en la anterior
+    cambios: pd.DataFrame  # una fila por (empleado, columna) con |diferencia| > umbral
+    por_tipo: pd.DataFrame  # diferencia de totales por 'Tipo'
+
+    @property
+    def hay_cambios(self) -> bool:
+        return not (self.agregados.empty and self.eliminados.empty and self.cambios.empty)
+
+    def resumen(self) -> str:
+        empleados = self.cambios["ID"].nunique() if not self.cambios.empty else 0
+        return (
+            f"{len(self.agregados)} agregado(s), {len(self.eliminados)} eliminado(s), "
+            f"{empleados} empleado(s) con cambios ({len(self.cambios)} valor(es))"
         )
-        islr_val = get_column_value(emp, ['ISLR', 'ISL', 'isl', 'Impuesto sobre la renta'], default=0)
-        try:
-            islr_val = float(islr_val) if pd.notna(islr_val) else 0.0
-        except (TypeError, ValueError):
-            islr_val = 0.0
-        # Usar ID como clave principal, pero también nombre como alternativa
-        employees_dict[str(emp['ID'])] = {
-            'nombre': emp['nombre'],
-            'salario_fijo': bool(emp.get('salario_fijo', False)),
-            'empleado_fijo': bool(emp.get('empleado_fijo', False)),
-            'seguridad': parse_bool(seguridad_val),
-            'salario_minimo': float(emp.get('salario_minimo', 0)) if pd.notna(emp.get('salario_minimo')) else 0.0,
-            'salario': float(emp['salario']) if pd.notna(emp['salario']) else 0.0,
-            'cargo': emp.get('cargo', ''),
-            'n_de_cuenta': emp.get('n_de_cuenta', ''),
-            'banco': emp.get('banco', ''),
-            'tipo_de_cuenta': emp.get('tipo_de_cuenta', ''),
-            'empleado_por_contrato': parse_bool(contrato_val),
-            'islr': islr_val
+
+
+def _nomina_para_comparar(fuente) -> pd.DataFrame:
+    """Nómina completa (normal + seguridad) desde un `PayrollRun`, un DataFrame o un archivo."""
+    if hasattr(fuente, "nomina_seguridad"):
+        partes = [df for df in (fuente.nomina, fuente.nomina_seguridad) if df is not None and not df.empty]
+    elif isinstance(fuente, pd.DataFrame):
+        partes = [fuente]
+    else:
+        partes = [leer_nomina(fuente)]
+        base = fuente.rsplit('.', 1)[0] if '.' in fuente else fuente
+        if not base.endswith('_seguridad') and os.path.exists(base + '_seguridad.xlsx'):
+            partes.append(leer_nomina(base + '_seguridad.xlsx'))
+    if not partes:
+        return pd.DataFrame(columns=['ID', 'Nombre', 'Tipo'])
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0].reset_index(drop=True)
+    df = df.assign(ID=normalizar_ids(df['ID']))
+    return df.drop_duplicates('ID', keep='last').set_index('ID')
+
+
+def archivo_nomina_anterior(fecha_pago, carpeta=None) -> str:
+    """
+    Ruta de la nómina de la quincena anterior a la de esa fecha de pago, en `carpeta` (la de
+    la nómina que se compara; por defecto la carpeta de datos).
+    """
+    quincena_inicio, _, _ = periodo_quincena(fecha_pago)
+    _, _, fecha_anterior = periodo_quincena(quincena_inicio - timedelta(days=1))
+    return os.path.join(carpeta or DATA_DIR, f"nomina_quincenal_pago_{fecha_anterior.strftime('%Y%m%d')}.xlsx")
+
+
+def comparar_nominas(anterior, nueva, umbral: float = 0.01) -> DiferenciaNomina:
+    """
+    Compara dos nóminas alineadas por ID (archivo, DataFrame o `PayrollRun`; incluye seguridad).
+    Informa empleados agregados/eliminados, cada valor de horas o montos que cambió más que
+    `umbral` y la diferencia de totales por 'Tipo'.
+    """
+    a = _nomina_para_comparar(anterior)
+    b = _nomina_para_comparar(nueva)
+    columnas = [c for c in COLUMNAS_COMPARABLES if c in a.columns and c in b.columns]
+    info = [c for c in ('Nombre', 'Tipo') if c in b.columns]
+
+    # Matrices numéricas una sola vez; las filas comunes se toman por posición
+    def numeros(df):
+        matriz = np.empty((len(df), len(columnas)))
+        for j, c in enumerate(columnas):
+            matriz[:, j] = pd.to_numeric(df[c], errors='coerce')
+        return matriz
+    numeros_a, numeros_b = numeros(a), numeros(b)
+    pos_a = a.index.get_indexer(b.index)
+    en_ambas = pos_a >= 0
+    comunes = b.index[en_ambas]
+    valores_a = numeros_a[pos_a[en_ambas]]
+    valores_b = numeros_b[en_ambas]
+    delta = np.nan_to_num(valores_b) - np.nan_to_num(valores_a)
+    filas, cols = np.nonzero((np.abs(delta) > umbral) | (np.isnan(valores_a) != np.isnan(valores_b)))
+    cambios = pd.DataFrame({
+        'ID': comunes[filas],
+        **{c: b[c].to_numpy()[en_ambas][filas] for c in info},
+        'Columna': np.asarray(columnas, dtype=object)[cols],
+        'Anterior': valores_a[filas, cols],
+        'Nuevo': valores_b[filas, cols],
+        'Diferencia': np.round(delta[filas, cols], 2),
+    })
+
+    solo_a = ~a.index.isin(b.index)
+    agregados = b.loc[~en_ambas, info + columnas].reset_index()
+    eliminados = a.loc[solo_a, [c for c in info if c in a.columns] + columnas].reset_index()
+
+    # Totales por Tipo (incluye agregados y eliminados)
+    def tipos_de(df):
+        return (df['Tipo'] if 'Tipo' in df.columns else pd.Series('', index=df.index)).fillna('').astype(str).to_numpy()
+    codigos, tipos = pd.factorize(np.concatenate([tipos_de(a), tipos_de(b)]), sort=True)
+    codigos_a, codigos_b = codigos[:len(a)], codigos[len(a):]
+    sumas_a = np.zeros((len(tipos), len(columnas)))
+    sumas_b = np.zeros((len(tipos), len(columnas)))
+    np.add.at(sumas_a, codigos_a, np.nan_to_num(numeros_a))
+    np.add.at(sumas_b, codigos_b, np.nan_to_num(numeros_b))
+    por_tipo = pd.DataFrame(np.round(sumas_b - sumas_a, 2), columns=columnas)
+    por_tipo.insert(0, 'Empleados Nuevo', np.bincount(codigos_b, minlength=len(tipos)))
+    por_tipo.insert(0, 'Empleados Anterior', np.bincount(codigos_a, minlength=len(tipos)))
+    por_tipo.insert(0, 'Tipo', tipos)
+
+    return DiferenciaNomina(agregados=agregados, eliminados=eliminados, cambios=cambios, por_tipo=por_tipo)
+
+
+# Eventos de progreso de la corrida (para la GUI u otro consumidor, sin capturar stdout)
+PROGRESO_ETAPA_INICIO = "etapa_inicio"
+PROGRESO_ETAPA_FIN = "etapa_fin"
+PROGRESO_MENSAJE = "mensaje"
+PROGRESO_ADVERTENCIA = "advertencia"
+PROGRESO_ERROR = "error"
+
+# Orden de las etapas de una corrida completa; define el porcentaje al terminar cada una
+ORDEN_ETAPAS = (
+    "manifiesto", "leer_empleados", "horas_manuales", "leer_asistencia", "validar_asistencia",
+    "horas_por_dia", "resumir_quincena", "calcular_pagos", "leer_prestamos", "aplicar_prestamos",
+    "armar_nomina", "comparar_anterior", "guardar_prestamos", "guardar_nomina", "guardar_seguridad",
+    "guardar_salidas_extra", "guardar_manifiesto", "registrar_historial",
+)
+
+
+@dataclass(frozen=True)
+class EventoProgreso:
+    """Un evento de progreso: etapa iniciada/terminada (con porcentaje), mensaje, advertencia o error."""
+    tipo: str
+    mensaje: str = ""
+    etapa: Optional[str] = None
+    porcentaje: Optional[float] = None
+
+
+# Receptor de eventos del hilo actual (cada hilo de la GUI tiene el suyo)
+_progreso_local = threading.local()
+
+
+class _CanalProgreso:
+    """`with _CanalProgreso(callback):` envía a `callback` los eventos de este hilo; None no cambia nada."""
+    __slots__ = ("callback", "_anterior")
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __enter__(self):
+        self._anterior = getattr(_progreso_local, "callback", None)
+        if self.callback is not None:
+            _progreso_local.callback = self.callback
+        return self
+
+    def __exit__(self, *exc):
+        _progreso_local.callback = self._anterior
+        return False
+
+
+def _emitir_progreso(evento: EventoProgreso) -> None:
+    callback = getattr(_progreso_local, "callback", None)
+    if callback is not None:
+        callback(evento)
+
+
+def _informar(mensaje: str = "") -> None:
+    """`print` que además envía el mensaje como evento (error/advertencia según el prefijo)."""
+    print(mensaje)
+    if getattr(_progreso_local, "callback", None) is None:
+        return
+    if mensaje.startswith("[ERROR]"):
+        tipo = PROGRESO_ERROR
+    elif mensaje.startswith("[ADVERTENCIA]"):
+        tipo = PROGRESO_ADVERTENCIA
+    else:
+        tipo = PROGRESO_MENSAJE
+    _emitir_progreso(EventoProgreso(tipo, mensaje))
+
+
+class _EtapaMetricas:
+    """
+    Cronómetro de una etapa (`with metricas.etapa(...) as e:`); al salir guarda el tiempo.
+    Emite los eventos de inicio y fin de etapa al receptor de progreso, si hay uno.
+    """
+    __slots__ = ("metricas", "nombre", "filas_entrada", "filas_salida", "_inicio")
+
+    def __init__(self, metricas, nombre, filas_entrada=None):
+        self.metricas = metricas
+        self.nombre = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+
+    def __enter__(self):
+        _emitir_progreso(EventoProgreso(PROGRESO_ETAPA_INICIO, etapa=self.nombre))
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self._inicio
+        datos = self.metricas.etapas.setdefault(self.nombre, {"segundos": 0.0})
+        datos["segundos"] += segundos
+        if self.filas_entrada is not None:
+            datos["filas_entrada"] = self.filas_entrada
+        if self.filas_salida is not None:
+            datos["filas_salida"] = self.filas_salida
+        porcentaje = None
+        if self.nombre in ORDEN_ETAPAS:
+            porcentaje = round(100 * (ORDEN_ETAPAS.index(self.nombre) + 1) / len(ORDEN_ETAPAS), 1)
+        _emitir_progreso(EventoProgreso(PROGRESO_ETAPA_FIN, etapa=self.nombre, porcentaje=porcentaje))
+        return False
+
+
+class MetricasCorrida:
+    """
+    Tiempos por etapa (con filas de entrada/salida) y contadores de una corrida de nómina.
+    Solo guarda números en diccionarios; `guardar` los agrega a un log JSONL si se pide.
+    """
+    __slots__ = ("inicio", "etapas", "contadores")
+
+    def __init__(self):
+        self.inicio = datetime.now()
+        self.etapas = {}
+        self.contadores = {}
+
+    def etapa(self, nombre: str, filas_entrada=None) -> _EtapaMetricas:
+        return _EtapaMetricas(self, nombre, filas_entrada)
+
+    def contar(self, nombre: str, valor=1) -> None:
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + valor
+
+    @property
+    def total_segundos(self) -> float:
+        return sum(e["segundos"] for e in self.etapas.values())
+
+    def como_dict(self) -> dict:
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "total_segundos": round(self.total_segundos, 6),
+            "etapas": {k: {c: (round(v, 6) if c == "segundos" else v) for c, v in e.items()} for k, e in self.etapas.items()},
+            "contadores": dict(self.contadores),
         }
+
+    def resumen(self) -> str:
+        lineas = [f"{'Etapa':<22}{'Segundos':>10}{'Entrada':>10}{'Salida':>10}"]
+        for nombre, e in self.etapas.items():
+            lineas.append(
+                f"{nombre:<22}{e['segundos']:>10.3f}{e.get('filas_entrada', ''):>10}{e.get('filas_salida', ''):>10}"
+            )
+        lineas.append(f"{'Total':<22}{self.total_segundos:>10.3f}")
+        lineas.extend(f"{nombre}: {valor}" for nombre, valor in self.contadores.items())
+        return "\n".join(lineas)
+
+    def guardar(self, archivo=None, **extra) -> None:
+        """Agrega estas métricas como una línea JSON al log (por defecto datos/metricas_nomina.jsonl)."""
+        if archivo is None:
+            archivo = DEFAULT_METRICAS_LOG
+        os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+        with open(archivo, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**extra, **self.como_dict()}, ensure_ascii=False, default=str) + "\n")
+
+
+@dataclass
+class PayrollRun:
+    """
+    Resultado en memoria de una corrida de nómina (`calcular_vista_previa_nomina`): las nóminas
+    principal y de seguridad, el período, los cambios de préstamos pendientes y los mensajes.
+    `guardar_nomina_quincenal` lo persiste; los recibos y el visor lo pueden usar sin releer Excel.
+    """
+    nomina: Optional[pd.DataFrame] = None
+    nomina_seguridad: Optional[pd.DataFrame] = None
+    fecha_pago: Optional[pd.Timestamp] = None
+    quincena_inicio: Optional[pd.Timestamp] = None
+    quincena_fin: Optional[pd.Timestamp] = None
+    prestamos_file: str = DEFAULT_PRESTAMOS_FILE
+    prestamos_mtime: Optional[int] = None
+    prestamos_df: Optional[pd.DataFrame] = None
+    pagos_prestamos_df: Optional[pd.DataFrame] = None
+    pagos_prestamo_nuevos: Optional[pd.DataFrame] = None  # delta de préstamos de esta corrida
+    prestamos_modificados: bool = False
+    advertencias: list = field(default_factory=list)
+    errores: list = field(default_factory=list)
+    errores_asistencia: list = field(default_factory=list)  # dicts de validate_attendance_records
+    archivo_nomina: Optional[str] = None
+    archivo_seguridad: Optional[str] = None
+    archivos_extra: dict = field(default_factory=dict)  # salidas CSV/binarias: nombre -> ruta
+    horas_resumen: Optional[pd.DataFrame] = None  # horas por empleado (entrada de los escenarios)
+    empleados: Optional[TablaEmpleados] = None
+    manifiesto: Optional[dict] = None
+    recalculados: list = field(default_factory=list)  # IDs de un recálculo parcial
+    diferencia_anterior: Optional["DiferenciaNomina"] = None  # contra la quincena anterior guardada
+    metricas: MetricasCorrida = field(default_factory=MetricasCorrida)
+
+    @property
+    def ok(self) -> bool:
+        """True si la nómina se calculó (y, si ya se guardó, sin errores al guardar)."""
+        return self.nomina is not None and not self.errores
+
+    def evaluar_escenarios(self, escenarios):
+        """`evaluar_escenarios` sobre las horas de esta corrida (sin recalcular horas)."""
+        if self.horas_resumen is None or self.empleados is None:
+            raise ValueError("La corrida no tiene horas calculadas")
+        return evaluar_escenarios(self.horas_resumen, self.empleados, escenarios)
+
+    def comparar_con(self, anterior=None, umbral: float = 0.01) -> DiferenciaNomina:
+        """
+        `comparar_nominas` contra otra nómina; por defecto la de la quincena anterior guardada en
+        la carpeta de esta nómina (la de datos si todavía no se guardó).
+        """
+        if anterior is None:
+            carpeta = os.path.dirname(os.path.abspath(self.archivo_nomina)) if self.archivo_nomina else None
+            anterior = archivo_nomina_anterior(self.fecha_pago, carpeta)
+        return comparar_nominas(anterior, self, umbral)
+
+    def _error(self, mensaje: str) -> "PayrollRun":
+        _informar(f"[ERROR] {mensaje}")
+        self.errores.append(mensaje)
+        return self
+
+    def _advertencia(self, mensaje: str) -> None:
+        _informar(f"[ADVERTENCIA] {mensaje}")
+        self.advertencias.append(mensaje)
+
+
+@perfilable()
+def calcular_vista_previa_nomina(employees_file=None,
+                                 hours_file=None,
+                                 quincena_fecha=None,
+                                 prestamos_file: str = DEFAULT_PRESTAMOS_FILE,
+                                 seguridad_horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE,
+                                 manual_hours_df=None,
+                                 usar_cache: bool = True,
+                                 progreso=None) -> PayrollRun:
+    """
+    Calcula la nómina quincenal completa en memoria, sin escribir ningún archivo: ni la nómina
+    ni `prestamos.xlsx`. Para guardar el resultado una vez aprobado usar `guardar_nomina_quincenal`.
+    Si ya se calculó una corrida con el mismo manifiesto (mismo contenido de archivos, quincena
+    y versión) se devuelve de la caché sin recalcular.
+
+    Args: los mismos de `calculate_payroll_quincenal` (sin output_file), más usar_cache.
+
+    Returns:
+        `PayrollRun`; si hay errores trae `errores` (y `errores_asistencia`) y `ok` es False
+    """
+    with _CanalProgreso(progreso):
+        if employees_file is None:
+            employees_file = DEFAULT_EMPLOYEES_FILE
+        if hours_file is None:
+            hours_file = DEFAULT_HOURS_FILE
+
+        metricas = MetricasCorrida()
+        with metricas.etapa("manifiesto"):
+            manifiesto = construir_manifiesto(
+                employees_file, hours_file, quincena_fecha, prestamos_file, seguridad_horario_file, manual_hours_df
+            )
+        clave = manifiesto["clave"]
+        if usar_cache and clave in _cache_nominas:
+            _cache_nominas.move_to_end(clave)
+            cacheado = _cache_nominas[clave]
+            _informar("[OK] Nómina tomada de la caché (mismos archivos de entrada y quincena)")
+            metricas.contar("cache_hit")
+            # Mismo contenido de prestamos.xlsx: se actualiza la marca usada al guardar
+            run = replace(
+                _copiar_run(cacheado),
+                errores=[],
+                prestamos_mtime=_mtime_archivo(prestamos_file),
+                archivo_nomina=None,
+                archivo_seguridad=None,
+                archivos_extra={},
+                metricas=metricas,
+            )
+        else:
+            run = _calcular_vista_previa_nomina(
+                employees_file, hours_file, quincena_fecha, prestamos_file, seguridad_horario_file, manual_hours_df,
+                metricas
+            )
+            run.manifiesto = manifiesto
+            if run.ok:
+                _cache_nominas[clave] = _copiar_run(run)
+                while len(_cache_nominas) > CACHE_NOMINAS_MAX:
+                    _cache_nominas.popitem(last=False)
+
+        # Comparación automática con la quincena anterior guardada en la carpeta de datos, fuera
+        # de la caché (la nómina anterior puede haber cambiado): solo con el archivo de empleados
+        # por defecto (otra sede guarda sus nóminas en otra carpeta y se compara al guardar)
+        if run.ok and _misma_ruta(employees_file, DEFAULT_EMPLOYEES_FILE):
+            _comparar_con_anterior(run, DATA_DIR)
+        return run
+
+
+def _calcular_vista_previa_nomina(employees_file, hours_file, quincena_fecha, prestamos_file,
+                                  seguridad_horario_file, manual_hours_df, metricas=None) -> PayrollRun:
+    """Cálculo de `calcular_vista_previa_nomina` (sin caché)."""
+    run = PayrollRun(prestamos_file=prestamos_file)
+    if metricas is not None:
+        run.metricas = metricas
+    metricas = run.metricas
+    _informar("="*80)
+    _informar("SISTEMA DE NOMINA QUINCENAL")
+    _informar("="*80)
+    
+    # Leer archivo de empleados
+    _informar(f"\nLeyendo informacion de empleados desde: {employees_file}")
+    with metricas.etapa("leer_empleados") as etapa:
+        try:
+            employees_df = _leer_archivo_empleados(employees_file)
+            _informar(f"[OK] Encontrados {len(employees_df)} empleados")
+        except Exception as e:
+            return run._error(f"Error al leer {employees_file}: {e}")
+
+        try:
+            empleados = TablaEmpleados.desde_dataframe(employees_df)
+        except Exception as e:
+            return run._error(f"Error al interpretar columnas de {employees_file}: {e}")
+        etapa.filas_entrada, etapa.filas_salida = len(employees_df), len(empleados)
+
+    # Identificar empleados de seguridad (nuevo tipo)
+    security_ids = empleados.ids_seguridad()
+    
+    # --- Ruta con horas manuales (sin reporte biométrico) ---
+    if manual_hours_df is not None and not manual_hours_df.empty:
+        if quincena_fecha is None:
+            return run._error("Al usar horas manuales debe indicar la fecha de referencia de la quincena (quincena_fecha).")
+        quincena_fecha = _parsear_quincena_fecha(quincena_fecha)
+        quincena_inicio_target, quincena_fin_target, fecha_pago = periodo_quincena(quincena_fecha)
+        _informar(f"Calculando nómina con HORAS MANUALES para quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
+        with metricas.etapa("horas_manuales", filas_entrada=len(manual_hours_df)) as etapa:
+            horas_resumen_df = resumir_horas_manuales(manual_hours_df, quincena_inicio_target, quincena_fin_target)
+            etapa.filas_salida = len(horas_resumen_df)
+        _informar(f"[OK] Horas manuales convertidas para {len(horas_resumen_df)} empleados")
+    else:
+        # --- Ruta normal: reporte de asistencia biométrico ---
+        _informar(f"\nLeyendo reporte de asistencia desde: {hours_file}")
+        with metricas.etapa("leer_asistencia") as etapa:
+            try:
+                hours_df = lectura_cacheada("asistencia", hours_file, leer_reporte_asistencia)
+                _informar(f"[OK] Encontrados {len(hours_df)} registros de asistencia")
+            except Exception as e:
+                return run._error(f"Error al leer {hours_file}: {e}")
+
+            if not pd.api.types.is_datetime64_any_dtype(hours_df["fecha"]):
+                hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], errors="coerce")
+                if hours_df["fecha"].isna().any():
+                    hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], format="%d/%m/%Y", errors="coerce")
+            etapa.filas_salida = len(hours_df)
+        
+        _informar("\nValidando registros de asistencia...")
+        with metricas.etapa("validar_asistencia", filas_entrada=len(hours_df)) as etapa:
+            errors = validate_attendance_records(hours_df, security_ids=security_ids)
+            etapa.filas_salida = len(errors)
+        if errors:
+            _informar("\n" + "="*80)
+            _informar("ERRORES ENCONTRADOS - CORRIJA ANTES DE CONTINUAR")
+            _informar("="*80)
+            for error in errors:
+                _informar(f"\n{error['mensaje']}")
+            _informar("\n" + "="*80)
+            run.errores_asistencia = errors
+            run.errores.extend(error['mensaje'] for error in errors)
+            return run
+        _informar("[OK] Todos los registros son validos")
+
+        if quincena_fecha is None:
+            fecha_maxima = hours_df["fecha"].max()
+            quincena_fecha = fecha_maxima
+            _informar(f"Calculando nómina para la quincena más reciente (fecha de referencia: {quincena_fecha.strftime('%d/%m/%Y')})")
+        else:
+            quincena_fecha = _parsear_quincena_fecha(quincena_fecha)
+            _informar(f"Calculando nómina para quincena que contiene la fecha: {quincena_fecha.strftime('%d/%m/%Y')}")
+        
+        quincena_inicio_target, quincena_fin_target, fecha_pago = periodo_quincena(quincena_fecha)
+        _informar(f"Período de la quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
+
+        with metricas.etapa("horas_por_dia", filas_entrada=len(hours_df)) as etapa:
+            seguridad_cfg = cargar_seguridad_config(seguridad_horario_file)
+            _informar("\nCalculando horas trabajadas por dia...")
+            daily_hours_df = calculate_hours_per_day_mixed(hours_df, security_ids=security_ids, security_config=seguridad_cfg)
+            etapa.filas_salida = len(daily_hours_df)
+        _informar(f"[OK] Horas calculadas para {len(daily_hours_df)} dias")
+        _informar("\nAgrupando en períodos quincenales...")
+        with metricas.etapa("resumir_quincena", filas_entrada=len(daily_hours_df)) as etapa:
+            daily_hours_df = get_quincena_periods(daily_hours_df)
+            daily_hours_df = daily_hours_df[daily_hours_df['quincena_inicio'] == quincena_inicio_target]
+            if not daily_hours_df.empty:
+                _informar(f"[OK] Encontrados datos para {len(daily_hours_df)} días en esta quincena")
+            horas_resumen_df = resumir_horas_quincena(daily_hours_df)
+            etapa.filas_salida = len(horas_resumen_df)
+    
+    if horas_resumen_df.empty:
+        return run._error(f"No se encontraron datos para la quincena del {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
     
     # Calcular nómina por quincena (solo una quincena ahora)
     # Empleados de seguridad van solo a nomina_seguridad_*.xlsx; no aparecen en la nómina normal
-    print("\nCalculando nómina...")
-    payroll_results = []
-    payroll_results_seguridad = []
+    _informar("\nCalculando nómina...")
+    with metricas.etapa("calcular_pagos", filas_entrada=len(horas_resumen_df)) as etapa:
+        pagos = calcular_pagos_quincena(horas_resumen_df, empleados)
+        etapa.filas_salida = int(pagos["encontrado"].sum())
+    metricas.contar("empleados_no_encontrados", int((~pagos["encontrado"]).sum()))
+    for employee_id in horas_resumen_df.loc[~pagos["encontrado"], "ID"]:
+        run._advertencia(f"Empleado con ID {employee_id} no encontrado en archivo de empleados")
+    horas_resumen_df = horas_resumen_df[pagos["encontrado"]].reset_index(drop=True)
+    pagos = pagos[pagos["encontrado"]].reset_index(drop=True)
+    fila = pagos["fila_empleado"].to_numpy()
+    ids_normalizados = empleados.ids[fila]
+    nombres = empleados.nombre[fila]
 
     # Cargar préstamos una sola vez (si existe el archivo)
     prestamos_enabled = True
     any_prestamo_changes = False
-    try:
-        prestamos_df, pagos_df = leer_prestamos(prestamos_file)
-    except Exception:
-        prestamos_enabled = False
-        prestamos_df, pagos_df = pd.DataFrame(), pd.DataFrame()
-        print(f"[ADVERTENCIA] No se pudo cargar '{prestamos_file}'. Se omitirá el descuento de préstamos.")
-    
-    for (employee_id, quincena_inicio), group in daily_hours_df.groupby(['ID', 'quincena_inicio']):
-        employee_id_str = str(employee_id)
-        
-        # Buscar información del empleado
-        if employee_id_str not in employees_dict:
-            print(f"[ADVERTENCIA] Empleado con ID {employee_id} no encontrado en archivo de empleados")
-            continue
-        
-        emp_info = employees_dict[employee_id_str]
-        total_horas = group['horas_trabajadas'].sum()
-        total_horas_extra = group['horas_extra'].sum()  # Horas trabajadas después de las 3 PM
-        quincena_fin = group['quincena_fin'].iloc[0]
-        
-        # Inicializar variables de pago
-        pago_extra = 0.0
-        pago_feriado_domingo = 0.0
-        bono_horas_extra = 0.0
-        
-        # Calcular pago según el tipo de empleado
-        force_hourly = bool(emp_info.get('seguridad', False))
-        if emp_info['salario_fijo'] and not force_hourly:
-            # Empleado con salario fijo: recibe el mismo salario sin importar horas (no recibe pago extra)
-            pago_quincenal = emp_info['salario'] / 2  # Salario mensual dividido en 2 quincenas
-            pago_extra = 0.0  # Los empleados con salario fijo no reciben pago extra
-            pago_feriado_domingo = 0.0  # Los empleados con salario fijo no reciben pago extra por feriados/domingos
-            tipo_pago = "Salario Fijo"
-        elif emp_info['empleado_fijo'] and not force_hourly:
-            # Empleado fijo con sueldo mínimo: cobra salario mínimo garantizado + bono por horas extra
-            salario_minimo = emp_info['salario_minimo']
-            salario_por_hora = emp_info['salario']
-            
-            # Calcular horas requeridas para el salario mínimo (mensual)
-            # Para la quincena, necesitamos las horas requeridas quincenales
-            if salario_por_hora > 0:
-                horas_requeridas_mensual = salario_minimo / salario_por_hora
-                horas_requeridas_quincenal = horas_requeridas_mensual / 2  # Dividir entre 2 quincenas
-            else:
-                horas_requeridas_quincenal = 0
-            
-            # Separar horas normales, horas extra (después 3 PM) y horas en feriados/domingos
-            horas_normales = 0.0
-            horas_extra_normales = 0.0  # Horas extra en días normales
-            horas_feriado_domingo = 0.0  # Horas trabajadas en feriados/domingos (todas)
-            
-            for _, row in group.iterrows():
-                horas_dia = row['horas_trabajadas']
-                horas_extra_dia = row['horas_extra']
-                es_feriado_domingo = row['es_feriado_domingo']
-                
-                if es_feriado_domingo:
-                    # Si es feriado o domingo, todas las horas se pagan con 50% adicional
-                    horas_feriado_domingo += horas_dia
-                else:
-                    # Día normal
-                    horas_normales += (horas_dia - horas_extra_dia)
-                    horas_extra_normales += horas_extra_dia
-            
-            # Pago base: salario mínimo garantizado (quincenal)
-            pago_base = salario_minimo / 2  # Salario mínimo mensual dividido en 2 quincenas
-            
-            # Calcular horas trabajadas totales para determinar el bono
-            # IMPORTANTE: El bono NO debe incluir las horas extra después de 3 PM (o 12 PM en sábados)
-            # porque esas horas ya se pagan con 25% adicional por separado
-            # El bono se calcula solo sobre horas normales + horas en feriados/domingos
-            horas_para_bono = horas_normales + horas_feriado_domingo
-            
-            # Bono por horas extra: si trabajó más de las horas requeridas, se paga como bono adicional
-            # El bono se calcula solo sobre horas normales (sin horas extra después 3 PM) y se paga a precio normal
-            horas_extra_para_bono = max(0, horas_para_bono - horas_requeridas_quincenal)
-            bono_horas_extra = horas_extra_para_bono * salario_por_hora
-            
-            # Pago extra: 25% adicional sobre el salario por hora para horas después de las 3 PM en días normales
-            salario_hora_extra = salario_por_hora * 1.25
-            pago_extra = salario_hora_extra * horas_extra_normales
-            
-            # Pago feriado/domingo: 50% adicional sobre el salario por hora para TODAS las horas trabajadas en feriados/domingos
-            salario_hora_feriado_domingo = salario_por_hora * 1.50
-            pago_feriado_domingo = salario_hora_feriado_domingo * horas_feriado_domingo
-            
-            # Pago total: salario mínimo + bono por horas extra + pago extra (25%) + pago feriado/domingo (50%)
-            pago_quincenal = pago_base + bono_horas_extra + pago_extra + pago_feriado_domingo
-            tipo_pago = "Empleado Fijo"
-        else:
-            # Empleado no fijo: salario por horas trabajadas
-            # Asumimos que el salario es por hora
-            
-            # Separar horas normales, horas extra (después 3 PM) y horas en feriados/domingos
-            horas_normales = 0.0
-            horas_extra_normales = 0.0  # Horas extra en días normales
-            horas_feriado_domingo = 0.0  # Horas trabajadas en feriados/domingos (todas)
-            
-            for _, row in group.iterrows():
-                horas_dia = row['horas_trabajadas']
-                horas_extra_dia = row['horas_extra']
-                es_feriado_domingo = row['es_feriado_domingo']
-                
-                if es_feriado_domingo:
-                    # Si es feriado o domingo, todas las horas se pagan con 50% adicional
-                    horas_feriado_domingo += horas_dia
-                else:
-                    # Día normal
-                    horas_normales += (horas_dia - horas_extra_dia)
-                    horas_extra_normales += horas_extra_dia
-            
-            # Calcular pagos
-            # Pago normal: horas normales (antes de 3 PM en días normales)
-            pago_normal = emp_info['salario'] * horas_normales
-            
-            # Pago extra: 25% adicional sobre el salario por hora para horas después de las 3 PM en días normales
-            salario_hora_extra = emp_info['salario'] * 1.25
-            pago_extra = salario_hora_extra * horas_extra_normales
-            
-            # Pago feriado/domingo: 50% adicional sobre el salario por hora para TODAS las horas trabajadas en feriados/domingos
-            # Salario por hora en feriado/domingo = salario base * 1.50 (50% adicional)
-            salario_hora_feriado_domingo = emp_info['salario'] * 1.50
-            pago_feriado_domingo = salario_hora_feriado_domingo * horas_feriado_domingo
-            
-            pago_quincenal = pago_normal + pago_extra + pago_feriado_domingo
-            tipo_pago = "Seguridad (Por horas)" if force_hourly else "Por horas"
-        
-        # Calcular descuentos por contrato
-        seguro_social = 0.0
-        seguro_educativo = 0.0
-        descuento_islr = 0.0
-        if emp_info['empleado_por_contrato']:
-            seguro_social = pago_quincenal * 0.0975
-            seguro_educativo = pago_quincenal * 0.0125
-            descuento_islr = emp_info['islr']
-        total_descuentos_base = seguro_social + seguro_educativo + descuento_islr
-
-        # Descuento por préstamos (si aplica). Se capea para no dejar neto negativo.
-        descuento_prestamo = 0.0
-        saldo_prestamo_total = 0.0
-        if prestamos_enabled:
-            try:
-                pago_cent = _money_to_cents(pago_quincenal)
-                base_desc_cent = _money_to_cents(total_descuentos_base)
-                max_prestamo_cent = max(0, pago_cent - base_desc_cent)
-                prestamo_cent, saldo_total_cent, pagos_df = aplicar_descuento_prestamos_en_memoria(
+    with metricas.etapa("leer_prestamos") as etapa:
+        try:
+            prestamos_df, pagos_df = leer_prestamos(prestamos_file)
+        except Exception:
+            prestamos_enabled = False
+            prestamos_df, pagos_df = pd.DataFrame(), pd.DataFrame()
+            run._advertencia(f"No se pudo cargar '{prestamos_file}'. Se omitirá el descuento de préstamos.")
+        etapa.filas_salida = len(prestamos_df)
+    prestamos_mtime = _mtime_archivo(prestamos_file) if prestamos_enabled else None
+    pagos_prestamo_previos = len(pagos_df)
+
+    # Descuento por préstamos (si aplica). Se capea para no dejar neto negativo.
+    descuento_prestamo = np.zeros(len(horas_resumen_df), dtype=np.int64)
+    saldo_prestamo_total = np.zeros(len(horas_resumen_df), dtype=np.int64)
+    if prestamos_enabled:
+        max_prestamo = np.maximum(
+            0, pagos["pago_quincenal_centavos"].to_numpy() - pagos["total_descuentos_base_centavos"].to_numpy()
+        )
+        try:
+            with metricas.etapa("aplicar_prestamos", filas_entrada=len(ids_normalizados)) as etapa:
+                descuento_prestamo, saldo_prestamo_total, pagos_df = aplicar_descuentos_prestamos_lote(
                     prestamos_df,
                     pagos_df,
-                    employee_id_str,
-                    emp_info['nombre'],
+                    ids_normalizados,
+                    nombres,
+                    max_prestamo,
                     fecha_pago,
-                    quincena_inicio,
-                    quincena_fin,
-                    max_prestamo_cent,
+                    horas_resumen_df["quincena_inicio"].to_numpy(),
+                    horas_resumen_df["quincena_fin"].to_numpy(),
                 )
-                descuento_prestamo = _cents_to_money(prestamo_cent)
-                saldo_prestamo_total = _cents_to_money(saldo_total_cent)
-                if prestamo_cent > 0:
-                    any_prestamo_changes = True
-            except Exception as e:
-                print(f"[ADVERTENCIA] No se pudo aplicar préstamo para empleado {employee_id_str}: {e}")
-
-        total_descuentos = total_descuentos_base + descuento_prestamo
-
-        # Resumen de turnos de seguridad (si aplica)
-        turnos_dia = 0
-        turnos_noche = 0
-        alerta_seguridad = ""
-        horas_reales_seguridad = ""
-        dif_turno_min = ""
-        if emp_info.get("seguridad", False) and "turno_seguridad" in group.columns:
-            turnos_dia = int((group["turno_seguridad"].astype(str).str.strip() == "Día").sum())
-            turnos_noche = int((group["turno_seguridad"].astype(str).str.strip() == "Noche").sum())
-            # Si hay alertas en la quincena, concatenarlas (únicas)
-            if "alerta_seguridad" in group.columns:
-                alerts = [a for a in group["alerta_seguridad"].astype(str).tolist() if str(a).strip()]
-                if alerts:
-                    uniq = list(dict.fromkeys(alerts))
-                    alerta_seguridad = " | ".join(uniq[:3]) + (" | ..." if len(uniq) > 3 else "")
-            if "horas_reales_seguridad" in group.columns:
-                try:
-                    horas_reales_seguridad = round(float(group["horas_reales_seguridad"].mean()), 2)
-                except Exception:
-                    horas_reales_seguridad = ""
-            if "diferencia_turno_seguridad_min" in group.columns:
-                try:
-                    dif_turno_min = int(round(float(group["diferencia_turno_seguridad_min"].mean())))
-                except Exception:
-                    dif_turno_min = ""
-
-        # Preparar datos para el resultado (nómina normal: sin empleados de seguridad)
-        resultado = {
-            'ID': employee_id,
-            'Nombre': emp_info['nombre'],
-            'Cargo': emp_info['cargo'],
-            'Tipo': tipo_pago,
-            'Salario Fijo': 'Sí' if emp_info['salario_fijo'] else 'No',
-            'Empleado Fijo': 'Sí' if emp_info['empleado_fijo'] else 'No',
-            'Empleado por contrato': 'Sí' if emp_info['empleado_por_contrato'] else 'No',
-            'Salario Base': emp_info['salario'],
-            'Quincena Inicio': quincena_inicio.strftime('%d/%m/%Y'),
-            'Quincena Fin': quincena_fin.strftime('%d/%m/%Y'),
-            'Total Horas Trabajadas': round(total_horas, 2),
-            'Horas Extra (después 3 PM)': round(total_horas_extra, 2),
-            'Pago Extra (25% adicional)': round(pago_extra, 2),
-            'Pago Quincenal': round(pago_quincenal, 2),
-            'Seguro Social (9.75%)': round(seguro_social, 2),
-            'Seguro Educativo (1.25%)': round(seguro_educativo, 2),
-            'ISLR': round(descuento_islr, 2),
-            'Descuento Préstamo': round(descuento_prestamo, 2),
-            'Total Descuentos': round(total_descuentos, 2),
-            'Total Saldo Préstamo': round(saldo_prestamo_total, 2),
-            'Número de Cuenta': emp_info['n_de_cuenta'],
-            'Banco': emp_info['banco'],
-            'Tipo de Cuenta': emp_info['tipo_de_cuenta']
-        }
-        horas_feriado_domingo_total = group[group['es_feriado_domingo'] == True]['horas_trabajadas'].sum()
-        resultado['Horas Feriado/Domingo'] = round(horas_feriado_domingo_total, 2)
-        resultado['Pago Feriado/Domingo (50% adicional)'] = round(pago_feriado_domingo, 2)
-        resultado['Bono Horas Extra'] = round(bono_horas_extra, 2)
-
-        if emp_info.get('seguridad', False):
-            payroll_results_seguridad.append(resultado)
-        else:
-            payroll_results.append(resultado)
-    
-    if not payroll_results and not payroll_results_seguridad:
-        print("[ERROR] No se pudo calcular la nomina. Verifique los datos.")
-        return None
+                etapa.filas_salida = len(pagos_df) - pagos_prestamo_previos
+            any_prestamo_changes = bool((descuento_prestamo > 0).any())
+            nuevos = pagos_df.iloc[pagos_prestamo_previos:]
+            metricas.contar("pagos_prestamo_nuevos", len(nuevos))
+            metricas.contar("prestamos_tocados", int(nuevos["loan_id"].nunique()) if len(nuevos) else 0)
+        except Exception as e:
+            descuento_prestamo = np.zeros(len(horas_resumen_df), dtype=np.int64)
+            saldo_prestamo_total = np.zeros(len(horas_resumen_df), dtype=np.int64)
+            run._advertencia(f"No se pudo aplicar el descuento de préstamos: {e}")
+
+    with metricas.etapa("armar_nomina", filas_entrada=len(horas_resumen_df)) as etapa:
+        resultados = _filas_nomina(horas_resumen_df, pagos, empleados, descuento_prestamo, saldo_prestamo_total)
+        etapa.filas_salida = len(resultados)
+    es_seguridad = empleados.seguridad[fila]
+    metricas.contar("empleados_nomina", int((~es_seguridad).sum()))
+    metricas.contar("empleados_seguridad", int(es_seguridad.sum()))
+    payroll_results = resultados[~es_seguridad].reset_index(drop=True)
+    payroll_results_seguridad = resultados[es_seguridad].reset_index(drop=True)
+
+    if payroll_results.empty and payroll_results_seguridad.empty:
+        return run._error("No se pudo calcular la nomina. Verifique los datos.")
 
     # Nómina normal (sin empleados de seguridad)
-    columnas_principal = ['ID', 'Nombre', 'Cargo', 'Tipo', 'Salario Fijo', 'Empleado Fijo', 'Empleado por contrato',
-                'Salario Base', 'Quincena Inicio', 'Quincena Fin', 'Fecha de Pago',
-                'Total Horas Trabajadas', 'Horas Extra (después 3 PM)',
-                'Pago Extra (25% adicional)', 'Bono Horas Extra', 'Horas Feriado/Domingo',
-                'Pago Feriado/Domingo (50% adicional)',
-                'Seguro Social (9.75%)', 'Seguro Educativo (1.25%)', 'ISLR', 'Descuento Préstamo', 'Total Descuentos', 'Total Saldo Préstamo',
-                'Número de Cuenta', 'Banco', 'Tipo de Cuenta', 'Total Pago a Empleados']
-    payroll_df = pd.DataFrame(payroll_results) if payroll_results else pd.DataFrame(columns=columnas_principal)
+    fecha_pago_texto = fecha_pago.strftime('%d/%m/%Y')
+    payroll_df = payroll_results
     if not payroll_df.empty:
         payroll_df = payroll_df.sort_values(['Nombre'])
-
-    # Guardar cambios de préstamos si se aplicaron descuentos
-    if prestamos_enabled and any_prestamo_changes:
-        try:
-            guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
-        except Exception as e:
-            print(f"[ADVERTENCIA] No se pudieron guardar los cambios en préstamos: {e}")
-    
-    # Generar nombre de archivo si no se especificó (guardar en carpeta datos)
-    if output_file is None:
-        fecha_pago_str = fecha_pago.strftime('%Y%m%d')
-        os.makedirs(DATA_DIR, exist_ok=True)
-        output_file = os.path.join(DATA_DIR, f"nomina_quincenal_pago_{fecha_pago_str}.xlsx")
-    
-    # Agregar columna de fecha de pago y Total Pago a Empleados
-    payroll_df['Fecha de Pago'] = fecha_pago.strftime('%d/%m/%Y')
-    if 'Pago Quincenal' in payroll_df.columns:
-        payroll_df = payroll_df.rename(columns={'Pago Quincenal': 'Total Pago a Empleados'})
-        if 'Total Descuentos' in payroll_df.columns:
-            payroll_df['Total Pago a Empleados'] = payroll_df['Total Pago a Empleados'] - payroll_df['Total Descuentos']
+    payroll_df['Fecha de Pago'] = fecha_pago_texto
 
     # Mostrar resumen (nómina normal)
-    print("\n" + "="*80)
-    print("RESUMEN DE NOMINA (empleados no seguridad)")
-    print("="*80)
-    print(f"Quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
-    print(f"Fecha de pago: {fecha_pago.strftime('%d/%m/%Y')}")
+    _informar("\n" + "="*80)
+    _informar("RESUMEN DE NOMINA (empleados no seguridad)")
+    _informar("="*80)
+    _informar(f"Quincena: {quincena_inicio_target.strftime('%d/%m/%Y')} a {quincena_fin_target.strftime('%d/%m/%Y')}")
+    _informar(f"Fecha de pago: {fecha_pago_texto}")
     if not payroll_df.empty:
-        print(f"Total de empleados: {payroll_df['Nombre'].nunique()}")
-        print(f"Total de pagos: {len(payroll_df)}")
-        print(f"Total horas extra (después 3 PM): {payroll_df['Horas Extra (después 3 PM)'].sum():.2f}")
-        print(f"Total pago extra (25% adicional): ${payroll_df['Pago Extra (25% adicional)'].sum():,.2f}")
+        _informar(f"Total de empleados: {payroll_df['Nombre'].nunique()}")
+        _informar(f"Total de pagos: {len(payroll_df)}")
+        _informar(f"Total horas extra (después 3 PM): {payroll_df['Horas Extra (después 3 PM)'].sum():.2f}")
+        _informar(f"Total pago extra (25% adicional): ${payroll_df['Pago Extra (25% adicional)'].sum():,.2f}")
         if 'Bono Horas Extra' in payroll_df.columns:
-            print(f"Total bono horas extra: ${payroll_df['Bono Horas Extra'].sum():,.2f}")
-        print(f"Total horas feriado/domingo: {payroll_df['Horas Feriado/Domingo'].sum():.2f}")
-        print(f"Total pago feriado/domingo (50% adicional): ${payroll_df['Pago Feriado/Domingo (50% adicional)'].sum():,.2f}")
+            _informar(f"Total bono horas extra: ${payroll_df['Bono Horas Extra'].sum():,.2f}")
+        _informar(f"Total horas feriado/domingo: {payroll_df['Horas Feriado/Domingo'].sum():.2f}")
+        _informar(f"Total pago feriado/domingo (50% adicional): ${payroll_df['Pago Feriado/Domingo (50% adicional)'].sum():,.2f}")
         total_pagar = payroll_df['Total Pago a Empleados'].sum() if 'Total Pago a Empleados' in payroll_df.columns else 0
     else:
-        print("Total de empleados: 0 (solo empleados de seguridad en esta quincena)")
+        _informar("Total de empleados: 0 (solo empleados de seguridad en esta quincena)")
         total_pagar = 0
-    print(f"Total a pagar: ${total_pagar:,.2f}")
-    print("="*80)
+    _informar(f"Total a pagar: ${total_pagar:,.2f}")
+    _informar("="*80)
+
+    # Nómina de seguridad (archivo aparte: solo horas trabajadas y datos esenciales para el pago)
+    seguridad_df = payroll_results_seguridad
+    seguridad_df['Fecha de Pago'] = fecha_pago_texto
+    seguridad_df = seguridad_df[[c for c in COLUMNAS_NOMINA_SEGURIDAD if c in seguridad_df.columns]].sort_values('Nombre')
+
+    run.nomina = payroll_df[[col for col in COLUMNAS_NOMINA if col in payroll_df.columns]]
+    run.nomina_seguridad = seguridad_df
+    run.fecha_pago = fecha_pago
+    run.quincena_inicio = quincena_inicio_target
+    run.quincena_fin = quincena_fin_target
+    run.prestamos_mtime = prestamos_mtime
+    run.prestamos_df = prestamos_df
+    run.pagos_prestamos_df = pagos_df
+    run.pagos_prestamo_nuevos = pagos_df.iloc[pagos_prestamo_previos:].reset_index(drop=True)
+    run.prestamos_modificados = prestamos_enabled and any_prestamo_changes
+    run.horas_resumen = horas_resumen_df
+    run.empleados = empleados
+    return run
+
+
+def _misma_ruta(a, b) -> bool:
+    return bool(a) and bool(b) and os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def _comparar_con_anterior(run: PayrollRun, carpeta) -> None:
+    """Deja en `run.diferencia_anterior` la comparación con la quincena anterior guardada en `carpeta` (None si no hay)."""
+    run.diferencia_anterior = None
+    anterior = archivo_nomina_anterior(run.fecha_pago, carpeta)
+    if not os.path.exists(anterior):
+        return
+    try:
+        with run.metricas.etapa("comparar_anterior"):
+            run.diferencia_anterior = run.comparar_con(anterior)
+        _informar(f"[OK] Comparada con {os.path.basename(anterior)}: {run.diferencia_anterior.resumen()}")
+    except Exception as e:
+        run._advertencia(f"No se pudo comparar con la nómina anterior: {e}")
 
-    columnas_existentes_principal = [col for col in columnas_principal if col in payroll_df.columns]
 
-    # Guardar nómina principal (solo empleados no seguridad)
-    print(f"\nGuardando nomina en: {output_file}")
+def escribir_nomina_excel(df: pd.DataFrame, archivo: str) -> None:
+    """Escribe una nómina (principal o de seguridad) con el escritor rápido y los formatos de FORMATOS_NOMINA."""
+    escribir_xlsx(df, archivo, formatos={c: f for c, f in FORMATOS_NOMINA.items() if c in df.columns})
+
+
+def _guardar_manifiesto(run: PayrollRun, manifiesto: dict) -> None:
+    """Escribe `<nomina>.manifest.json` con el manifiesto y el hash de los archivos guardados."""
+    output_file = run.archivo_nomina
+    base = output_file.rsplit('.', 1)[0] if '.' in output_file else output_file
+    manifiesto = dict(manifiesto)
+    manifiesto["guardado_en"] = datetime.now().isoformat(timespec="seconds")
+    manifiesto["salidas"] = {
+        nombre: {"ruta": os.path.abspath(ruta), "sha256": _sha256_archivo(ruta)}
+        for nombre, ruta in (("nomina", run.archivo_nomina), ("nomina_seguridad", run.archivo_seguridad),
+                             *run.archivos_extra.items())
+        if ruta
+    }
     try:
-        payroll_df[columnas_existentes_principal].to_excel(output_file, index=False, engine='openpyxl')
-        print(f"[OK] Nomina guardada exitosamente")
-        print(f"\nArchivo generado: {output_file}")
-        print(f"Fecha de pago: {fecha_pago.strftime('%d/%m/%Y')}")
+        with open(base + ".manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        run._advertencia(f"No se pudo guardar el manifiesto de la nómina: {e}")
+
+
+def _registrar_historial(run: PayrollRun, ids=None, db_path=None) -> None:
+    """Agrega la nómina guardada al historial (con `ids`, solo esas filas)."""
+    try:
+        n = historial.registrar_nomina(
+            run.nomina,
+            run.nomina_seguridad,
+            run.fecha_pago,
+            db_path=db_path,
+            ids=ids,
+            archivo_nomina=run.archivo_nomina,
+            manifiesto_clave=run.manifiesto.get("clave") if run.manifiesto else None,
+        )
+        _informar(f"[OK] Historial actualizado ({n} fila(s))")
     except Exception as e:
-        print(f"[ERROR] Error al guardar archivo: {e}")
-        return None
+        run._advertencia(f"No se pudo actualizar el historial de nóminas: {e}")
+
+
+@perfilable()
+def guardar_nomina_quincenal(run: PayrollRun, output_file=None, historial_db=None, metricas_log=None, progreso=None,
+                             salidas_extra=None):
+    """
+    Guarda una vista previa de `calcular_vista_previa_nomina` sin recalcular: los descuentos
+    de préstamos en `prestamos.xlsx`, la nómina principal y la de seguridad (`*_seguridad.xlsx`),
+    y la agrega al historial de nóminas (`historial.py`).
+    Si `prestamos.xlsx` cambió después de la vista previa no se guarda nada (hay que recalcular).
+    Deja las rutas guardadas en `run.archivo_nomina` / `run.archivo_seguridad`.
+    historial_db: base del historial (por defecto datos/historial_nomina.sqlite).
+    metricas_log: si se indica (ej. DEFAULT_METRICAS_LOG), agrega `run.metricas` a ese log JSONL.
+    progreso: callback que recibe un `EventoProgreso` por cada etapa y mensaje (ver calculate_payroll_quincenal).
+    salidas_extra: formatos a escribir además del Excel, de FORMATOS_SALIDA ("csv", "npz"); ver salidas_nomina.py.
+        Quedan en `run.archivos_extra`.
+
+    Returns:
+        DataFrame de la nómina principal guardada o None si hay errores
+    """
+    with _CanalProgreso(progreso):
+        if not run.ok:
+            return None
+        fecha_pago = run.fecha_pago
+        payroll_df = run.nomina
+        seguridad_df = run.nomina_seguridad
+        prestamos_file = run.prestamos_file
+        metricas = run.metricas
+
+        # Guardar cambios de préstamos si se aplicaron descuentos
+        if run.prestamos_modificados:
+            if _mtime_archivo(prestamos_file) != run.prestamos_mtime:
+                run._error(f"'{prestamos_file}' cambió después de la vista previa. Recalcule la nómina antes de guardar.")
+                return None
+            try:
+                with metricas.etapa("guardar_prestamos", filas_entrada=len(run.pagos_prestamos_df)):
+                    guardar_prestamos(run.prestamos_df, run.pagos_prestamos_df, prestamos_file)
+                metricas.contar("bytes_prestamos", os.path.getsize(prestamos_file))
+                # Ya guardados: volver a guardar esta vista previa solo reescribe la nómina
+                run.prestamos_modificados = False
+                run.prestamos_mtime = _mtime_archivo(prestamos_file)
+            except Exception as e:
+                run._advertencia(f"No se pudieron guardar los cambios en préstamos: {e}")
+
+        # Generar nombre de archivo si no se especificó (guardar en carpeta datos)
+        if output_file is None:
+            fecha_pago_str = fecha_pago.strftime('%Y%m%d')
+            os.makedirs(DATA_DIR, exist_ok=True)
+            output_file = os.path.join(DATA_DIR, f"nomina_quincenal_pago_{fecha_pago_str}.xlsx")
+
+        output_seguridad = None
+        if not seguridad_df.empty:
+            base = output_file.rsplit('.', 1)[0] if '.' in output_file else output_file
+            output_seguridad = base + '_seguridad.xlsx'
+
+        # Nómina principal (solo empleados no seguridad) y de seguridad se escriben a la vez
+        # (una tras otra si se está perfilando); cada etapa mide la espera por su archivo
+        _informar(f"\nGuardando nomina en: {output_file}")
+        with ejecutor_hilos(max_workers=2) as pool:
+            futuro_nomina = pool.submit(escribir_nomina_excel, payroll_df, output_file)
+            futuro_seguridad = None
+            if output_seguridad is not None:
+                futuro_seguridad = pool.submit(escribir_nomina_excel, seguridad_df, output_seguridad)
+            try:
+                with metricas.etapa("guardar_nomina", filas_entrada=len(payroll_df)):
+                    futuro_nomina.result()
+                metricas.contar("bytes_nomina", os.path.getsize(output_file))
+                _informar(f"[OK] Nomina guardada exitosamente")
+                _informar(f"\nArchivo generado: {output_file}")
+                _informar(f"Fecha de pago: {fecha_pago.strftime('%d/%m/%Y')}")
+            except Exception as e:
+                run._error(f"Error al guardar archivo: {e}")
+                return None
+            run.archivo_nomina = output_file
+
+            if futuro_seguridad is not None:
+                try:
+                    with metricas.etapa("guardar_seguridad", filas_entrada=len(seguridad_df)):
+                        futuro_seguridad.result()
+                    metricas.contar("bytes_seguridad", os.path.getsize(output_seguridad))
+                    _informar(f"[OK] Nomina de seguridad guardada: {output_seguridad} ({len(seguridad_df)} empleados)")
+                    run.archivo_seguridad = output_seguridad
+                except Exception as e:
+                    run._advertencia(f"No se pudo guardar nomina de seguridad: {e}")
+
+        # Fuera de la carpeta de datos, la quincena anterior es la guardada junto a esta nómina
+        carpeta_salida = os.path.dirname(os.path.abspath(output_file))
+        if not _misma_ruta(carpeta_salida, DATA_DIR):
+            _comparar_con_anterior(run, carpeta_salida)
+
+        # CSV / binario tipado junto a cada Excel, después del Excel (leer_nomina compara fechas)
+        if salidas_extra:
+            with metricas.etapa("guardar_salidas_extra"):
+                for nombre, df, archivo in (("nomina", payroll_df, run.archivo_nomina),
+                                            ("nomina_seguridad", seguridad_df, run.archivo_seguridad)):
+                    if archivo is None:
+                        continue
+                    try:
+                        for formato, ruta in guardar_salidas_nomina(df, archivo, salidas_extra).items():
+                            run.archivos_extra[f"{nombre}_{formato}"] = ruta
+                    except Exception as e:
+                        run._advertencia(f"No se pudieron guardar las salidas {', '.join(salidas_extra)} de {archivo}: {e}")
+            if run.archivos_extra:
+                _informar(f"[OK] Salidas adicionales: {', '.join(sorted(run.archivos_extra.values()))}")
+
+        # Manifiesto junto a la nómina: qué entradas produjeron estos archivos y en qué historial
+        # quedó registrada (un recálculo parcial posterior escribe en el mismo)
+        if run.manifiesto is not None:
+            with metricas.etapa("guardar_manifiesto"):
+                _guardar_manifiesto(
+                    run, dict(run.manifiesto, historial_db=os.path.abspath(historial_db) if historial_db else None)
+                )
+
+        with metricas.etapa("registrar_historial"):
+            _registrar_historial(run, db_path=historial_db)
+
+        if metricas_log:
+            try:
+                metricas.guardar(metricas_log, fecha_pago=fecha_pago.strftime('%Y-%m-%d'), archivo_nomina=output_file)
+            except OSError as e:
+                run._advertencia(f"No se pudieron guardar las métricas: {e}")
+
+        return payroll_df
+
+
+@perfilable()
+def calculate_payroll_quincenal(employees_file=None, 
+                                 hours_file=None,
+                                 output_file=None,
+                                 quincena_fecha=None,
+                                 prestamos_file: str = DEFAULT_PRESTAMOS_FILE,
+                                 seguridad_horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE,
+                                 manual_hours_df=None,
+                                 progreso=None,
+                                 salidas_extra=None):
+    """
+    Calcula la nómina quincenal para todos los empleados de UNA quincena específica y la guarda
+    (`calcular_vista_previa_nomina` + `guardar_nomina_quincenal`).
+    
+    Args:
+        employees_file: Archivo Excel con información de empleados
+        hours_file: Archivo Excel del reporte de asistencia del escáner biométrico (ignorado si manual_hours_df no es None)
+        output_file: Nombre del archivo Excel de salida (si es None, se genera automáticamente)
+        quincena_fecha: Fecha de referencia para determinar qué quincena calcular (obligatorio si manual_hours_df no es None)
+        manual_hours_df: Si se proporciona, se usan estas horas en lugar del reporte biométrico (columnas: ID, nombre, horas_normales, horas_extra, horas_domingo, horas_feriado)
+        progreso: callback opcional que recibe un `EventoProgreso` al iniciar/terminar cada etapa
+            (con porcentaje) y por cada mensaje, advertencia o error, en el hilo que calcula.
+            Los mensajes se siguen imprimiendo; no hace falta redirigir sys.stdout.
+        salidas_extra: formatos para otros programas además del Excel, ej. ("csv", "npz");
+            se escriben junto a cada Excel (ver salidas_nomina.py)
+        
+    Returns:
+        DataFrame con la nómina calculada o None si hay errores
+    """
+    with _CanalProgreso(progreso):
+        run = calcular_vista_previa_nomina(
+            employees_file=employees_file,
+            hours_file=hours_file,
+            quincena_fecha=quincena_fecha,
+            prestamos_file=prestamos_file,
+            seguridad_horario_file=seguridad_horario_file,
+            manual_hours_df=manual_hours_df,
+        )
+        return guardar_nomina_quincenal(run, output_file, salidas_extra=salidas_extra)
+
+
+@perfilable()
+def recalcular_empleados(employee_ids,
+                         quincena_fecha,
+                         employees_file=None,
+                         hours_file=None,
+                         archivo_nomina=None,
+                         prestamos_file: str = DEFAULT_PRESTAMOS_FILE,
+                         seguridad_horario_file: str = DEFAULT_SEGURIDAD_HORARIO_FILE,
+                         manual_hours_df=None,
+                         regenerar_recibos: bool = True,
+                         carpeta_recibos=None,
+                         historial_db=None,
+                         progreso=None) -> PayrollRun:
+    """
+    Recalcula solo algunos empleados de una quincena ya guardada (corrección tardía de marcaciones
+    o salario) y parchea sus filas en la nómina y en `*_seguridad.xlsx`; el resto de filas se
+    conserva tal cual. Los descuentos de préstamos de esos empleados en esa fecha de pago se
+    revierten y se vuelven a aplicar, así que repetir el recálculo no descuenta dos veces.
+    Si regenerar_recibos, se rehacen solo los recibos de esos empleados y se borran los que
+    quedaron de ellos con otro nombre o fuera de la nómina parcheada.
+
+    Args:
+        employee_ids: IDs a recalcular
+        quincena_fecha: Fecha de referencia de la quincena ya calculada
+        archivo_nomina: Nómina a parchear (por defecto datos/nomina_quincenal_pago_YYYYMMDD.xlsx)
+        carpeta_recibos: Carpeta de los recibos (por defecto recibos_quincena_YYYYMMDD junto a la nómina)
+        historial_db: base del historial; por defecto la que quedó en el manifiesto de la nómina
+            (la que se usó al guardarla) o datos/historial_nomina.sqlite
+        Resto: igual que `calculate_payroll_quincenal`
 
-    # Archivo aparte: nómina de seguridad (solo horas trabajadas y datos esenciales para el pago)
-    if payroll_results_seguridad:
-        # Seguridad: todas las horas se pagan igual (sin horas extra ni feriado/domingo)
-        columnas_seguridad = ['ID', 'Nombre', 'Cargo', 'Tipo', 'Salario Base', 'Quincena Inicio', 'Quincena Fin', 'Fecha de Pago',
-            'Total Horas Trabajadas',
-            'Seguro Social (9.75%)', 'Seguro Educativo (1.25%)', 'ISLR', 'Descuento Préstamo', 'Total Descuentos', 'Total Saldo Préstamo',
-            'Total Pago a Empleados', 'Número de Cuenta', 'Banco', 'Tipo de Cuenta']
-        seguridad_df = pd.DataFrame(payroll_results_seguridad)
-        seguridad_df['Fecha de Pago'] = fecha_pago.strftime('%d/%m/%Y')
-        if 'Pago Quincenal' in seguridad_df.columns and 'Total Descuentos' in seguridad_df.columns:
-            seguridad_df['Total Pago a Empleados'] = seguridad_df['Pago Quincenal'] - seguridad_df['Total Descuentos']
-        cols_seg = [c for c in columnas_seguridad if c in seguridad_df.columns]
-        seguridad_df = seguridad_df[cols_seg].sort_values('Nombre')
-        base = output_file.rsplit('.', 1)[0] if '.' in output_file else output_file
-        output_seguridad = base + '_seguridad.xlsx'
+    Returns:
+        `PayrollRun` con la nómina completa parcheada; `recalculados` trae los IDs procesados
+    """
+    with _CanalProgreso(progreso):
+        run = PayrollRun(prestamos_file=prestamos_file)
+        if employees_file is None:
+            employees_file = DEFAULT_EMPLOYEES_FILE
+        if hours_file is None:
+            hours_file = DEFAULT_HOURS_FILE
+        if isinstance(employee_ids, (str, int, float, np.integer)):
+            employee_ids = [employee_ids]
+        ids = sorted({normalizar_id(x) for x in employee_ids} - {None})
+        if not ids:
+            return run._error("Indique al menos un ID de empleado para recalcular.")
+        if quincena_fecha is None:
+            return run._error("Indique la fecha de referencia de la quincena a recalcular (quincena_fecha).")
+        quincena_inicio, quincena_fin, fecha_pago = periodo_quincena(quincena_fecha)
+        if pd.isna(quincena_inicio):
+            return run._error(f"Fecha de quincena inválida: {quincena_fecha}")
+
+        if archivo_nomina is None:
+            archivo_nomina = os.path.join(DATA_DIR, f"nomina_quincenal_pago_{fecha_pago.strftime('%Y%m%d')}.xlsx")
+        base = archivo_nomina.rsplit('.', 1)[0] if '.' in archivo_nomina else archivo_nomina
+        archivo_seguridad = base + '_seguridad.xlsx'
+        if not os.path.exists(archivo_nomina):
+            return run._error(f"No existe la nómina '{archivo_nomina}'. Calcule primero la nómina completa de la quincena.")
+        try:
+            nomina_actual = pd.read_excel(archivo_nomina)
+            seguridad_actual = pd.read_excel(archivo_seguridad) if os.path.exists(archivo_seguridad) else pd.DataFrame()
+        except Exception as e:
+            return run._error(f"Error al leer la nómina guardada: {e}")
+
+        _informar(f"\nRecalculando {len(ids)} empleado(s) de la quincena {quincena_inicio.strftime('%d/%m/%Y')} a {quincena_fin.strftime('%d/%m/%Y')}: {', '.join(ids)}")
+        try:
+            empleados = TablaEmpleados.desde_dataframe(_leer_archivo_empleados(employees_file))
+        except Exception as e:
+            return run._error(f"Error al leer {employees_file}: {e}")
+        security_ids = empleados.ids_seguridad()
+
+        # Horas solo de los empleados a recalcular
+        if manual_hours_df is not None and not manual_hours_df.empty:
+            manuales = manual_hours_df[normalizar_ids(manual_hours_df["ID"]).isin(ids).to_numpy()]
+            horas_resumen_df = resumir_horas_manuales(manuales, quincena_inicio, quincena_fin)
+        else:
+            try:
+                hours_df = lectura_cacheada("asistencia", hours_file, leer_reporte_asistencia)
+            except Exception as e:
+                return run._error(f"Error al leer {hours_file}: {e}")
+            hours_df = hours_df[normalizar_ids(hours_df["ID"]).isin(ids).to_numpy()].reset_index(drop=True)
+            if not pd.api.types.is_datetime64_any_dtype(hours_df["fecha"]):
+                hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], errors="coerce")
+                if hours_df["fecha"].isna().any():
+                    hours_df["fecha"] = pd.to_datetime(hours_df["fecha"], format="%d/%m/%Y", errors="coerce")
+            errors = validate_attendance_records(hours_df, security_ids=security_ids)
+            if errors:
+                for error in errors:
+                    _informar(f"\n{error['mensaje']}")
+                run.errores_asistencia = errors
+                run.errores.extend(error['mensaje'] for error in errors)
+                return run
+            seguridad_cfg = cargar_seguridad_config(seguridad_horario_file)
+            daily_hours_df = calculate_hours_per_day_mixed(hours_df, security_ids=security_ids, security_config=seguridad_cfg)
+            if not daily_hours_df.empty:
+                daily_hours_df = get_quincena_periods(daily_hours_df)
+                daily_hours_df = daily_hours_df[daily_hours_df['quincena_inicio'] == quincena_inicio]
+            horas_resumen_df = resumir_horas_quincena(daily_hours_df)
+
+        pagos = calcular_pagos_quincena(horas_resumen_df, empleados)
+        for employee_id in horas_resumen_df.loc[~pagos["encontrado"], "ID"]:
+            run._advertencia(f"Empleado con ID {employee_id} no encontrado en archivo de empleados")
+        horas_resumen_df = horas_resumen_df[pagos["encontrado"]].reset_index(drop=True)
+        pagos = pagos[pagos["encontrado"]].reset_index(drop=True)
+        fila = pagos["fila_empleado"].to_numpy()
+        sin_horas = sorted(set(ids) - set(empleados.ids[fila]))
+        for employee_id in sin_horas:
+            run._advertencia(f"Empleado con ID {employee_id} sin horas en la quincena: se quita de la nómina")
+
+        # Préstamos: revertir lo descontado a estos empleados en esta fecha y volver a aplicar
+        descuento_prestamo = np.zeros(len(horas_resumen_df), dtype=np.int64)
+        saldo_prestamo_total = np.zeros(len(horas_resumen_df), dtype=np.int64)
+        prestamos_modificados = False
+        try:
+            prestamos_df, pagos_df = leer_prestamos(prestamos_file)
+        except Exception:
+            prestamos_df = None
+            run._advertencia(f"No se pudo cargar '{prestamos_file}'. Se omitirá el descuento de préstamos.")
+        if prestamos_df is not None:
+            pagos_previos = len(pagos_df)
+            pagos_df, conservados = revertir_descuentos_nomina(prestamos_df, pagos_df, ids, fecha_pago)
+            prestamos_modificados = len(pagos_df) != pagos_previos
+            conservado = np.array([conservados.get(x, 0) for x in empleados.ids[fila]], dtype=np.int64)
+            max_prestamo = np.maximum(
+                0,
+                pagos["pago_quincenal_centavos"].to_numpy()
+                - pagos["total_descuentos_base_centavos"].to_numpy()
+                - conservado,
+            )
+            try:
+                descuento_prestamo, saldo_prestamo_total, pagos_df = aplicar_descuentos_prestamos_lote(
+                    prestamos_df,
+                    pagos_df,
+                    empleados.ids[fila],
+                    empleados.nombre[fila],
+                    max_prestamo,
+                    fecha_pago,
+                    horas_resumen_df["quincena_inicio"].to_numpy(),
+                    horas_resumen_df["quincena_fin"].to_numpy(),
+                )
+                descuento_prestamo = descuento_prestamo + conservado
+                prestamos_modificados = prestamos_modificados or bool((descuento_prestamo > conservado).any())
+            except Exception as e:
+                return run._error(f"No se pudo aplicar el descuento de préstamos: {e}")
+
+        # Parchear filas: quitar las de estos IDs (de ambos archivos, por si cambió de tipo) y agregar las nuevas
+        resultados = _filas_nomina(horas_resumen_df, pagos, empleados, descuento_prestamo, saldo_prestamo_total)
+        resultados['Fecha de Pago'] = fecha_pago.strftime('%d/%m/%Y')
+        es_seguridad = empleados.seguridad[fila]
+
+        def parchear(actual, nuevas, columnas):
+            if not actual.empty and "ID" in actual.columns:
+                actual = actual[~normalizar_ids(actual["ID"]).isin(ids).to_numpy()]
+            partes = [df for df in (actual, nuevas) if not df.empty]
+            if not partes:
+                return nuevas[[c for c in columnas if c in nuevas.columns]]
+            parcheada = pd.concat(partes, ignore_index=True).sort_values('Nombre', kind="mergesort")
+            return parcheada[[c for c in columnas if c in parcheada.columns]].reset_index(drop=True)
+
+        run.nomina = parchear(nomina_actual, resultados[~es_seguridad], COLUMNAS_NOMINA)
+        run.nomina_seguridad = parchear(seguridad_actual, resultados[es_seguridad], COLUMNAS_NOMINA_SEGURIDAD)
+        run.fecha_pago = fecha_pago
+        run.quincena_inicio = quincena_inicio
+        run.quincena_fin = quincena_fin
+        run.horas_resumen = horas_resumen_df
+        run.empleados = empleados
+        run.recalculados = ids
+
+        # Guardar: préstamos primero, luego los archivos de nómina afectados
+        if prestamos_modificados:
+            try:
+                guardar_prestamos(prestamos_df, pagos_df, prestamos_file)
+            except Exception as e:
+                return run._error(f"No se pudieron guardar los cambios en préstamos: {e}")
         try:
-            seguridad_df.to_excel(output_seguridad, index=False, engine='openpyxl')
-            print(f"[OK] Nomina de seguridad guardada: {output_seguridad} ({len(seguridad_df)} empleados)")
+            escribir_nomina_excel(run.nomina, archivo_nomina)
+            run.archivo_nomina = archivo_nomina
+            if not seguridad_actual.empty or es_seguridad.any():
+                escribir_nomina_excel(run.nomina_seguridad, archivo_seguridad)
+                run.archivo_seguridad = archivo_seguridad
         except Exception as e:
-            print(f"[ADVERTENCIA] No se pudo guardar nomina de seguridad: {e}")
+            return run._error(f"Error al guardar archivo: {e}")
+        # Las salidas CSV/binarias que ya existían se reescriben para no quedar desactualizadas
+        for nombre, df, archivo in (("nomina", run.nomina, run.archivo_nomina),
+                                    ("nomina_seguridad", run.nomina_seguridad, run.archivo_seguridad)):
+            existentes = [f for f in FORMATOS_SALIDA if archivo and os.path.exists(ruta_salida(archivo, f))]
+            if not existentes:
+                continue
+            try:
+                for formato, ruta in guardar_salidas_nomina(df, archivo, existentes).items():
+                    run.archivos_extra[f"{nombre}_{formato}"] = ruta
+            except Exception as e:
+                run._advertencia(f"No se pudieron actualizar las salidas {', '.join(existentes)} de {archivo}: {e}")
+        _informar(f"[OK] Nómina parcheada: {archivo_nomina} ({len(resultados)} fila(s) recalculada(s))")
+
+        # El manifiesto refleja las entradas corregidas y acumula los recálculos parciales
+        manifiesto = construir_manifiesto(
+            employees_file, hours_file, quincena_fecha, prestamos_file, seguridad_horario_file, manual_hours_df
+        )
+        try:
+            with open(base + ".manifest.json", encoding="utf-8") as f:
+                anterior = json.load(f)
+        except (OSError, ValueError):
+            anterior = {}
+        if historial_db is None:
+            historial_db = anterior.get("historial_db")
+        manifiesto["historial_db"] = os.path.abspath(historial_db) if historial_db else None
+        manifiesto["recalculos"] = anterior.get("recalculos", [])
+        manifiesto["recalculos"].append({"ids": ids, "fecha": datetime.now().isoformat(timespec="seconds")})
+        run.manifiesto = manifiesto
+        _guardar_manifiesto(run, manifiesto)
+        _registrar_historial(run, ids=ids, db_path=historial_db)
+
+        if regenerar_recibos:
+            from generador_recibos import generar_recibos, ruta_recibo
+            if carpeta_recibos is None:
+                carpeta_recibos = os.path.join(
+                    os.path.dirname(os.path.abspath(archivo_nomina)), f"recibos_quincena_{fecha_pago.strftime('%Y%m%d')}"
+                )
+            for df in (resultados[~es_seguridad], resultados[es_seguridad]):
+                if not df.empty:
+                    generar_recibos(df, carpeta_salida=carpeta_recibos)
+            # Recibos anteriores de estos empleados que ya no corresponden: salieron de la nómina
+            # parcheada o cambió su nombre (el archivo se nombra con nombre e ID)
+            vigentes = {ruta_recibo(carpeta_recibos, n, i) for n, i in zip(resultados["Nombre"], resultados["ID"])}
+            for actual in (nomina_actual, seguridad_actual):
+                if actual.empty or "ID" not in actual.columns or "Nombre" not in actual.columns:
+                    continue
+                previas = actual[normalizar_ids(actual["ID"]).isin(ids).to_numpy()]
+                for nombre, employee_id in zip(previas["Nombre"], previas["ID"]):
+                    ruta = ruta_recibo(carpeta_recibos, nombre, employee_id)
+                    if ruta in vigentes or not os.path.exists(ruta):
+                        continue
+                    try:
+                        os.remove(ruta)
+                        _informar(f"[OK] Recibo eliminado (ya no está en la nómina): {ruta}")
+                    except OSError as e:
+                        run._advertencia(f"No se pudo eliminar el recibo {ruta}: {e}")
+        return run
+
+def _leer_archivo_empleados(employees_file) -> pd.DataFrame:
+    return almacen_para(employees_file).leer_empleados()
+
+
+def guardar_archivo_empleados(employees_df: pd.DataFrame, employees_file=None) -> None:
+    """Reemplaza todos los empleados guardados (Excel o SQLite según la ruta)."""
+    if employees_file is None:
+        employees_file = DEFAULT_EMPLOYEES_FILE
+    almacen_para(employees_file).guardar_empleados(employees_df)
 
-    return payroll_df
 
 def leer_empleados_normalizado(employees_file=None):
     """
@@ -1874,7 +3202,7 @@ def leer_empleados_normalizado(employees_file=None):
     if employees_file is None:
         employees_file = DEFAULT_EMPLOYEES_FILE
     try:
-        employees_df = pd.read_excel(employees_file)
+        employees_df = _leer_archivo_empleados(employees_file)
         # Normalizar impuesto sobre la renta: solo ISLR (el código usa ISLR)
         if 'ISL' in employees_df.columns:
             if 'ISLR' not in employees_df.columns:
@@ -1899,7 +3227,7 @@ def leer_empleados_normalizado(employees_file=None):
             employees_df['ID'] = employees_df['ID'].apply(normalizar_id_lectura)
         return employees_df
     except Exception as e:
-        print(f"[ERROR] Error al leer el archivo: {e}")
+        _informar(f"[ERROR] Error al leer el archivo: {e}")
         return None
 
 def agregar_empleado(employees_file=None):
@@ -2089,11 +3417,11 @@ def agregar_empleado(employees_file=None):
             print(ids_duplicados[['ID', 'nombre']])
             return None
     
-    # Guardar en Excel (solo columna ISLR; eliminar ISL si existiera)
+    # DataFrame devuelto: solo columna ISLR (eliminar ISL si existiera); se guarda solo la fila afectada
     if 'ISL' in employees_df.columns:
         employees_df = employees_df.drop(columns=['ISL'])
     try:
-        employees_df.to_excel(employees_file, index=False, engine='openpyxl')
+        almacen_para(employees_file).agregar_empleados(nuevo_empleado)
         print(f'\n[OK] Empleado agregado exitosamente con ID: {nuevo_id}')
         return employees_df
     except Exception as e:
@@ -2165,11 +3493,11 @@ def eliminar_empleado(employees_file=None):
     id_input_normalizado = str(id_input).strip()
     employees_df = employees_df[ids_normalizados != id_input_normalizado]
     
-    # Guardar en Excel (solo columna ISLR; eliminar ISL si existiera)
+    # DataFrame devuelto: solo columna ISLR (eliminar ISL si existiera); se guarda solo la fila afectada
     if 'ISL' in employees_df.columns:
         employees_df = employees_df.drop(columns=['ISL'])
     try:
-        employees_df.to_excel(employees_file, index=False, engine='openpyxl')
+        almacen_para(employees_file).eliminar_empleado(id_input)
         print(f'\n[OK] Empleado eliminado exitosamente')
         return employees_df
     except Exception as e:
@@ -2337,30 +3665,163 @@ def modificar_empleado(employees_file=None):
         salario_minimo = 0.0
     
     # Modificar el DataFrame usando .loc
-    employees_df.loc[indice, 'nombre'] = nombre
-    employees_df.loc[indice, 'cargo'] = cargo
-    employees_df.loc[indice, 'salario'] = salario
-    employees_df.loc[indice, 'n_de_cuenta'] = n_de_cuenta
-    employees_df.loc[indice, 'banco'] = banco
-    employees_df.loc[indice, 'tipo_de_cuenta'] = tipo_de_cuenta
-    employees_df.loc[indice, 'salario_fijo'] = 1 if salario_fijo_bool else 0
-    employees_df.loc[indice, 'empleado_fijo'] = 1 if empleado_fijo_bool else 0
-    employees_df.loc[indice, 'seguridad'] = 'Sí' if seguridad_bool else 'No'
-    employees_df.loc[indice, 'salario_minimo'] = salario_minimo if empleado_fijo_bool else 0
-    employees_df.loc[indice, 'Empleado por contrato'] = 'Sí' if empleado_contrato_bool else 'No'
-    employees_df.loc[indice, 'ISLR'] = islr if empleado_contrato_bool else 0
-    
-    # Guardar en Excel (solo columna ISLR; eliminar ISL si existiera)
+    cambios = {
+        'nombre': nombre,
+        'cargo': cargo,
+        'salario': salario,
+        'n_de_cuenta': n_de_cuenta,
+        'banco': banco,
+        'tipo_de_cuenta': tipo_de_cuenta,
+        'salario_fijo': 1 if salario_fijo_bool else 0,
+        'empleado_fijo': 1 if empleado_fijo_bool else 0,
+        'seguridad': 'Sí' if seguridad_bool else 'No',
+        'salario_minimo': salario_minimo if empleado_fijo_bool else 0,
+        'Empleado por contrato': 'Sí' if empleado_contrato_bool else 'No',
+        'ISLR': islr if empleado_contrato_bool else 0,
+    }
+    for columna, valor in cambios.items():
+        employees_df.loc[indice, columna] = valor
+    
+    # DataFrame devuelto: solo columna ISLR (eliminar ISL si existiera); se guarda solo la fila afectada
     if 'ISL' in employees_df.columns:
         employees_df = employees_df.drop(columns=['ISL'])
     try:
-        employees_df.to_excel(employees_file, index=False, engine='openpyxl')
+        almacen_para(employees_file).actualizar_empleado(id_input, cambios)
         print(f'\n[OK] Empleado modificado exitosamente')
         return employees_df
     except Exception as e:
         print(f"[ERROR] Error al guardar el archivo: {e}")
         return None
 
+
+# Columnas del archivo de empleados, en el orden en que las escribe agregar_empleado
+COLUMNAS_ARCHIVO_EMPLEADOS = [
+    "ID", "nombre", "cargo", "salario", "n_de_cuenta", "banco", "tipo_de_cuenta", "salario_fijo",
+    "empleado_fijo", "seguridad", "salario_minimo", "Empleado por contrato", "ISLR",
+]
+
+
+def _leer_tabla(archivo) -> pd.DataFrame:
+    """Excel o CSV según la extensión (IDs y cuentas como texto en el CSV)."""
+    if str(archivo).lower().endswith(".csv"):
+        return pd.read_csv(archivo, dtype={"ID": str, "n_de_cuenta": str})
+    return pd.read_excel(archivo)
+
+
+def importar_empleados(origen, employees_file=None, actualizar: bool = False, simular: bool = False) -> dict:
+    """
+    Importa empleados desde un Excel o CSV con las columnas del archivo de empleados (se aceptan
+    los mismos alias que al calcular la nómina). Valida cada fila con las reglas de agregar_empleado;
+    si alguna fila tiene errores no se guarda nada.
+
+    Args:
+        actualizar: si un ID ya existe, reemplazar esa fila (si no, es un error)
+        simular: validar sin guardar
+
+    Returns:
+        dict con agregados, actualizados (listas de IDs) y errores (lista de {fila, ID, error})
+    """
+    if employees_file is None:
+        employees_file = DEFAULT_EMPLOYEES_FILE
+    nuevos = _leer_tabla(origen)
+    if 'ID' not in nuevos.columns:
+        raise ValueError(f"'{origen}' no tiene columna ID")
+    esquema = resolver_esquema_empleados(nuevos.columns)
+
+    def columna(nombre, default):
+        return nuevos[nombre] if nombre in nuevos.columns else pd.Series(default, index=nuevos.index, dtype=object)
+
+    ids = normalizar_ids(nuevos['ID'])
+    salario_fijo = np.array([parse_bool(v) for v in columna('salario_fijo', 0)], dtype=bool)
+    empleado_fijo = np.array([parse_bool(v) for v in columna('empleado_fijo', 0)], dtype=bool)
+    seguridad = np.array([parse_bool(v) for v in _primer_valor(nuevos, esquema['seguridad'], 'No')], dtype=bool)
+    contrato = np.array([parse_bool(v) for v in _primer_valor(nuevos, esquema['empleado_por_contrato'], 'No')], dtype=bool)
+    salario = pd.to_numeric(columna('salario', np.nan), errors='coerce')
+    salario_minimo = pd.to_numeric(columna('salario_minimo', 0), errors='coerce').fillna(0)
+    islr = pd.to_numeric(_primer_valor(nuevos, esquema['islr'], 0), errors='coerce')
+
+    existentes = (
+        leer_empleados_normalizado(employees_file)
+        if almacen_para(employees_file).tiene_empleados()
+        else pd.DataFrame(columns=COLUMNAS_ARCHIVO_EMPLEADOS)
+    )
+    if existentes is None:
+        raise ValueError(f"No se pudo leer '{employees_file}'")
+    ids_existentes = set(normalizar_ids(existentes['ID']).dropna()) if 'ID' in existentes.columns else set()
+
+    errores = []
+    reglas = [
+        (ids.isna().to_numpy(), "ID vacío"),
+        (ids.duplicated(keep=False).to_numpy() & ids.notna().to_numpy(), "ID repetido en el archivo a importar"),
+        (salario.isna().to_numpy(), "El salario debe ser un número válido"),
+        (salario_fijo & empleado_fijo, "Un empleado no puede ser 'Salario Fijo' y 'Empleado Fijo' al mismo tiempo"),
+        (seguridad & (salario_fijo | empleado_fijo), "Un empleado de Seguridad no puede ser 'Salario Fijo' ni 'Empleado Fijo'"),
+        (empleado_fijo & (salario_minimo.to_numpy() <= 0), "El salario mínimo debe ser mayor a 0"),
+        (contrato & islr.isna().to_numpy() & _primer_valor(nuevos, esquema['islr'], None).notna().to_numpy(),
+         "El ISLR debe ser un número válido"),
+    ]
+    if not actualizar:
+        reglas.append((ids.isin(ids_existentes).to_numpy(), "El ID ya existe (use actualizar para reemplazarlo)"))
+    for mascara, mensaje in reglas:
+        for pos in np.flatnonzero(mascara):
+            # Fila como la ve el usuario en Excel (encabezado en la fila 1)
+            errores.append({"fila": int(pos) + 2, "ID": ids.iat[pos], "error": mensaje})
+    errores.sort(key=lambda e: e["fila"])
+
+    filas = pd.DataFrame({
+        'ID': [int(i) if i is not None and i.isdigit() and not i.startswith('0') else i for i in ids],
+        'nombre': columna('nombre', '').fillna('').astype(str).str.strip().to_numpy(),
+        'cargo': columna('cargo', '').fillna('').astype(str).str.strip().to_numpy(),
+        'salario': salario.to_numpy(),
+        'n_de_cuenta': columna('n_de_cuenta', '').fillna('').astype(str).str.strip().to_numpy(),
+        'banco': columna('banco', '').fillna('').astype(str).str.strip().to_numpy(),
+        'tipo_de_cuenta': columna('tipo_de_cuenta', '').fillna('').astype(str).str.strip().to_numpy(),
+        'salario_fijo': salario_fijo.astype(int),
+        'empleado_fijo': empleado_fijo.astype(int),
+        'seguridad': np.where(seguridad, 'Sí', 'No'),
+        'salario_minimo': np.where(empleado_fijo, salario_minimo.to_numpy(), 0.0),
+        'Empleado por contrato': np.where(contrato, 'Sí', 'No'),
+        'ISLR': np.where(contrato, islr.fillna(0).to_numpy(), 0.0),
+    })
+    actualizados = [i for i in ids if i in ids_existentes]
+    agregados = [i for i in ids if i is not None and i not in ids_existentes]
+    resumen = {"agregados": agregados, "actualizados": actualizados, "errores": errores}
+    if errores or simular:
+        return resumen
+
+    # Los actualizados se reemplazan en su misma fila; los nuevos van al final
+    employees_df = existentes.copy()
+    if actualizados:
+        origen_fila = pd.Index(ids).get_indexer(normalizar_ids(existentes['ID']).to_numpy())
+        reemplazar = origen_fila >= 0
+        for col in filas.columns:
+            if col not in employees_df.columns:
+                employees_df[col] = None
+            employees_df.loc[reemplazar, col] = filas[col].to_numpy()[origen_fila[reemplazar]]
+    employees_df = pd.concat([employees_df, filas[~ids.isin(ids_existentes).to_numpy()]], ignore_index=True)
+    if 'ISL' in employees_df.columns:
+        employees_df = employees_df.drop(columns=['ISL'])
+    guardar_archivo_empleados(employees_df, employees_file)
+    print(f"[OK] Empleados importados: {len(agregados)} agregado(s), {len(actualizados)} actualizado(s)")
+    return resumen
+
+
+def exportar_empleados(destino, employees_file=None) -> int:
+    """Exporta el archivo de empleados a Excel, CSV o JSON (según la extensión de `destino`). Devuelve filas."""
+    employees_df = leer_empleados_normalizado(employees_file)
+    if employees_df is None:
+        raise ValueError("No se pudo leer el archivo de empleados")
+    destino = str(destino)
+    if destino.lower().endswith(".csv"):
+        employees_df.to_csv(destino, index=False, encoding="utf-8")
+    elif destino.lower().endswith(".json"):
+        employees_df.to_json(destino, orient="records", force_ascii=False, indent=2)
+    else:
+        employees_df.to_excel(destino, index=False, engine='openpyxl')
+    print(f"[OK] {len(employees_df)} empleado(s) exportado(s) a {destino}")
+    return len(employees_df)
+
+
 def main():
     '''Funcion principal del sistema de nomina'''
     print('\n¿Qué desea hacer?')
@@ -2397,4 +3858,9 @@ def main():
 
 
 if __name__ == "__main__":
+    activar_desde_argumentos()
+    if len(sys.argv) > 1:
+        # Con argumentos: línea de comandos sin preguntas (ver cli_nomina.py)
+        from cli_nomina import main_cli
+        sys.exit(main_cli())
     main()
@@ -23,6 +23,13 @@ a = Analysis(
         'sys',
         'os',
         'builtins',
+        'comun',
+        'diagnostico',
+        'almacenamiento',
+        'sqlite3',
+        'cProfile',
+        'pstats',
+        'tracemalloc',
     ],
     hookspath=[],
     hooksconfig={},
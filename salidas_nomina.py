@@ -0,0 +1,169 @@
+"""
+Salidas de nómina para otros programas, junto al Excel (que sigue siendo el archivo para personas).
+
+- CSV (`<nomina>.csv`): los mismos valores que el Excel, en UTF-8.
+- Binario columnar tipado (`<nomina>.npz`, numpy sin pickle): montos en centavos (int64),
+  fechas como datetime64[D] e IDs como texto; se carga sin parsear XML ni adivinar tipos.
+
+`leer_nomina` abre una nómina prefiriendo el .npz si existe y no es más viejo que el Excel;
+así generador_recibos y la GUI leen rápido cuando la salida binaria está disponible.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from historial import COLUMNAS_MONTO
+
+FORMATO_CSV = "csv"
+FORMATO_BINARIO = "npz"
+FORMATOS_SALIDA = (FORMATO_CSV, FORMATO_BINARIO)
+
+COLUMNAS_FECHA = ("Quincena Inicio", "Quincena Fin", "Fecha de Pago")
+# Siempre texto, aunque parezcan números (IDs con ceros o guiones, cuentas bancarias)
+COLUMNAS_TEXTO = ("ID", "Número de Cuenta")
+FORMATO_FECHA_NOMINA = "%d/%m/%Y"
+
+_ESQUEMA = "__esquema__"
+
+
+def ruta_salida(archivo_nomina: str, formato: str) -> str:
+    """Ruta de la salida `formato` que acompaña a un Excel de nómina (misma base, otra extensión)."""
+    return os.path.splitext(archivo_nomina)[0] + "." + formato
+
+
+def _columnas_tipadas(df: pd.DataFrame):
+    """Arreglos numpy por columna (sin objetos) y el esquema con el tipo de cada una."""
+    arreglos, esquema = {}, []
+    for i, columna in enumerate(df.columns):
+        serie = df[columna]
+        clave = f"c{i}"
+        if columna in COLUMNAS_MONTO and columna not in COLUMNAS_TEXTO:
+            dolares = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+            nulos = np.isnan(dolares)
+            arreglos[clave] = np.where(nulos, 0, np.rint(dolares * 100)).astype(np.int64)
+            tipo = "centavos"
+        elif columna in COLUMNAS_FECHA:
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                fechas = serie
+            else:
+                fechas = pd.to_datetime(serie, format=FORMATO_FECHA_NOMINA, errors="coerce")
+            arreglos[clave] = fechas.to_numpy(dtype="datetime64[D]")
+            nulos, tipo = None, "fecha"
+        elif pd.api.types.is_bool_dtype(serie):
+            arreglos[clave] = serie.to_numpy(dtype=bool)
+            nulos, tipo = None, "bool"
+        elif pd.api.types.is_integer_dtype(serie) and columna not in COLUMNAS_TEXTO and not serie.hasnans:
+            arreglos[clave] = serie.to_numpy(dtype=np.int64)
+            nulos, tipo = None, "entero"
+        elif pd.api.types.is_numeric_dtype(serie) and columna not in COLUMNAS_TEXTO:
+            arreglos[clave] = serie.to_numpy(dtype=float)
+            nulos, tipo = None, "numero"
+        else:
+            nulos = serie.isna().to_numpy()
+            arreglos[clave] = np.where(nulos, "", serie.astype(str).to_numpy()).astype(str)
+            tipo = "texto"
+        if nulos is not None and nulos.any():
+            arreglos[f"n{i}"] = nulos
+        esquema.append({"columna": str(columna), "tipo": tipo})
+    return arreglos, esquema
+
+
+def _dataframe(arreglos, esquema, tipada: bool) -> pd.DataFrame:
+    """
+    Arma el DataFrame desde los arreglos. tipada=False devuelve los mismos valores que el Excel
+    (montos en dólares, fechas dd/mm/YYYY); tipada=True, montos en centavos y fechas datetime64.
+    """
+    datos = {}
+    for i, col in enumerate(esquema):
+        valores = arreglos[f"c{i}"]
+        nulos = arreglos.get(f"n{i}")
+        tipo = col["tipo"]
+        if tipo == "centavos":
+            if tipada:
+                serie = pd.Series(valores, dtype="Int64" if nulos is not None else "int64")
+                if nulos is not None:
+                    serie[nulos] = pd.NA
+            else:
+                serie = pd.Series(valores / 100)
+                if nulos is not None:
+                    serie[nulos] = np.nan
+        elif tipo == "fecha":
+            serie = pd.Series(valores.astype("datetime64[ns]"))
+            if not tipada:
+                serie = serie.dt.strftime(FORMATO_FECHA_NOMINA).astype(object)
+                serie[serie.isna()] = np.nan
+        elif tipo == "texto":
+            serie = pd.Series(valores.astype(object))
+            if nulos is not None:
+                serie[nulos] = np.nan
+        else:
+            serie = pd.Series(valores)
+        datos[col["columna"]] = serie
+    return pd.DataFrame(datos, columns=[c["columna"] for c in esquema])
+
+
+def guardar_nomina_binaria(df: pd.DataFrame, archivo: str) -> None:
+    """Guarda `df` como .npz columnar tipado (montos en centavos, fechas, IDs como texto)."""
+    arreglos, esquema = _columnas_tipadas(df)
+    arreglos[_ESQUEMA] = np.array(json.dumps(esquema, ensure_ascii=False))
+    with open(archivo, "wb") as f:
+        np.savez(f, **arreglos)
+
+
+def leer_nomina_binaria(archivo: str, tipada: bool = False) -> pd.DataFrame:
+    with np.load(archivo, allow_pickle=False) as datos:
+        esquema = json.loads(str(datos[_ESQUEMA]))
+        arreglos = {clave: datos[clave] for clave in datos.files if clave != _ESQUEMA}
+    return _dataframe(arreglos, esquema, tipada)
+
+
+def guardar_salidas_nomina(df: pd.DataFrame, archivo_nomina: str, formatos=FORMATOS_SALIDA) -> dict:
+    """
+    Escribe junto a `archivo_nomina` (.xlsx) las salidas pedidas en `formatos` ("csv", "npz").
+
+    Returns:
+        dict formato -> ruta escrita
+    """
+    rutas = {}
+    for formato in formatos:
+        ruta = ruta_salida(archivo_nomina, formato)
+        if formato == FORMATO_CSV:
+            df.to_csv(ruta, index=False, encoding="utf-8")
+        elif formato == FORMATO_BINARIO:
+            guardar_nomina_binaria(df, ruta)
+        else:
+            raise ValueError(f"Formato de salida desconocido: {formato} (use {', '.join(FORMATOS_SALIDA)})")
+        rutas[formato] = ruta
+    return rutas
+
+
+def leer_nomina(archivo: str, tipada: bool = False) -> pd.DataFrame:
+    """
+    Lee una nómina (.xlsx, .csv o .npz). Para un .xlsx usa el .npz de al lado si existe y no es
+    más viejo que el Excel (si el Excel se editó a mano después, manda el Excel).
+
+    Args:
+        tipada: montos en centavos (int64) y fechas como datetime64 en vez de dólares y dd/mm/YYYY
+    """
+    extension = os.path.splitext(archivo)[1].lower()
+    if extension == "." + FORMATO_BINARIO:
+        return leer_nomina_binaria(archivo, tipada)
+    if extension == "." + FORMATO_CSV:
+        df = pd.read_csv(archivo, dtype={c: str for c in COLUMNAS_TEXTO})
+    else:
+        binario = ruta_salida(archivo, FORMATO_BINARIO)
+        if os.path.exists(binario) and (
+            not os.path.exists(archivo) or os.path.getmtime(binario) >= os.path.getmtime(archivo)
+        ):
+            try:
+                return leer_nomina_binaria(binario, tipada)
+            except Exception as e:
+                print(f"[ADVERTENCIA] No se pudo leer '{binario}', se usa el Excel: {e}")
+        df = pd.read_excel(archivo)
+    if not tipada:
+        return df
+    arreglos, esquema = _columnas_tipadas(df)
+    return _dataframe(arreglos, esquema, tipada=True)
@@ -0,0 +1,306 @@
+"""
+Servicio HTTP local (JSON) para que otras herramientas internas consulten la nómina sin abrir
+los Excel: vista previa por quincena, préstamos, empleados, configuración de seguridad y feriados.
+
+Los datos quedan cargados en memoria (caché de lecturas de almacenamiento, por archivo) y se vuelven a
+leer solo cuando el archivo cambia; la vista previa de una quincena ya calculada con los mismos
+archivos sale de la caché de nóminas. El servicio es de solo lectura: no guarda nóminas ni
+modifica préstamos (para eso están la GUI y cli_nomina.py).
+
+Uso:
+    python servicio_nomina.py [--puerto 8765] [--host 127.0.0.1]
+    python cli_nomina.py servir --puerto 8765
+
+Rutas (GET):
+    /salud                                   estado y archivos en uso
+    /empleados[?buscar=texto]                lista de empleados
+    /empleados/<id>                          un empleado
+    /prestamos[?empleado=ID&estado=ACTIVO]   préstamos (montos en centavos)
+    /prestamos/<loan_id>                     un préstamo con sus pagos
+    /seguridad                               configuraciones de turnos vigentes
+    /feriados[?anio=2026]                    calendario de feriados
+    /nomina?fecha=DD/MM/YYYY[&empleado=ID]   vista previa de la quincena que contiene la fecha
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+import main
+from almacenamiento import lectura_cacheada
+
+HOST_POR_DEFECTO = "127.0.0.1"  # solo esta máquina; usar --host 0.0.0.0 para la red interna
+PUERTO_POR_DEFECTO = 8765
+
+
+class ErrorServicio(Exception):
+    """Error que se responde como JSON con el código HTTP `estado`."""
+
+    def __init__(self, mensaje, estado=HTTPStatus.BAD_REQUEST, detalle=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.detalle = detalle
+
+
+def _registros(df: pd.DataFrame) -> list:
+    return json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))
+
+
+def _fecha_iso(fecha):
+    return fecha.strftime("%Y-%m-%d") if fecha is not None else None
+
+
+class ServicioNomina:
+    """Archivos de entrada del servicio y las consultas que responde (cada una devuelve un dict)."""
+
+    def __init__(self,
+                 employees_file=None,
+                 hours_file=None,
+                 prestamos_file=main.DEFAULT_PRESTAMOS_FILE,
+                 seguridad_horario_file=main.DEFAULT_SEGURIDAD_HORARIO_FILE):
+        self.employees_file = employees_file or main.DEFAULT_EMPLOYEES_FILE
+        self.hours_file = hours_file or main.DEFAULT_HOURS_FILE
+        self.prestamos_file = prestamos_file
+        self.seguridad_horario_file = seguridad_horario_file
+        self.iniciado = time.time()
+        # La vista previa usa cachés globales de main: se calcula una a la vez
+        self._candado_nomina = threading.Lock()
+
+    def precargar(self) -> None:
+        """Lee todos los archivos al arrancar para que la primera consulta ya los encuentre en memoria."""
+        self._empleados()
+        main.leer_prestamos(self.prestamos_file)
+        main.cargar_seguridad_config(self.seguridad_horario_file)
+        if os.path.exists(self.hours_file):
+            try:
+                lectura_cacheada("asistencia", self.hours_file, main.leer_reporte_asistencia)
+            except Exception as e:
+                print(f"[ADVERTENCIA] No se pudo precargar '{self.hours_file}': {e}")
+
+    def _empleados(self) -> pd.DataFrame:
+        df = main.leer_empleados_normalizado(self.employees_file)
+        if df is None:
+            raise ErrorServicio(f"No se pudo leer el archivo de empleados: {self.employees_file}",
+                                HTTPStatus.SERVICE_UNAVAILABLE)
+        return df
+
+    # --- Consultas -------------------------------------------------------
+
+    def salud(self, consulta) -> dict:
+        archivos = {
+            "empleados": self.employees_file,
+            "asistencia": self.hours_file,
+            "prestamos": self.prestamos_file,
+            "seguridad_horario": self.seguridad_horario_file,
+        }
+        return {
+            "ok": True,
+            "version_reglas": main.VERSION_REGLAS,
+            "segundos_activo": round(time.time() - self.iniciado, 1),
+            "archivos": {
+                nombre: {"ruta": ruta, "existe": os.path.exists(ruta)} for nombre, ruta in archivos.items()
+            },
+        }
+
+    def empleados(self, consulta) -> dict:
+        df = self._empleados()
+        buscar = consulta.get("buscar", "").strip().lower()
+        if buscar:
+            texto = df.astype(str).apply(lambda fila: " ".join(fila).lower(), axis=1)
+            df = df[texto.str.contains(buscar, regex=False)]
+        return {"empleados": _registros(df)}
+
+    def empleado(self, consulta, employee_id) -> dict:
+        df = self._empleados()
+        fila = df[main.normalizar_ids(df["ID"]) == main.normalizar_id(employee_id)]
+        if fila.empty:
+            raise ErrorServicio(f"No existe el empleado {employee_id}", HTTPStatus.NOT_FOUND)
+        return {"empleado": _registros(fila.tail(1))[0]}
+
+    def prestamos(self, consulta) -> dict:
+        df = main.obtener_prestamos(self.prestamos_file)
+        if consulta.get("estado"):
+            df = df[df["estado"] == consulta["estado"].strip().upper()]
+        if consulta.get("empleado"):
+            df = df[main.normalizar_ids(df["employee_id"]) == main.normalizar_id(consulta["empleado"])]
+        return {"prestamos": _registros(df)}
+
+    def prestamo(self, consulta, loan_id) -> dict:
+        prestamos_df, pagos_df = main.leer_prestamos(self.prestamos_file)
+        fila = prestamos_df[prestamos_df["loan_id"] == loan_id.strip()]
+        if fila.empty:
+            raise ErrorServicio(f"No existe el préstamo {loan_id}", HTTPStatus.NOT_FOUND)
+        pagos = pagos_df[pagos_df["loan_id"] == loan_id.strip()]
+        pagos = pagos.sort_values(["fecha_pago_nomina", "creado_en"], na_position="last")
+        return {"prestamo": _registros(fila)[0], "pagos": _registros(pagos)}
+
+    def seguridad(self, consulta) -> dict:
+        return {"configuraciones": _registros(main.cargar_seguridad_config(self.seguridad_horario_file))}
+
+    def feriados(self, consulta) -> dict:
+        anios = sorted(main.feriados_panama)
+        if consulta.get("anio"):
+            try:
+                anios = [int(consulta["anio"])]
+            except ValueError:
+                raise ErrorServicio(f"Año inválido: {consulta['anio']}")
+        return {
+            "feriados": [
+                {"fecha": f"{anio}-{mes_dia}", "nombre": nombre}
+                for anio in anios
+                for mes_dia, nombre in sorted(main.feriados_panama.get(anio, {}).items())
+            ]
+        }
+
+    def nomina(self, consulta) -> dict:
+        fecha = consulta.get("fecha")
+        if not fecha:
+            raise ErrorServicio("Falta el parámetro fecha (DD/MM/YYYY)")
+        if pd.isna(main._parsear_quincena_fecha(fecha)):
+            raise ErrorServicio(f"Fecha inválida '{fecha}' (use DD/MM/YYYY, ej. 15/01/2026)")
+        with self._candado_nomina:
+            run = main.calcular_vista_previa_nomina(
+                employees_file=self.employees_file,
+                hours_file=self.hours_file,
+                quincena_fecha=fecha,
+                prestamos_file=self.prestamos_file,
+                seguridad_horario_file=self.seguridad_horario_file,
+            )
+        if not run.ok:
+            raise ErrorServicio("La nómina tiene errores", HTTPStatus.UNPROCESSABLE_ENTITY, {
+                "errores": run.errores,
+                "errores_asistencia": run.errores_asistencia,
+            })
+
+        nomina, seguridad = run.nomina, run.nomina_seguridad
+        if seguridad is None:
+            seguridad = pd.DataFrame()
+        if consulta.get("empleado"):
+            buscado = main.normalizar_id(consulta["empleado"])
+            nomina = nomina[main.normalizar_ids(nomina["ID"]) == buscado]
+            if not seguridad.empty:
+                seguridad = seguridad[main.normalizar_ids(seguridad["ID"]) == buscado]
+        partes = [df for df in (nomina, seguridad) if not df.empty]
+        total = float(sum(df["Total Pago a Empleados"].sum() for df in partes)) if partes else 0.0
+        return {
+            "fecha_pago": _fecha_iso(run.fecha_pago),
+            "quincena_inicio": _fecha_iso(run.quincena_inicio),
+            "quincena_fin": _fecha_iso(run.quincena_fin),
+            "desde_cache": bool(run.metricas.contadores.get("cache_hit")),
+            "empleados": len(nomina),
+            "empleados_seguridad": len(seguridad),
+            "total_pago": round(total, 2),
+            "advertencias": run.advertencias,
+            "nomina": _registros(nomina),
+            "nomina_seguridad": _registros(seguridad),
+        }
+
+
+# Rutas: primer segmento -> (consulta sin ID, consulta con ID)
+_RUTAS = {
+    "salud": ("salud", None),
+    "empleados": ("empleados", "empleado"),
+    "prestamos": ("prestamos", "prestamo"),
+    "seguridad": ("seguridad", None),
+    "feriados": ("feriados", None),
+    "nomina": ("nomina", None),
+}
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "NominaABCOPA/1.0"
+
+    def do_GET(self):
+        inicio = time.perf_counter()
+        partes_url = urlsplit(self.path)
+        segmentos = [unquote(s) for s in partes_url.path.strip("/").split("/") if s]
+        consulta = {k: v[-1] for k, v in parse_qs(partes_url.query).items()}
+        try:
+            if not segmentos or segmentos[0] not in _RUTAS or len(segmentos) > 2:
+                raise ErrorServicio(f"Ruta desconocida: {partes_url.path}", HTTPStatus.NOT_FOUND)
+            sin_id, con_id = _RUTAS[segmentos[0]]
+            if len(segmentos) == 2 and con_id is None:
+                raise ErrorServicio(f"Ruta desconocida: {partes_url.path}", HTTPStatus.NOT_FOUND)
+            servicio = self.server.servicio
+            if len(segmentos) == 2:
+                cuerpo = getattr(servicio, con_id)(consulta, segmentos[1])
+            else:
+                cuerpo = getattr(servicio, sin_id)(consulta)
+            estado = HTTPStatus.OK
+        except ErrorServicio as e:
+            estado, cuerpo = e.estado, {"error": str(e), **(e.detalle or {})}
+        except OSError as e:
+            estado, cuerpo = HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}
+        except Exception as e:
+            print(f"[ERROR] {self.path}: {type(e).__name__}: {e}")
+            estado, cuerpo = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        self._responder(estado, cuerpo, time.perf_counter() - inicio)
+
+    def _no_permitido(self):
+        self._responder(HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Servicio de solo lectura (use GET)"}, 0)
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _no_permitido
+
+    def _responder(self, estado, cuerpo, segundos):
+        datos = json.dumps(cuerpo, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.send_header("X-Tiempo-Ms", f"{segundos * 1000:.1f}")
+        self.end_headers()
+        self.wfile.write(datos)
+
+
+def crear_servidor(servicio: ServicioNomina, host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO) -> ThreadingHTTPServer:
+    """Servidor HTTP (un hilo por conexión) listo para `serve_forever`; puerto 0 elige uno libre."""
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.daemon_threads = True
+    servidor.servicio = servicio
+    return servidor
+
+
+def servir(servicio: ServicioNomina, host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO) -> None:
+    """Precarga los archivos y atiende consultas hasta Ctrl+C."""
+    print("Cargando archivos...")
+    servicio.precargar()
+    servidor = crear_servidor(servicio, host, puerto)
+    print(f"[OK] Servicio de nómina en http://{host}:{servidor.server_address[1]}/ (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print("Servicio detenido")
+
+
+def agregar_argumentos(parser: argparse.ArgumentParser) -> None:
+    """Opciones del servicio (compartidas con `cli_nomina.py servir`)."""
+    parser.add_argument("--host", default=HOST_POR_DEFECTO, help="Dirección donde escuchar")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO, help="Puerto HTTP")
+    parser.add_argument("--empleados", default=main.DEFAULT_EMPLOYEES_FILE, help="Archivo de empleados")
+    parser.add_argument("--asistencia", default=main.DEFAULT_HOURS_FILE, help="Reporte de asistencia del biométrico")
+    parser.add_argument("--prestamos", default=main.DEFAULT_PRESTAMOS_FILE, help="Archivo de préstamos")
+    parser.add_argument("--seguridad-horario", default=main.DEFAULT_SEGURIDAD_HORARIO_FILE, help="Configuración de turnos")
+
+
+def servicio_desde_argumentos(args) -> ServicioNomina:
+    return ServicioNomina(args.empleados, args.asistencia, args.prestamos, args.seguridad_horario)
+
+
+def main_servicio(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio HTTP local (JSON) de consultas de nómina.")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    servir(servicio_desde_argumentos(args), args.host, args.puerto)
+
+
+if __name__ == "__main__":
+    main_servicio()
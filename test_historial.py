@@ -0,0 +1,82 @@
+"""
+Pruebas del historial de nóminas (historial.py) sobre una base SQLite temporal.
+
+    python -m unittest test_historial
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import historial
+
+FECHA = "31/01/2026"
+
+
+def _nomina(ids, total_pago, descuentos=10.0):
+    """Nómina mínima como la guarda main.guardar_nomina_quincenal (columnas del Excel)."""
+    return pd.DataFrame({
+        "ID": ids,
+        "Nombre": [f"Empleado {i}" for i in ids],
+        "Total Pago a Empleados": total_pago,
+        "Total Descuentos": descuentos,
+        "Quincena Inicio": "16/01/2026",
+        "Quincena Fin": "31/01/2026",
+    })
+
+
+class TestCorridasMismaFecha(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "historial.sqlite")
+        self.archivo_a = os.path.join(self.tmp.name, "nomina_quincenal_pago_20260131.xlsx")
+        self.archivo_b = os.path.join(self.tmp.name, "simulacion", "nomina_quincenal_pago_20260131.xlsx")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _registrar(self, ids, total_pago, archivo):
+        historial.registrar_nomina(_nomina(ids, total_pago), None, FECHA, self.db, archivo_nomina=archivo)
+
+    def test_mismo_empleado_en_dos_archivos_se_cuenta_una_vez(self):
+        self._registrar([1, 2], 100.0, self.archivo_a)
+        self._registrar([1, 2], 100.0, self.archivo_b)  # ej: simulación con --salida
+
+        acumulado = historial.acumulado_empleado(1, 2026, self.db)
+        self.assertEqual(acumulado["quincenas"], 1)
+        self.assertAlmostEqual(acumulado["total_pago"], 100.0)
+        self.assertAlmostEqual(acumulado["pago_quincenal"], 110.0)
+
+        totales = historial.totales_periodo(db_path=self.db)
+        self.assertEqual(len(totales), 1)
+        self.assertEqual(totales.loc[0, "empleados"], 2)
+        self.assertAlmostEqual(totales.loc[0, "total_pago"], 200.0)
+        self.assertAlmostEqual(historial.sumar_columnas(["total_pago"], db_path=self.db)["total_pago"], 200.0)
+
+        # Las filas de cada archivo se conservan en el historial
+        self.assertEqual(len(historial.historial_empleado(1, db_path=self.db)), 2)
+
+    def test_vale_el_archivo_guardado_mas_recientemente(self):
+        self._registrar([1], 100.0, self.archivo_a)
+        self._registrar([1], 150.0, self.archivo_b)
+        self.assertAlmostEqual(historial.acumulado_empleado(1, 2026, self.db)["total_pago"], 150.0)
+
+        self._registrar([1], 120.0, self.archivo_a)  # se vuelve a guardar el archivo A
+        self.assertAlmostEqual(historial.acumulado_empleado(1, 2026, self.db)["total_pago"], 120.0)
+        self.assertAlmostEqual(historial.totales_periodo(db_path=self.db).loc[0, "total_pago"], 120.0)
+
+    def test_otra_sede_misma_fecha_suma(self):
+        self._registrar([1, 2], 100.0, self.archivo_a)
+        self._registrar([3], 50.0, self.archivo_b)
+
+        totales = historial.totales_periodo(db_path=self.db)
+        self.assertEqual(totales.loc[0, "empleados"], 3)
+        self.assertAlmostEqual(totales.loc[0, "total_pago"], 250.0)
+        self.assertAlmostEqual(historial.acumulado_empleado(3, 2026, self.db)["total_pago"], 50.0)
+        self.assertEqual(len(historial.listar_corridas(self.db)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()